@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Data File Parser Benchmark
+
+ Compares the NumPy data file readers with the original line-by-line
+ parser, using the bundled test data scaled up to higher occupancies.
+
+ Run from the repository's base directory with:
+
+ $ python -m benchmarks.parsers
+
+"""
+
+#...for the operating stuff.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the timing.
+import timeit
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the MATH.
+import numpy as np
+
+#...for the data file readers.
+from cernatschool.readers import readDataFile, getPixelMapFromArrays
+
+#...for processing the datasets.
+from cernatschool.dataset import Dataset
+
+#...for writing the data files.
+from synthetic import writeDataFile
+
+## The bundled test dataset.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/"
+
+## The frame width and height.
+FRAME_WIDTH = 256; FRAME_HEIGHT = 256
+
+## The data formats to benchmark {format:name}.
+BENCHMARK_FORMATS = {4114:"xyC", 8210:"XC", 18:"matrix"}
+
+def parseLegacy(fn, fmt, width, height):
+    """
+    Parse a data file line by line into a pixel map {X:C}.
+
+    This is the parser DscFile.processDataFile used before the NumPy
+    readers were added, kept here as the benchmark's reference.
+    """
+
+    pixelmap = {}
+
+    df = open(fn, "r")
+    ls = df.readlines()
+    df.close()
+
+    # Loop over the lines in the file.
+    for j, l in enumerate(ls):
+
+        if   fmt == 4114: # ASCII xyC.
+            vals = l.strip().split("\t")
+            pixelmap[height * int(vals[1]) + int(vals[0])] = int(vals[2])
+        elif fmt == 18: # ASCII matrix.
+            vals = [int(val) for val in l.strip().split(" ")]
+            for i, C in enumerate(vals):
+                if C > 0:
+                    pixelmap[(height * j) + i] = C
+        elif fmt == 8210: # ASCII XC
+            vals = [int(val) for val in l.strip().split("\t")]
+            pixelmap[vals[0]] = vals[1]
+        else:
+            raise IOError("FRAME_BAD_FORMAT")
+
+    return pixelmap
+
+def parseNumPy(fn, fmt, width, height):
+    """ Parse a data file with the NumPy readers into a pixel map {X:C}. """
+    return getPixelMapFromArrays(*readDataFile(fn, fmt, width, height))
+
+def makeScaledFrame(pixelmaps, scale, rng):
+    """
+    Make a frame from the bundled frames, scaled up in occupancy.
+
+    The pixels of the given number of bundled frames are overlaid with
+    random shifts (wrapping at the edges of the frame).
+
+    @param [in] pixelmaps The pixel maps {X:C} of the bundled frames.
+    @param [in] scale The number of bundled frames to overlay.
+    @param [in] rng The NumPy random number generator.
+    """
+
+    frame = np.zeros((FRAME_HEIGHT, FRAME_WIDTH), dtype=np.int64)
+
+    for i in range(scale):
+
+        pm = pixelmaps[rng.randint(len(pixelmaps))]
+
+        xs = np.array(list(pm.keys()), dtype=np.int64)
+        cs = np.array(list(pm.values()), dtype=np.int64)
+
+        dx, dy = rng.randint(FRAME_WIDTH), rng.randint(FRAME_HEIGHT)
+
+        frame[(xs // FRAME_WIDTH + dy) % FRAME_HEIGHT, (xs % FRAME_WIDTH + dx) % FRAME_WIDTH] += cs
+
+    return frame
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=======================================*")
+    print("* CERN@school - data file parser timing *")
+    print("*=======================================*")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scales",  help="The occupancy scale factors (comma separated).", default="1,10,100")
+    parser.add_argument("-n", "--nframes", help="The number of frames per scale and format.", type=int, default=20)
+    parser.add_argument("-r", "--repeat",  help="The number of timing repeats.", type=int, default=3)
+    args = parser.parse_args()
+
+    ## The occupancy scale factors.
+    scales = [int(s) for s in args.scales.split(",")]
+
+    ## The bundled frames' pixel maps.
+    pixelmaps = [df.getPixelMap() for df in Dataset(TEST_DATA_PATH).getDscFiles()]
+
+    ## The random number generator (seeded so that runs are comparable).
+    rng = np.random.RandomState(42)
+
+    ## The directory for the scaled-up data files.
+    tmpdir = tempfile.mkdtemp(prefix="cernatschool-parsers-")
+
+    print("*")
+    print("* %-6s | %5s | %8s | %12s | %12s | %7s" % \
+        ("Format", "Scale", "Pixels", "Legacy [ms]", "NumPy [ms]", "Speedup"))
+    print("*--------+-------+----------+--------------+--------------+--------")
+
+    try:
+        for scale in scales:
+
+            ## The scaled-up frames.
+            frames = [makeScaledFrame(pixelmaps, scale, rng) for i in range(args.nframes)]
+
+            n_pixels = np.mean([np.count_nonzero(frame) for frame in frames])
+
+            for fmt in sorted(BENCHMARK_FORMATS.keys()):
+
+                fns = []
+
+                for i, frame in enumerate(frames):
+                    fn = os.path.join(tmpdir, "%s_%d_%03d.txt" % (BENCHMARK_FORMATS[fmt], scale, i))
+                    writeDataFile(fn, frame, fmt)
+                    fns.append(fn)
+
+                # Check that the parsers agree before timing them.
+                for fn in fns:
+                    if parseLegacy(fn, fmt, FRAME_WIDTH, FRAME_HEIGHT) != \
+                       parseNumPy(fn, fmt, FRAME_WIDTH, FRAME_HEIGHT):
+                        raise IOError("BENCHMARK_PARSER_MISMATCH")
+
+                times = []
+
+                for parse in [parseLegacy, parseNumPy]:
+                    t = min(timeit.repeat(lambda: [parse(fn, fmt, FRAME_WIDTH, FRAME_HEIGHT) for fn in fns], \
+                                          repeat=args.repeat, number=1))
+                    times.append(1000.0 * t / len(fns))
+
+                print("* %-6s | %5d | %8.0f | %12.3f | %12.3f | %6.1fx" % \
+                    (BENCHMARK_FORMATS[fmt], scale, n_pixels, times[0], times[1], times[0] / times[1]))
+    finally:
+        rmtree(tmpdir)
+
+    print("*")
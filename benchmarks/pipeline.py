@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Pipeline Stage Benchmarks
+
+ Times each stage of the frame processing pipeline on a synthetic
+ dataset (see benchmarks/synthetic.py) and writes the results to a
+ JSON file, so that the timings can be compared across commits.
+
+ The stages are:
+
+ * parse         - reading the DSC and data files;
+ * cluster       - finding the clusters (the default, dictionary-based, finder);
+ * cluster_array - finding the clusters (the array-based finder);
+ * properties    - getting the cluster properties;
+ * linearity     - fitting the cluster lines of best fit;
+ * render        - drawing the frame images (figures);
+ * render_raster - drawing the frame images (raster images);
+ * json          - writing the frame and cluster properties JSON;
+ * rate_fit      - the Poisson fit of the clusters per frame.
+
+ Run from the repository's base directory with, e.g.:
+
+ $ python -m benchmarks.pipeline -n 50 -o benchmark.json
+
+ and, to compare with the results from another commit:
+
+ $ python -m benchmarks.pipeline -n 50 -o benchmark-new.json -c benchmark.json
+
+"""
+
+#...for the operating stuff.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the timing.
+import timeit
+
+#...for the time stamps.
+import time
+
+#...for the platform information.
+import platform
+
+#...for the commit ID.
+import subprocess
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+# Import the JSON library.
+import json
+
+#...for the MATH.
+import numpy as np
+
+#...for the plotting (without a display).
+import matplotlib
+matplotlib.use("Agg")
+
+#...for processing the datasets.
+from cernatschool.dataset import Dataset
+
+#...for the frame cache environment variable.
+from cernatschool.framecache import FRAME_CACHE_ENV
+
+#...for the cluster finders.
+from cernatschool.kluster import KlusterFinder, ArrayKlusterFinder
+
+#...for the linearity calculations.
+from cernatschool.helpers import getLinearityClosedForm
+
+#...for making the frame images.
+from visualisation.visualisation import makeFrameImage
+
+#...for the rate fit.
+from plotting.poisson import RateHistogram
+
+#...for the synthetic datasets.
+from synthetic import makeSyntheticDataset, DEFAULT_MIX, FRAME_WIDTH, FRAME_HEIGHT
+
+## The version of the benchmark results JSON.
+BENCHMARK_RESULTS_VERSION = 1
+
+## The pipeline stages, in order.
+PIPELINE_STAGES = ["parse", "cluster", "cluster_array", "properties", "linearity", \
+    "render", "render_raster", "json", "rate_fit"]
+
+## The data formats {name:format}.
+BENCHMARK_FORMATS = {"xyC":4114, "XC":8210, "matrix":18}
+
+def getCommit():
+    """ Get the ID of the checked out commit (None if not in a git repository). """
+
+    try:
+        with open(os.devnull, "w") as devnull:
+            return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parseMix(s):
+    """ Parse a cluster shape mix string, e.g. "gamma=0.7,track=0.2,blob=0.1". """
+
+    mix = {}
+
+    for val in s.split(","):
+        shape, fraction = val.split("=")
+        mix[shape.strip()] = float(fraction)
+
+    return mix
+
+def timeStage(stage, repeat):
+    """
+    Time a pipeline stage.
+
+    @param [in] stage A function running the stage and returning the number of items processed.
+    @param [in] repeat The number of times to run the stage.
+    @returns t The fastest time taken [s].
+    @returns n The number of items processed.
+    """
+
+    ts = []
+
+    for i in range(repeat):
+        t0 = timeit.default_timer()
+        n = stage()
+        ts.append(timeit.default_timer() - t0)
+
+    return min(ts), n
+
+def runPipelineBenchmarks(datapath, workpath, repeat=3, render_frames=5, stages=PIPELINE_STAGES):
+    """
+    Time the pipeline stages on a dataset.
+
+    Each stage is timed on the output of the stages before it, which are
+    run (once, untimed) first.
+
+    @param [in] datapath The path to the dataset.
+    @param [in] workpath A folder for the stages' output files.
+    @param [in] repeat The number of times to run each stage (the fastest is kept).
+    @param [in] render_frames The number of frames to draw figures for.
+    @param [in] stages The stages to time.
+    @returns results Dictionary of the results {stage:{"seconds", "n", "ms_per_item"}}.
+    @returns summary Dictionary summarising the dataset.
+    """
+
+    ## The pixel maps of the frames.
+    pixelmaps = [df.getPixelMap() for df in Dataset(datapath).getDscFiles()]
+
+    ## The cluster finders for each frame.
+    finders = [ArrayKlusterFinder(pm, FRAME_WIDTH, FRAME_HEIGHT, False) for pm in pixelmaps]
+
+    ## The clusters found in all of the frames.
+    klusters = [k for kf in finders for k in kf.getListOfKlusters()]
+
+    ## The number of clusters found in each frame.
+    ncs = [kf.getNumberOfKlusters() for kf in finders]
+
+    ## The frame and cluster properties.
+    properties = {
+        "frames"   : [{"id":i, "n_pixel":len(pm), "n_kluster":kf.getNumberOfKlusters(), "n_gamma":kf.getNumberOfGammas()} \
+                      for i, (pm, kf) in enumerate(zip(pixelmaps, finders))],
+        "klusters" : [k.getKlusterPropertiesJson() for k in klusters]
+        }
+
+    def parse():
+        return len([df.getPixelMap() for df in Dataset(datapath).getDscFiles()])
+
+    def cluster():
+        return len([KlusterFinder(pm, FRAME_WIDTH, FRAME_HEIGHT, False) for pm in pixelmaps])
+
+    def cluster_array():
+        return len([ArrayKlusterFinder(pm, FRAME_WIDTH, FRAME_HEIGHT, False).getKlusterTable() for pm in pixelmaps])
+
+    def properties_():
+        return len([k.getKlusterPropertiesJson() for kf in finders for k in kf.getListOfKlusters()])
+
+    def linearity():
+        return len([getLinearityClosedForm(k.getPixelMap()) for k in klusters])
+
+    def render():
+        for i, pm in enumerate(pixelmaps[:render_frames]):
+            makeFrameImage("frame_%04d" % (i), dict(pm), workpath)
+        return min(render_frames, len(pixelmaps))
+
+    def render_raster():
+        for i, pm in enumerate(pixelmaps):
+            makeFrameImage("frame_%04d" % (i), dict(pm), workpath, raster=True)
+        return len(pixelmaps)
+
+    def json_():
+        with open(os.path.join(workpath, "frames.json"), "w") as jf:
+            json.dump(properties["frames"], jf)
+        with open(os.path.join(workpath, "klusters.json"), "w") as jf:
+            json.dump(properties["klusters"], jf)
+        return len(pixelmaps)
+
+    def rate_fit():
+        RateHistogram(100, "ncs", workpath).fill(ncs)
+        return len(ncs)
+
+    ## The stage functions {stage:function}.
+    stage_functions = {
+        "parse"         : parse,
+        "cluster"       : cluster,
+        "cluster_array" : cluster_array,
+        "properties"    : properties_,
+        "linearity"     : linearity,
+        "render"        : render,
+        "render_raster" : render_raster,
+        "json"          : json_,
+        "rate_fit"      : rate_fit
+        }
+
+    results = {}
+
+    for stage in stages:
+
+        t, n = timeStage(stage_functions[stage], repeat)
+
+        results[stage] = {"seconds":t, "n":n, "ms_per_item":1000.0 * t / max(n, 1)}
+
+    summary = {
+        "n_frames"   : len(pixelmaps),
+        "n_pixels"   : sum(len(pm) for pm in pixelmaps),
+        "n_klusters" : len(klusters),
+        "n_gammas"   : sum(kf.getNumberOfGammas() for kf in finders)
+        }
+
+    return results, summary
+
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=======================================*")
+    print("* CERN@school - pipeline stage timing   *")
+    print("*=======================================*")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--nframes",       help="The number of synthetic frames.", type=int, default=50)
+    parser.add_argument("-f", "--format",        help="The data file format.", choices=sorted(BENCHMARK_FORMATS.keys()), default="xyC")
+    parser.add_argument("-k", "--rate",          help="The mean number of clusters per frame.", type=float, default=20.0)
+    parser.add_argument("-m", "--mix",           help="The cluster shape mix, e.g. \"gamma=0.7,track=0.2,blob=0.1\".", default=None)
+    parser.add_argument("-z", "--noisy",         help="The fraction of noisy frames.", type=float, default=0.0)
+    parser.add_argument("-s", "--seed",          help="The random number generator seed.", type=int, default=42)
+    parser.add_argument("-r", "--repeat",        help="The number of timing repeats.", type=int, default=3)
+    parser.add_argument("-i", "--render-frames", help="The number of frames to draw figures for.", type=int, default=5)
+    parser.add_argument("-t", "--stages",        help="The stages to time (comma separated).", default=",".join(PIPELINE_STAGES))
+    parser.add_argument("-o", "--output",        help="The results JSON file.", default="benchmark-pipeline.json")
+    parser.add_argument("-c", "--compare",       help="A results JSON file (e.g. from another commit) to compare with.", default=None)
+    args = parser.parse_args()
+
+    ## The stages to time.
+    stages = [s.strip() for s in args.stages.split(",")]
+    #
+    for stage in stages:
+        if stage not in PIPELINE_STAGES:
+            raise IOError("* ERROR: unknown stage '%s'!" % (stage))
+
+    ## The cluster shape mix.
+    mix = DEFAULT_MIX
+    #
+    if args.mix is not None:
+        mix = parseMix(args.mix)
+
+    ## The results to compare with (if any).
+    baseline = {}
+    #
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["stages"]
+
+    # Time the parsing itself, not the frame cache.
+    os.environ.pop(FRAME_CACHE_ENV, None)
+
+    ## The folder for the synthetic dataset and the stages' output.
+    tmpdir = tempfile.mkdtemp(prefix="cernatschool-pipeline-")
+
+    try:
+        ## The dataset path.
+        datapath = os.path.join(tmpdir, "data")
+
+        ## The stages' output path.
+        workpath = os.path.join(tmpdir, "output")
+        #
+        os.mkdir(workpath)
+
+        makeSyntheticDataset(datapath, args.nframes, BENCHMARK_FORMATS[args.format], args.rate, mix, args.noisy, args.seed)
+
+        results, summary = runPipelineBenchmarks(datapath, workpath, args.repeat, args.render_frames, stages)
+
+    finally:
+        rmtree(tmpdir)
+
+    print("*")
+    print("* %-13s | %6s | %10s | %12s | %8s" % ("Stage", "Items", "Time [s]", "[ms / item]", "Change"))
+    print("*---------------+--------+------------+--------------+---------")
+    #
+    for stage in stages:
+
+        ## The change in the time per item from the results compared with.
+        change = ""
+        #
+        if stage in baseline and baseline[stage]["ms_per_item"] > 0:
+            change = "%+7.1f%%" % (100.0 * (results[stage]["ms_per_item"] / baseline[stage]["ms_per_item"] - 1.0))
+
+        print("* %-13s | %6d | %10.3f | %12.3f | %8s" % \
+            (stage, results[stage]["n"], results[stage]["seconds"], results[stage]["ms_per_item"], change))
+    print("*")
+
+    ## The benchmark results.
+    report = {
+        "version"  : BENCHMARK_RESULTS_VERSION,
+        "created"  : time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit"   : getCommit(),
+        "platform" : {"python":platform.python_version(), "numpy":np.__version__, "system":platform.platform()},
+        "settings" : {"nframes":args.nframes, "format":args.format, "rate":args.rate, "mix":mix, \
+                      "noisy":args.noisy, "seed":args.seed, "repeat":args.repeat, "render_frames":args.render_frames},
+        "dataset"  : summary,
+        "stages"   : results
+        }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print("* Results written to '%s'." % (args.output))
+    print("*")
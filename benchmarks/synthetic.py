@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Synthetic Timepix Data
+
+ Makes datasets of synthetic Timepix frames (DSC and ASCII data files)
+ for the benchmarks. Each frame is made of randomly placed clusters -
+ gammas (1-4 pixel clusters), tracks (straight lines) and blobs (discs
+ of high counts) - with a Poisson distributed number of clusters per
+ frame. Noisy frames have a large fraction of their pixels hit.
+
+ The frames are made with a seeded random number generator, so the
+ same settings always give the same dataset.
+
+"""
+
+#...for the operating stuff.
+import os
+
+#...for the time.
+import time
+
+#...for the MATH.
+import numpy as np
+
+## The frame width and height.
+FRAME_WIDTH = 256; FRAME_HEIGHT = 256
+
+## The cluster shapes.
+CLUSTER_SHAPES = ["gamma", "track", "blob"]
+
+## The default cluster shape mix {shape:fraction of clusters}.
+DEFAULT_MIX = {"gamma":0.7, "track":0.2, "blob":0.1}
+
+## The fraction of pixels hit in a noisy frame.
+NOISY_FRAME_OCCUPANCY = 0.6
+
+## The DSC file frame type lines {format:type line}.
+DSC_FRAME_TYPES = {
+    4114 : "Type=i16 [X,Y,C] width=%d height=%d",
+    8210 : "Type=i16 [X,C] width=%d height=%d",
+    18   : "Type=i16 matrix width=%d height=%d"
+    }
+
+## The DSC file template (based on an MX-10 DSC file).
+DSC_TEMPLATE = """A000000001
+[F0]
+{TYPE}
+"Acq mode" ("Acquisition mode"):
+i32[1]
+1
+
+"Acq time" ("Acquisition time [s]"):
+double[1]
+{ACQ_TIME:.6f}
+
+"ChipboardID" ("Medipix or chipboard ID"):
+uchar[10]
+{CHIP_ID}
+
+"DACs" ("DACs values of all chips"):
+u16[14]
+1 100 255 127 127 0 405 7 130 128 80 85 128 128
+
+"Firmware" ("Firmware version"):
+char[64]
+Firmware 3 (date: 28. 11. 2012)
+
+"HV" ("Bias voltage [V]"):
+double[1]
+95.000000
+
+"Hw timer" ("Hw timer mode"):
+i32[1]
+2
+
+"Interface" ("Medipix interface"):
+uchar[6]
+MX-10
+
+"Mpx clock" ("Medipix clock [MHz]"):
+double[1]
+10.000000
+
+"Mpx type" ("Medipix type (1-2.1, 2-MXR, 3-TPX)"):
+i32[1]
+3
+
+"Name+SN" ("Name and serial number"):
+char[64]
+MX-10 Particle Detector A
+
+"Pixelman version" ("Pixelman version"):
+uchar[6]
+2.2.2
+
+"Polarity" ("Detector polarity (0 negative, 1 positive)"):
+i32[1]
+1
+
+"Start time" ("Acquisition start time"):
+double[1]
+{START_TIME:.6f}
+
+"Start time (string)" ("Acquisition start time (string)"):
+char[64]
+{START_TIME_STRING}
+
+"Timepix clock" ("Timepix clock (in MHz)"):
+double[1]
+10.000000
+"""
+
+def makeGamma(rng):
+    """ Make a gamma candidate - a random walk of 1 to 4 adjacent pixels around (0, 0). """
+
+    xs, ys = [0], [0]
+
+    for i in range(rng.randint(4)):
+
+        ## The step to the next pixel.
+        dx, dy = [(1, 0), (-1, 0), (0, 1), (0, -1)][rng.randint(4)]
+
+        if (xs[-1] + dx, ys[-1] + dy) not in zip(xs, ys):
+            xs.append(xs[-1] + dx); ys.append(ys[-1] + dy)
+
+    return np.array(xs), np.array(ys), rng.randint(10, 200, len(xs))
+
+def makeTrack(rng):
+    """ Make a track - a straight line of 10 to 60 pixels, starting at (0, 0). """
+
+    ## The track length [pixels].
+    length = rng.randint(10, 61)
+
+    ## The track direction.
+    theta = rng.uniform(0., 2.*np.pi)
+
+    ## The distances along the track.
+    ts = np.arange(length, dtype=np.float64)
+
+    ## The track pixels (with duplicates from the rounding removed).
+    Xs = np.unique(np.round(ts * np.cos(theta)).astype(np.int64) * 1024 + np.round(ts * np.sin(theta)).astype(np.int64) + 512 * 1025)
+
+    xs, ys = Xs // 1024 - 512, Xs % 1024 - 512
+
+    return xs, ys, rng.randint(20, 100, len(xs))
+
+def makeBlob(rng):
+    """ Make a blob - a disc of 2 to 5 pixels radius, centred on (0, 0), with the counts peaking in the middle. """
+
+    ## The blob radius [pixels].
+    r = rng.randint(2, 6)
+
+    ys, xs = np.mgrid[-r:r+1, -r:r+1]
+
+    ## The pixels in the disc.
+    inside = xs*xs + ys*ys <= r*r
+
+    xs, ys = xs[inside], ys[inside]
+
+    return xs, ys, (500. * (1. - np.sqrt(xs*xs + ys*ys) / (r + 1.))).astype(np.int64) + rng.randint(1, 50, len(xs))
+
+## The cluster makers {shape:function}.
+CLUSTER_MAKERS = {"gamma":makeGamma, "track":makeTrack, "blob":makeBlob}
+
+def makeSyntheticFrame(rng, n_klusters, mix=DEFAULT_MIX, noisy=False, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """
+    Make a synthetic frame.
+
+    @param [in] rng The NumPy random number generator.
+    @param [in] n_klusters The number of clusters to place in the frame.
+    @param [in] mix The cluster shape mix {shape:fraction of clusters}.
+    @param [in] noisy Make a noisy frame?
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns frame A (height x width) NumPy array of the pixel counts.
+    """
+
+    frame = np.zeros((height, width), dtype=np.int64)
+
+    ## The cluster shapes and their probabilities.
+    shapes = sorted(mix.keys())
+    #
+    ps = np.array([mix[shape] for shape in shapes], dtype=np.float64)
+
+    for shape in rng.choice(shapes, size=n_klusters, p=ps/ps.sum()):
+
+        xs, ys, cs = CLUSTER_MAKERS[shape](rng)
+
+        # Place the cluster, dropping any pixels off the edge of the frame.
+        xs = xs + rng.randint(width); ys = ys + rng.randint(height)
+        #
+        on = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+        frame[ys[on], xs[on]] += cs[on]
+
+    if noisy:
+
+        ## The noisy pixels.
+        Xs = rng.choice(width * height, size=int(NOISY_FRAME_OCCUPANCY * width * height), replace=False)
+
+        frame.ravel()[Xs] += rng.randint(1, 50, len(Xs))
+
+    return frame
+
+def writeDataFile(fn, frame, fmt):
+    """ Write a (dense) frame to an ASCII data file in the given format. """
+
+    ys, xs = np.nonzero(frame)
+
+    cs = frame[ys, xs]
+
+    with open(fn, "w") as f:
+        if fmt == 4114:
+            for x, y, C in zip(xs, ys, cs):
+                f.write("%d\t%d\t%d\n" % (x, y, C))
+        elif fmt == 8210:
+            for x, y, C in zip(xs, ys, cs):
+                f.write("%d\t%d\n" % (y * frame.shape[1] + x, C))
+        elif fmt == 18:
+            for row in frame:
+                f.write(" ".join("%d" % (C) for C in row) + " \n")
+
+def writeDscFile(fn, fmt, start_time, acq_time, chipid, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """
+    Write a DSC file for a synthetic frame.
+
+    @param [in] fn The DSC file name.
+    @param [in] fmt The data file format value.
+    @param [in] start_time The frame start time [s].
+    @param [in] acq_time The frame acquisition time [s].
+    @param [in] chipid The chip ID.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    """
+
+    ## The start time (seconds and microseconds).
+    sec = int(start_time); usec = int(round((start_time - sec) * 1e6)) % 1000000
+
+    ## The start time string (in the Pixelman format).
+    sts = time.strftime("%a %b %d %H:%M:%S", time.gmtime(sec)) + ".%06d" % (usec) + time.strftime(" %Y", time.gmtime(sec))
+
+    dsc = DSC_TEMPLATE.format(TYPE=DSC_FRAME_TYPES[fmt] % (width, height), ACQ_TIME=acq_time, CHIP_ID=chipid, \
+        START_TIME=start_time, START_TIME_STRING=sts)
+
+    with open(fn, "wb") as f:
+        f.write(dsc.replace("\n", "\r\n"))
+
+def makeSyntheticDataset(path, n_frames, fmt=4114, rate=10.0, mix=DEFAULT_MIX, noisy_fraction=0.0, seed=42, \
+    start_time=1396447375.004957, acq_time=60.0, chipid="S01-W0001"):
+    """
+    Write a synthetic dataset of DSC and ASCII data files.
+
+    @param [in] path The folder to write the dataset to (created if it doesn't exist).
+    @param [in] n_frames The number of frames.
+    @param [in] fmt The data file format value (4114, 8210 or 18).
+    @param [in] rate The mean number of clusters per frame.
+    @param [in] mix The cluster shape mix {shape:fraction of clusters}.
+    @param [in] noisy_fraction The fraction of noisy frames.
+    @param [in] seed The random number generator seed.
+    @param [in] start_time The start time of the first frame [s].
+    @param [in] acq_time The frame acquisition time [s].
+    @param [in] chipid The chip ID.
+    @returns n_klusters A list of the number of clusters placed in each frame.
+    """
+
+    if fmt not in DSC_FRAME_TYPES:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    ## The random number generator.
+    rng = np.random.RandomState(seed)
+
+    ## The number of clusters placed in each frame.
+    n_klusters = rng.poisson(rate, n_frames).tolist()
+
+    for i, n_k in enumerate(n_klusters):
+
+        ## The frame start time [s].
+        st = start_time + i * acq_time
+
+        ## The data file name.
+        fn = os.path.join(path, "%s_%s.txt" % (chipid, time.strftime("%Y-%m-%d-%H%M%S", time.gmtime(int(st)))))
+
+        writeDataFile(fn, makeSyntheticFrame(rng, n_k, mix, rng.uniform() < noisy_fraction), fmt)
+
+        writeDscFile(fn + ".dsc", fmt, st, acq_time, chipid)
+
+    return n_klusters
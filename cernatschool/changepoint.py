@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Online detection of changes in the rate of a long-running detector.
+
+The RateChangeDetector is a two-sided Poisson CUSUM. It is fed each
+frame's start time, acquisition time and count (of clusters or hit
+pixels) as the frames arrive. The count in a frame of acquisition time
+t is Poisson with a mean of rate * t, and the CUSUMs add up the log
+likelihood ratios for the rate having gone up (or down) by a relative
+shift from the baseline rate:
+
+  S_up   = max(0, S_up   + n log(1 + shift) - shift * rate * t)
+  S_down = max(0, S_down + n log(1 - shift) + shift * rate * t)
+
+A change is flagged when either goes over the threshold - the larger
+the threshold, the fewer false alarms (around one in e^threshold
+frames at most) but the longer it takes to notice a change. The
+baseline rate is estimated from all of the frames since the start (or
+the last change), with the CUSUMs only starting after the first few
+(the warm-up) frames. Only running sums are kept, so the memory used
+doesn't grow with the number of frames.
+
+Counts that vary more than Poisson counts would - e.g. the number of
+hit pixels, as each cluster hits several pixels - would give false
+alarms. The dispersion (the Pearson chi^2 of the baseline frames per
+degree of freedom, and at least one) is estimated along with the
+baseline rate, and the log likelihood ratios are divided by it - the
+quasi-Poisson CUSUM. For Poisson counts (e.g. clusters) the
+dispersion is close to one, and the CUSUMs are unchanged.
+
+The detector's state (the running sums) can be saved to and loaded
+from a JSON file, so that a detector can carry on from where it
+stopped as more frames arrive (e.g. between incremental runs of
+process-frames.py).
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import math
+
+# Import the JSON library.
+import json
+
+#...for writing the state files.
+from runstate import writeJson
+
+## The rate change detector state file version.
+RATE_CHANGE_STATE_VERSION = 1
+
+class RateChangeDetector:
+    """
+    A streaming (two-sided Poisson CUSUM) rate change detector.
+    """
+
+    def __init__(self, shift=0.5, threshold=10.0, warmup=30):
+        """
+        Constructor.
+
+        @param [in] shift The relative change in the rate to look for (0 < shift < 1).
+        @param [in] threshold The CUSUM threshold for flagging a change.
+        @param [in] warmup The number of frames used to estimate the baseline rate.
+        """
+
+        if shift <= 0.0 or shift >= 1.0:
+            raise IOError("CHANGE_BAD_SHIFT")
+
+        if threshold <= 0.0 or warmup < 1:
+            raise IOError("CHANGE_BAD_THRESHOLD")
+
+        ## The relative change in the rate to look for.
+        self.shift = shift
+
+        ## The CUSUM threshold.
+        self.threshold = threshold
+
+        ## The number of frames used to estimate the baseline rate.
+        self.warmup = warmup
+
+        ## The log likelihood ratio per count for the rate going up (and down).
+        self.__log_up   = math.log(1.0 + shift)
+        self.__log_down = math.log(1.0 - shift)
+
+        ## The number of frames seen.
+        self.n_frames = 0
+
+        ## The changes flagged so far.
+        self.n_changes = 0
+
+        ## The start time of the last frame seen [s] (None if none have been seen).
+        self.last_time = None
+
+        self.__startBaseline(0, 0, 0.0)
+
+    def __startBaseline(self, n_frames, n, t, n2t=0.0):
+        """ Start estimating the baseline rate again (from the sums of the frames so far). """
+
+        ## The number of frames, counts, acquisition time and sum of
+        ## (counts^2 / acquisition time) for the baseline estimate.
+        self.__base_frames, self.__base_n, self.__base_t, self.__base_n2t = n_frames, n, t, n2t
+
+        ## The baseline rate [counts per second] (None while warming up).
+        self.rate = None
+
+        ## The dispersion of the counts about the baseline rate.
+        self.dispersion = 1.0
+
+        ## The CUSUMs - the value, and the frames, counts, acquisition
+        ## time, sum of (counts^2 / acquisition time) and start time
+        ## since it was last zero.
+        self.__up   = {"s":0.0, "frames":0, "n":0, "t":0.0, "n2t":0.0, "start":None}
+        self.__down = {"s":0.0, "frames":0, "n":0, "t":0.0, "n2t":0.0, "start":None}
+
+    def __addToBaseline(self, n, acq_time):
+        """ Add a frame to the baseline rate (and dispersion) estimate. """
+
+        self.__base_frames += 1
+        self.__base_n      += n
+        self.__base_t      += acq_time
+        self.__base_n2t    += float(n) * n / acq_time
+
+        self.rate = float(self.__base_n) / self.__base_t
+
+        # The Pearson chi^2, sum((n - rate * t)^2 / (rate * t)), from the sums.
+        if self.__base_frames > 1 and self.rate > 0.0:
+            chi2 = self.__base_n2t / self.rate - self.__base_n
+            self.dispersion = max(1.0, chi2 / (self.__base_frames - 1))
+
+    def isWarmingUp(self):
+        return self.rate is None
+
+    def getStatistics(self):
+        """ Get the current (upward, downward) CUSUM values. """
+        return self.__up["s"], self.__down["s"]
+
+    def getState(self):
+        """ Get the (JSON serialisable) state of the detector - the settings and running sums. """
+        return {
+            "shift"      : self.shift,
+            "threshold"  : self.threshold,
+            "warmup"     : self.warmup,
+            "n_frames"   : self.n_frames,
+            "n_changes"  : self.n_changes,
+            "last_time"  : self.last_time,
+            "baseline"   : [self.__base_frames, self.__base_n, self.__base_t, self.__base_n2t],
+            "rate"       : self.rate,
+            "dispersion" : self.dispersion,
+            "up"         : dict(self.__up),
+            "down"       : dict(self.__down)
+            }
+
+    def setState(self, state):
+        """ Carry on from a saved state (see getState). """
+
+        self.__init__(state["shift"], state["threshold"], state["warmup"])
+
+        self.n_frames, self.n_changes, self.last_time = state["n_frames"], state["n_changes"], state["last_time"]
+
+        self.__base_frames, self.__base_n, self.__base_t, self.__base_n2t = state["baseline"]
+
+        self.rate, self.dispersion = state["rate"], state["dispersion"]
+
+        self.__up, self.__down = dict(state["up"]), dict(state["down"])
+
+    def update(self, start_time, acq_time, n):
+        """
+        Add a frame.
+
+        @param [in] start_time The frame start time [s].
+        @param [in] acq_time The frame acquisition time [s].
+        @param [in] n The number of counts (e.g. clusters) in the frame.
+        @returns change A dictionary describing the change (None if no change was flagged).
+        """
+
+        self.n_frames += 1
+
+        self.last_time = start_time
+
+        if acq_time <= 0.0:
+            lg.debug(" * Skipping a frame with no acquisition time at %f." % (start_time))
+            return None
+
+        if self.rate is None:
+
+            self.__addToBaseline(n, acq_time)
+
+            # Start looking for changes once there's a (non-zero) baseline.
+            if self.__base_frames < self.warmup or self.__base_n == 0:
+                self.rate = None
+
+            return None
+
+        ## The expected counts in the frame at the baseline rate.
+        mu = self.rate * acq_time
+
+        ## The dispersion of the counts (before this frame).
+        phi = self.dispersion
+
+        self.__addToBaseline(n, acq_time)
+
+        for cusum, llr in ((self.__up, n * self.__log_up - self.shift * mu), \
+                           (self.__down, n * self.__log_down + self.shift * mu)):
+
+            if cusum["s"] == 0.0:
+                cusum["frames"], cusum["n"], cusum["t"], cusum["n2t"], cusum["start"] = 0, 0, 0.0, 0.0, start_time
+
+            cusum["s"] = max(0.0, cusum["s"] + llr / phi)
+            cusum["frames"] += 1
+            cusum["n"]      += n
+            cusum["t"]      += acq_time
+            cusum["n2t"]    += float(n) * n / acq_time
+
+        for direction, cusum in (("up", self.__up), ("down", self.__down)):
+
+            if cusum["s"] > self.threshold:
+
+                ## The change.
+                change = {
+                    "time"        : start_time,
+                    "start"       : cusum["start"],
+                    "direction"   : direction,
+                    "rate_before" : float(self.__base_n - cusum["n"]) / (self.__base_t - cusum["t"]),
+                    "rate_after"  : float(cusum["n"]) / cusum["t"],
+                    "statistic"   : cusum["s"],
+                    "frame"       : self.n_frames - 1
+                    }
+
+                lg.info(" * Rate change (%s) at %f: %f -> %f [counts per second]." % \
+                    (direction, start_time, change["rate_before"], change["rate_after"]))
+
+                self.n_changes += 1
+
+                # Estimate the new baseline, starting with the frames since the change.
+                self.__startBaseline(cusum["frames"], cusum["n"], cusum["t"], cusum["n2t"])
+
+                return change
+
+        return None
+
+def replayRates(start_times, acq_times, counts, detector=None):
+    """
+    Replay a run's frames (e.g. from a frame store or profile) through a rate change detector.
+
+    @param [in] start_times The frame start times [s].
+    @param [in] acq_times The frame acquisition times [s].
+    @param [in] counts The number of counts (e.g. clusters) in each frame.
+    @param [in] detector The RateChangeDetector (a default one if None).
+    @returns changes A list of the changes flagged, in time order.
+    """
+
+    if detector is None:
+        detector = RateChangeDetector()
+
+    ## The frames, in start time order.
+    frames = sorted(zip(start_times, acq_times, counts), key=lambda f: f[0])
+
+    changes = []
+
+    for st, at, n in frames:
+
+        change = detector.update(float(st), float(at), int(n))
+
+        if change is not None:
+            changes.append(change)
+
+    return changes
+
+def saveDetector(path, detector, settings):
+    """
+    Save a rate change detector's state.
+
+    @param [in] path The path of the state JSON file.
+    @param [in] detector The RateChangeDetector.
+    @param [in] settings A (JSON serialisable) dictionary of the run settings (e.g. the input).
+    """
+    writeJson(path, {"version":RATE_CHANGE_STATE_VERSION, "settings":settings, "detector":detector.getState()})
+
+def loadDetector(path, settings):
+    """
+    Load a saved rate change detector.
+
+    @param [in] path The path of the state JSON file.
+    @param [in] settings The run settings - these must match the saved ones.
+    @returns detector The RateChangeDetector (None if there is no saved state for the same settings).
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except ValueError:
+        lg.info(" * Ignoring the unreadable rate change detector state '%s'." % (path))
+        return None
+
+    if state.get("version") != RATE_CHANGE_STATE_VERSION or state.get("settings") != json.loads(json.dumps(settings)):
+        lg.info(" * The settings have changed - ignoring the rate change detector state '%s'." % (path))
+        return None
+
+    detector = RateChangeDetector()
+
+    detector.setState(state["detector"])
+
+    lg.info(" * Carrying on from %d frames in the rate change detector state '%s'." % (detector.n_frames, path))
+
+    return detector
@@ -14,30 +14,43 @@ import logging as lg
 #...for the data values.
 from datavals import *
 
-#...for processing the file format.
-from helpers import getFormat
+#...for the dataset sources (folders and archives).
+from sources import getSource, FolderSource
 
-#...for the DSC file wrapper class.
-from dsc import DscFile
+#...for the frame cache.
+from framecache import getDefaultFrameCache
 
 #...for the frames.
 from frame import Frame
 
+#...for the timings.
+from instrumentation import timed, count, isEnabled
+
 class Dataset:
     """ Wrapper class for the CERN@school Timepix datasets. """
 
-    def __init__(self, foldername):
+    def __init__(self, foldername, cache=None):
+        """
+        Constructor.
 
-        # Check if the folder exists. If it doesn't, throw an exception.
-        if not os.path.exists(foldername):
-            #raise IOError("The folder doesn't exist.")
-            raise IOError("NOT_EXIST")
+        @param [in] foldername The dataset folder, or a ZIP or tar(.gz) archive of it.
+        @param [in] cache The FrameCache to use (defaults to that given by CERNATSCHOOL_FRAME_CACHE, if set).
+        """
 
         ## The folder name.
         self.foldername = foldername
 
+        ## The source of the dataset's files (raises NOT_EXIST if there isn't one).
+        self.source = getSource(foldername)
+
         ## The list of names of files in the folder (sorted).
-        self.filenames = sorted(glob.glob(foldername + "/*"))
+        self.filenames = self.source.getNames()
+
+        ## The frame cache.
+        self.cache = cache
+        #
+        if cache is None:
+            self.cache = getDefaultFrameCache()
 
         # Throw an exception if the supplied folder is empty.
         if len(self.filenames) == 0:
@@ -57,18 +70,30 @@ class Dataset:
         lg.debug("")
         lg.debug(" Files found in '%s':" % (foldername))
         lg.debug("")
-        for i, fn in enumerate(self.filenames):
+        ## The names of the files (for pairing the data and DSC files).
+        names = set(self.filenames)
+
+        ## The names of the data files found in the frame cache.
+        cached = set()
 
-            ## The basename of the file.
-            bn = os.path.basename(fn)
+        for i, bn in enumerate(self.filenames):
 
             lg.debug(" * '%s'" % (bn))
 
-            # If the "file" is a directory, raise an exception.
-            if os.path.isdir(fn):
-                raise IOError("CONTAINS_DIR")
+            formatval = None
 
-            formatval = getFormat(fn)
+            # Use the frame cache, if possible, to avoid reading the files.
+            if self.cache is not None:
+                if bn.endswith(".dsc") and bn[:-4] in cached:
+                    formatval = -1
+                elif bn + ".dsc" in names:
+                    header = self.cache.load(self.getCacheKey(bn))
+                    if header is not None:
+                        formatval = header["format"]
+                        cached.add(bn)
+
+            if formatval is None:
+                formatval = self.source.getFormat(bn)
 
             ## If the file isn't recognised, raise an exception.
             if formatval == 0:
@@ -105,8 +130,23 @@ class Dataset:
         # Now process the DSC files to extract the information we need
         # to build the data set information.
 
+        ## The data file formats found {data file name:format}, so the DSC
+        ## file wrappers don't need to find them again.
+        formats = dict((self.datfilenames[i], f) for i, f in self.datfileformats.iteritems())
+
         ## The DSC file wrappers.
-        self.dscfiles = sorted([DscFile(foldername + "/" + fn) for fn in self.dscfilenames.values()])
+        self.dscfiles = sorted([self.source.makeDscFile(fn, self.cache, formats.get(fn[:-4])) for fn in self.dscfilenames.values()])
+
+        # The archive (if any) is opened again when the frames are read.
+        self.source.release()
+
+    def close(self):
+        """ Close the dataset's source (e.g. removing the temporary copy of a compressed archive). """
+        self.source.close()
+
+    def getCacheKey(self, bn):
+        """ Get the frame cache key for a data file. """
+        return self.cache.getKey(bn + ".dsc", bn, self.source)
 
 
     def areFormatsConsistent(self):
@@ -151,6 +191,10 @@ class Dataset:
     def getNumberOfDataFiles(self):
         return len(self.datfilenames)
 
+    def getDataFormat(self):
+        """ Gets the format value of the datafiles in the folder supplied. """
+        return self.datfileformats[0]
+
     def getFolderFormat(self):
         """ Gets the format of the datafiles in the folder supplied. """
         if self.areFormatsConsistent():
@@ -158,42 +202,113 @@ class Dataset:
         else:
             return "various"
 
+    def getDscFiles(self):
+        """ Get the DSC file wrappers, sorted by start time. """
+        return self.dscfiles
+
+    def getFileStat(self, df):
+        """
+        Get the sizes and modification times of a frame's data and DSC files.
+
+        @param [in] df The DscFile wrapper for the frame.
+        @returns stat A [data size, data mtime, DSC size, DSC mtime] list.
+        """
+
+        stat = []
+
+        for fn in [df.getDataFilename(), df.getDscFilename()]:
+
+            # The DSC file wrappers of a folder have the full file paths.
+            if isinstance(self.source, FolderSource):
+                fn = os.path.basename(fn)
+
+            path, size, mtime = self.source.stat(fn)
+
+            stat += [size, mtime]
+
+        return stat
+
+    def iterFrames(self, geo, hitmap=None, **kwargs):
+        """
+        Iterate over the frames in the dataset.
+
+        Each frame's data file is only read when the frame is reached,
+        and is released once the frame has been made, so only one frame
+        needs to be held in memory at a time.
+
+        @param [in] geo A (latitude, longitude, altitude) tuple.
+        @param [in] hitmap A HitMapAccumulator to add each frame's hit pixels to (optional).
+        @param [in] kwargs Optional frame properties (see Frame).
+        """
+
+        try:
+            for df in self.dscfiles:
+
+                frame = makeFrame(df, geo, self.getDataFormat(), **kwargs)
+
+                # The hit map is filled as the frames are read.
+                if hitmap is not None:
+                    hitmap.addFrame(frame)
+
+                yield frame
+
+        finally:
+            # Close the archive (if any) once the frames have been read.
+            self.source.release()
+
     def getFrames(self, geo, **kwargs):
         """ Extract the frames from the dataset. """
 
-        # Get the geospatial information from the tuple provided.
-        lat = geo[0]; lon = geo[1]; alt = geo[2]
-
-        ## The list of frames to return.
-        frames = []
-
-        # Loop over the DSC files to get each frame.
-        for df in self.dscfiles:
-            #print df.getDscFilename(), df.getDataFilename()
-
-            frameargs = {\
-                "lat"         : lat, \
-                "lon"         : lon, \
-                "alt"         : alt, \
-                #
-                "chipid"      : df.getChipId(), \
-                "biasvoltage" : df.getBiasVoltage(), \
-                "ikrum"       : df.getIKrum(), \
-                #
-                "starttime"   : df.getStartTime(), \
-                "acqtime"     : df.getAcqTime(), \
-                "width"       : df.getFrameWidth(), \
-                "height"      : df.getFrameHeight(), \
-                "format"      : self.datfileformats[0], \
-                "pixelmap"    : df.getPixelMap(), \
-                "ismc"        : False\
-                }
-
-            # Optional properties.
-            for key, arg in kwargs.iteritems():
-                frameargs[key] = kwargs[key]
-
-            # Add the frame to the list of frames.
-            frames.append(Frame(**frameargs))
-
-        return frames
+        return list(self.iterFrames(geo, **kwargs))
+
+
+@timed("make_frame")
+def makeFrame(df, geo, dataformat, **kwargs):
+    """
+    Make a Frame from a DSC file wrapper.
+
+    The DSC file's pixel map is released once the frame has been made.
+
+    @param [in] df The DscFile wrapper for the frame.
+    @param [in] geo A (latitude, longitude, altitude) tuple.
+    @param [in] dataformat The data file format value.
+    @param [in] kwargs Optional frame properties (see Frame).
+    """
+
+    # Get the geospatial information from the tuple provided.
+    lat = geo[0]; lon = geo[1]; alt = geo[2]
+
+    frameargs = {\
+        "lat"         : lat, \
+        "lon"         : lon, \
+        "alt"         : alt, \
+        #
+        "chipid"      : df.getChipId(), \
+        "biasvoltage" : df.getBiasVoltage(), \
+        "ikrum"       : df.getIKrum(), \
+        #
+        "starttime"   : df.getStartTime(), \
+        "acqtime"     : df.getAcqTime(), \
+        "width"       : df.getFrameWidth(), \
+        "height"      : df.getFrameHeight(), \
+        "format"      : dataformat, \
+        "pixelmap"    : df.getPixelMap(), \
+        "ismc"        : False\
+        }
+
+    # Optional properties.
+    for key, arg in kwargs.iteritems():
+        frameargs[key] = kwargs[key]
+
+    ## The frame.
+    frame = Frame(**frameargs)
+
+    # The frame has the pixel map now.
+    df.releasePixelMap()
+
+    if isEnabled():
+        count("frames")
+        count("pixels", frame.getRawNumberOfPixels())
+        count("klusters", frame.getNumberOfKlusters())
+
+    return frame
@@ -16,6 +16,27 @@ DATA_FILE_TYPES = {
     -1   : "DSC"
     }
 
+## The binary data file formats for each DSC pixel layout.
+BINARY_LAYOUT_FORMATS = {
+    "[X,Y,C]" : 4113,
+    "[X,C]"   : 8209
+    }
+
+## The binary Matrix format (used for all other DSC pixel layouts).
+BINARY_MATRIX_FORMAT = 17
+
+## The NumPy (little-endian) types of the Pixelman data types.
+PIXELMAN_DATA_TYPES = {
+    "i16"    : "<i2",
+    "u16"    : "<u2",
+    "i32"    : "<i4",
+    "u32"    : "<u4",
+    "i64"    : "<i8",
+    "u64"    : "<u8",
+    "float"  : "<f4",
+    "double" : "<f8"
+    }
+
 ACQ_MODES = {
     1 : "Started immediately, Stopped by timer",
     2 : "Started immediately, Stopped by SW trigger",
@@ -20,22 +20,62 @@ from dscvals import *
 from handlers import isChipIdValid, getPixelmanTimeString
 
 #...for the HELPING.
-from helpers import getFormat
+from helpers import getFormat, getDscFrameType
+
+#...for reading the data files.
+from readers import readDataFile, readDataBuffer, getPixelMapFromArrays
+
+#...for the timings.
+from instrumentation import timed
+
+## The DscFile values that aren't kept in the frame cache.
+DSC_UNCACHED_VALUES = [
+    "source",
+    "cache",
+    "cachekey",
+    "dscfilename",
+    "datafilename",
+    "format",
+    "pixel_xs",
+    "pixel_cs",
+    "pixelmap"
+    ]
 
 class DscFile:
     """
     A wrapper class for the Pixelman DSC files.
     """
 
-    def __init__(self, dscfilename):
-        """ The constructor. """
+    def __init__(self, dscfilename, source=None, cache=None, dataformat=None):
+        """
+        The constructor.
+
+        @param [in] dscfilename The DSC file name.
+        @param [in] source The archive source to read the files from (if not on disk).
+        @param [in] cache The FrameCache to use (if any).
+        @param [in] dataformat The data file format, if already known (found from the data file otherwise).
+        """
+
+        ## The archive source (None if the files are on disk).
+        self.__source = source
+
+        ## The frame cache.
+        self.__cache = cache
+
+        ## The frame cache key.
+        self.__cachekey = None
+
+        if source is not None:
+            # Check if the file is in the archive.
+            if not source.has(dscfilename):
+                raise IOError("NOT_EXIST")
 
         # Check if the file exists. If it doesn't, throw an exception.
-        if not os.path.exists(dscfilename):
+        elif not os.path.exists(dscfilename):
             raise IOError("NOT_EXIST")
 
         # Check that the file is, indeed, a file.
-        if not os.path.isfile(dscfilename):
+        elif not os.path.isfile(dscfilename):
             raise IOError("NOT_FILE")
 
         ## The frame width.
@@ -44,6 +84,9 @@ class DscFile:
         ## The frame height.
         self.__fHeight = None
 
+        ## The Pixelman data type of the pixel counts.
+        self.__dataType = None
+
         ## The acquisition mode.
         self.__acqMode = None
 
@@ -98,20 +141,37 @@ class DscFile:
         ## The data file name.
         self.__datafilename = dscfilename[:-4]
 
-        if not os.path.exists(self.__datafilename):
+        if source is not None:
+            if not source.has(self.__datafilename):
+                raise IOError #("MISSING_DAT")
+        elif not os.path.exists(self.__datafilename):
             raise IOError #("MISSING_DAT")
 
-        # Process the DSC file.
-        self.processDscFile()
+        ## The frame cache entry header (None if the frame isn't cached).
+        header = None
+        #
+        if cache is not None:
+            self.__cachekey = cache.getKey(self.__dscfilename, self.__datafilename, source)
+            header = cache.load(self.__cachekey)
 
-        ## The pixel map.
-        self.__pixelmap = {}
+        if header is not None:
+            # Use the DSC file values from the cache.
+            self.setCacheValues(header["dsc"])
+        else:
+            # Process the DSC file.
+            self.processDscFile()
 
-        ## The data file format.
-        self.__format = getFormat(self.__datafilename)
+        ## The pixel X values (read from the data file when first requested).
+        self.__pixel_xs = None
+
+        ## The pixel count values.
+        self.__pixel_cs = None
 
-        # Process the data file.
-        self.processDataFile()
+        ## The pixel map (made from the pixel arrays when first requested).
+        self.__pixelmap = None
+
+        ## The data file format (None until found).
+        self.__format = dataformat
 
     def __lt__(self, other):
         return self.getStartTime() < other.getStartTime()
@@ -128,6 +188,9 @@ class DscFile:
     def getFrameHeight(self):
         return self.__fHeight
 
+    def getDataType(self):
+        return self.__dataType
+
     def getAcqMode(self):
         return self.__acqMode
 
@@ -221,20 +284,62 @@ class DscFile:
     def getBSPreampEnabled(self):
         return self.__bspenabled
 
+    def getPixelArrays(self):
+        """ Get the pixel X and count value arrays, processing the data file if required. """
+        if self.__pixel_xs is None:
+            self.processDataFile()
+        return self.__pixel_xs, self.__pixel_cs
+
     def getPixelMap(self):
+        """ Get the pixel map {X:C}, processing the data file if required. """
+        if self.__pixelmap is None:
+            self.__pixelmap = getPixelMapFromArrays(*self.getPixelArrays())
         return self.__pixelmap
 
+    def getCacheValues(self):
+        """ Get the DSC file values to keep in the frame cache {name:value}. """
+
+        prefix = "_DscFile__"
+
+        return dict((k[len(prefix):], v) for k, v in vars(self).iteritems() \
+            if k.startswith(prefix) and k[len(prefix):] not in DSC_UNCACHED_VALUES)
+
+    def setCacheValues(self, values):
+        """ Set the DSC file values from the frame cache. """
+
+        for k, v in values.iteritems():
+
+            # JSON gives unicode strings.
+            if isinstance(v, unicode):
+                v = str(v)
+
+            setattr(self, "_DscFile__" + str(k), v)
+
+    def releasePixelMap(self):
+        """ Release the pixel data (it will be re-read if requested again). """
+        self.__pixel_xs = None
+        self.__pixel_cs = None
+        self.__pixelmap = None
+
+    @timed("dsc_parse")
     def processDscFile(self):
         """ Process the detector settings file (.dsc). """
 
-        # The DSC file.
-        f = open(self.__dscfilename, "r")
+        if self.__source is not None:
+
+            ## The lines of the DSC file.
+            ls = self.__source.read(self.__dscfilename).splitlines(True)
 
-        ## The lines of the DSC file.
-        ls = f.readlines()
+        else:
 
-        # Close the DSC file.
-        f.close()
+            # The DSC file.
+            f = open(self.__dscfilename, "r")
+
+            ## The lines of the DSC file.
+            ls = f.readlines()
+
+            # Close the DSC file.
+            f.close()
 
         lg.debug("")
 
@@ -259,6 +364,10 @@ class DscFile:
 
         lg.debug(" * Frame dimensions: %d [pix.] x %d [pix.]." % (self.__fWidth, self.__fHeight))
 
+        self.__dataType = getDscFrameType(ls[2])[0]
+
+        lg.debug(" * Pixel count data type: '%s'." % (self.__dataType))
+
         # Loop over the lines of the DSC file.
         for i, l in enumerate(ls):
             #print("%5d: %s" % (i, l.strip()))
@@ -439,26 +548,50 @@ class DscFile:
 
         lg.debug("")
 
+    @timed("data_read")
     def processDataFile(self):
-        """ Process the accompanying Timepix datafile. """
-
-        df = open(self.__datafilename, "r")
-        ls = df.readlines()
-        df.close()
-
-        # Loop over the lines in the file.
-        for j, l in enumerate(ls):
-
-            if   self.__format == 4114: # ASCII xyC.
-                vals = l.strip().split("\t")
-                self.__pixelmap[self.__fHeight * int(vals[1]) + int(vals[0])] = int(vals[2])
-            elif self.__format == 18: # ASCII matrix.
-                vals = [int(val) for val in l.strip().split(" ")]
-                for i, C in enumerate(vals):
-                    if C > 0:
-                        self.__pixelmap[(self.__fHeight * j) + i] = C
-            elif self.__format == 8210: # ASCII XC
-                vals = [int(val) for val in l.strip().split("\t")]
-                self.__pixelmap[vals[0]] = vals[1]
-            else:
-                raise IOError("FRAME_BAD_FORMAT")
+        """ Process the accompanying Timepix datafile (or use the frame cache). """
+
+        if self.__cache is not None:
+
+            header = self.__cache.load(self.__cachekey)
+
+            if header is not None:
+
+                xs, cs = self.__cache.loadPixels(self.__cachekey)
+
+                if xs is not None:
+                    self.__format = header["format"]
+                    self.__pixel_xs = xs; self.__pixel_cs = cs
+                    return None
+
+        self.readDataFile()
+
+        if self.__cache is not None:
+            self.__cache.save(self.__cachekey, self.__format, self.getCacheValues(), self.__pixel_xs, self.__pixel_cs)
+
+    def readDataFile(self):
+        """ Read the pixels from the accompanying Timepix datafile. """
+
+        if self.__source is not None:
+
+            ## The contents of the data file.
+            buf = self.__source.read(self.__datafilename)
+
+            ## The data file format.
+            if self.__format is None:
+                self.__format = self.__source.getFormat(self.__datafilename, buf)
+
+            # Read the pixels from the data file's contents.
+            self.__pixel_xs, self.__pixel_cs = \
+                readDataBuffer(buf, self.__format, self.__fWidth, self.__fHeight, self.__dataType)
+
+            return None
+
+        ## The data file format.
+        if self.__format is None:
+            self.__format = getFormat(self.__datafilename)
+
+        # Read the pixels from the data file.
+        self.__pixel_xs, self.__pixel_cs = \
+            readDataFile(self.__datafilename, self.__format, self.__fWidth, self.__fHeight, self.__dataType)
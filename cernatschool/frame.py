@@ -11,7 +11,7 @@ import logging as lg
 from handlers import getPixelmanTimeString, getPixelsStringFromPixelMap
 
 #...for the Klusters (Clusters).
-from kluster import KlusterFinder
+from kluster import KLUSTER_FINDERS
 
 class Frame:
     """
@@ -198,8 +198,16 @@ class Frame:
 
         # Do the clustering.
 
+        ## The cluster finder to use ("dict" or "array").
+        finder = "dict"
+        if "klusterfinder" in kwargs.keys():
+            finder = kwargs["klusterfinder"]
+        #
+        if finder not in KLUSTER_FINDERS:
+            raise IOError("FRAME_BAD_KLUSTER_FINDER")
+
         ## The frame's cluster finder.
-        self.__kf = KlusterFinder(self.getPixelMap(), self.getWidth(), self.getHeight(), self.isMC(), self.__pixel_mask_map)
+        self.__kf = KLUSTER_FINDERS[finder](self.getPixelMap(), self.getWidth(), self.getHeight(), self.isMC(), self.__pixel_mask_map)
 
         self.__n_klusters = self.__kf.getNumberOfKlusters()
 
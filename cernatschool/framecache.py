@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+An on-disk cache of parsed frames.
+
+Each entry holds what was found in a frame's DSC and data files - the
+DSC file values and the data file format in a JSON header, followed by
+the pixel X (u32) and count arrays - so that the text files don't need
+to be parsed again. Entries are keyed on the paths, sizes and
+modification times of the two files (and, optionally, a hash of their
+contents). The least recently used entries are removed when the cache
+grows beyond its size limit.
+
+Entry layout (little-endian):
+
+* "CSFC" (4 bytes), the entry version (u16), the header length (u32);
+* the JSON header;
+* the pixel X values (u32 x n), then the pixel counts (n values of the
+  type given in the header).
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the binary stuff.
+import struct
+
+#...for the JSON headers.
+import json
+
+#...for the file names and content hashes.
+import hashlib
+
+#...for the temporary files.
+import tempfile
+
+#...for the MATH.
+import numpy as np
+
+## The magic string at the start of a cache entry.
+FRAME_CACHE_MAGIC = "CSFC"
+
+## The cache entry version.
+FRAME_CACHE_VERSION = 1
+
+## The cache entry preamble (magic, version, header length).
+FRAME_CACHE_PREAMBLE = "<4sHI"
+
+## The file extension of the cache entries.
+FRAME_CACHE_EXT = ".frame"
+
+## The environment variable giving the default frame cache path.
+FRAME_CACHE_ENV = "CERNATSCHOOL_FRAME_CACHE"
+
+## The environment variable giving the default frame cache size limit [MB].
+FRAME_CACHE_SIZE_ENV = "CERNATSCHOOL_FRAME_CACHE_SIZE"
+
+class FrameCache:
+    """
+    An on-disk cache of parsed frames.
+
+    @param [in] path The cache folder (created if it doesn't exist).
+    @param [in] maxsize The maximum size of the cache [bytes] (None for no limit).
+    @param [in] usehash Also key the entries on a hash of the files' contents?
+    """
+
+    def __init__(self, path, maxsize=None, usehash=False):
+        """ Constructor. """
+
+        lg.debug(" Instantiating a FrameCache object ('%s')." % (path))
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        ## The cache folder.
+        self.path = path
+
+        ## The maximum size of the cache [bytes].
+        self.maxsize = maxsize
+
+        ## Key the entries on a hash of the files' contents?
+        self.usehash = usehash
+
+        ## The entry headers read so far {entry file name:header}.
+        self.__headers = {}
+
+        ## The (estimated) size of the cache [bytes] - None until first needed.
+        self.__size = None
+
+    def __getstate__(self):
+        """ Only the cache settings are sent to other processes. """
+        return {"path":self.path, "maxsize":self.maxsize, "usehash":self.usehash}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["maxsize"], state["usehash"])
+
+    def getKey(self, dscfilename, datafilename, source=None):
+        """
+        Get the cache key for a frame.
+
+        @param [in] dscfilename The DSC file name.
+        @param [in] datafilename The data file name.
+        @param [in] source The archive source of the files (None if on disk).
+        """
+
+        key = []
+
+        for fn in [dscfilename, datafilename]:
+
+            if source is not None:
+                key += list(source.stat(fn))
+            else:
+                st = os.stat(fn)
+                key += [os.path.abspath(fn), st.st_size, st.st_mtime]
+
+            if self.usehash:
+                if source is not None:
+                    key.append(hashlib.sha1(source.read(fn)).hexdigest())
+                else:
+                    with open(fn, "rb") as f:
+                        key.append(hashlib.sha1(f.read()).hexdigest())
+
+        return key
+
+    def getEntryPath(self, key):
+        """ Get the path of the cache entry for a key. """
+        return os.path.join(self.path, hashlib.sha1(json.dumps(key)).hexdigest() + FRAME_CACHE_EXT)
+
+    def load(self, key):
+        """
+        Get the header of the cache entry for a key.
+
+        @returns header The header {"key", "format", "dsc", "n", "counts"}, or None if there is no (valid) entry.
+        """
+
+        ## The path of the cache entry.
+        entry_path = self.getEntryPath(key)
+
+        if entry_path in self.__headers:
+            return self.__headers[entry_path]
+
+        try:
+            with open(entry_path, "rb") as f:
+
+                magic, version, header_length = \
+                    struct.unpack(FRAME_CACHE_PREAMBLE, f.read(struct.calcsize(FRAME_CACHE_PREAMBLE)))
+
+                if magic != FRAME_CACHE_MAGIC or version != FRAME_CACHE_VERSION:
+                    lg.debug(" Ignoring cache entry '%s' (bad version)." % (entry_path))
+                    return None
+
+                header = json.loads(f.read(header_length))
+
+            # Mark the entry as recently used.
+            os.utime(entry_path, None)
+
+        except (IOError, OSError, struct.error, ValueError):
+            return None
+
+        # Check the key (the JSON round trip makes lists of the values).
+        if header["key"] != json.loads(json.dumps(key)):
+            return None
+
+        header["offset"] = struct.calcsize(FRAME_CACHE_PREAMBLE) + header_length
+
+        self.__headers[entry_path] = header
+
+        return header
+
+    def loadPixels(self, key):
+        """
+        Get the pixel arrays from the cache entry for a key.
+
+        @returns xs NumPy array of the pixel X values (or None if there is no entry).
+        @returns cs NumPy array of the pixel count values (or None if there is no entry).
+        """
+
+        header = self.load(key)
+
+        if header is None:
+            return None, None
+
+        n = header["n"]
+
+        try:
+            with open(self.getEntryPath(key), "rb") as f:
+                f.seek(header["offset"])
+                xs = np.fromfile(f, dtype="<u4", count=n).astype(np.int64)
+                cs = np.fromfile(f, dtype=str(header["counts"]), count=n)
+        except (IOError, OSError):
+            return None, None
+
+        if len(xs) != n or len(cs) != n:
+            return None, None
+
+        if np.issubdtype(cs.dtype, np.integer):
+            return xs, cs.astype(np.int64)
+
+        return xs, cs.astype(np.float64)
+
+    def save(self, key, fmt, dsc, xs, cs):
+        """
+        Add a frame to the cache.
+
+        @param [in] key The cache key (see getKey).
+        @param [in] fmt The data file format value.
+        @param [in] dsc A dictionary of the DSC file values.
+        @param [in] xs NumPy array of the pixel X values.
+        @param [in] cs NumPy array of the pixel count values.
+        """
+
+        ## The count type (kept as it is, so that no counts are lost).
+        counts = np.asarray(cs).dtype.newbyteorder("<").str
+
+        ## The header.
+        header = json.dumps({"key":key, "format":fmt, "dsc":dsc, "n":len(xs), "counts":counts})
+
+        ## The path of the cache entry.
+        entry_path = self.getEntryPath(key)
+
+        # Write the entry to a temporary file first, so that an entry
+        # is never seen half written.
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack(FRAME_CACHE_PREAMBLE, FRAME_CACHE_MAGIC, FRAME_CACHE_VERSION, len(header)))
+            f.write(header)
+            f.write(np.asarray(xs, dtype="<u4").tostring())
+            f.write(np.asarray(cs, dtype=counts).tostring())
+
+        os.rename(tmp_path, entry_path)
+
+        lg.debug(" Added cache entry '%s'." % (entry_path))
+
+        if self.maxsize is not None:
+
+            if self.__size is None:
+                self.__size = self.getSize()
+            else:
+                self.__size += os.path.getsize(entry_path)
+
+            if self.__size > self.maxsize:
+                self.evict()
+
+    def getEntries(self):
+        """ Get the cache entries as a list of (last used time, size, path) tuples. """
+
+        entries = []
+
+        for fn in os.listdir(self.path):
+            if fn.endswith(FRAME_CACHE_EXT):
+                entry_path = os.path.join(self.path, fn)
+                try:
+                    st = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry_path))
+
+        return entries
+
+    def getSize(self):
+        """ Get the total size of the cache entries [bytes]. """
+        return sum(size for t, size, entry_path in self.getEntries())
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache is within its size limit. """
+
+        entries = sorted(self.getEntries())
+
+        self.__size = sum(size for t, size, entry_path in entries)
+
+        for t, size, entry_path in entries:
+
+            if self.__size <= self.maxsize:
+                break
+
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+
+            self.__headers.pop(entry_path, None)
+
+            self.__size -= size
+
+            lg.debug(" Removed cache entry '%s'." % (entry_path))
+
+    def clear(self):
+        """ Remove all of the cache entries. """
+
+        for t, size, entry_path in self.getEntries():
+            os.remove(entry_path)
+
+        self.__headers = {}
+
+        self.__size = 0
+
+def getFrameCacheSize(size_mb=None):
+    """
+    Get the frame cache size limit.
+
+    @param [in] size_mb The size limit [MB] (if None, the CERNATSCHOOL_FRAME_CACHE_SIZE environment variable is used).
+    @returns The size limit [bytes], or None for no limit.
+    """
+
+    if size_mb is None:
+
+        if not os.environ.get(FRAME_CACHE_SIZE_ENV):
+            return None
+
+        try:
+            size_mb = float(os.environ[FRAME_CACHE_SIZE_ENV])
+        except ValueError:
+            raise IOError("* ERROR: bad %s value '%s'!" % (FRAME_CACHE_SIZE_ENV, os.environ[FRAME_CACHE_SIZE_ENV]))
+
+    if size_mb <= 0:
+        raise IOError("* ERROR: the frame cache size must be positive (%s MB given)!" % (size_mb))
+
+    return int(size_mb * 1000000)
+
+def getDefaultFrameCache():
+    """
+    Get the frame cache given by the CERNATSCHOOL_FRAME_CACHE environment variable (None if not set).
+
+    The size limit is given by the CERNATSCHOOL_FRAME_CACHE_SIZE environment variable [MB] (no limit if not set).
+    """
+
+    if os.environ.get(FRAME_CACHE_ENV):
+        return FrameCache(os.environ[FRAME_CACHE_ENV], getFrameCacheSize())
+
+    return None
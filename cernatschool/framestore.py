@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A columnar store of the frame properties.
+
+The frame properties (see FRAME_COLUMNS) are kept in a folder with one
+binary file per column - "<column>.bin", the raw little-endian values -
+and a JSON header, "table.json", giving the number of frames and the
+column types. Frames are added by appending to the column files and
+then rewriting the header, so the header only ever counts complete
+frames - anything beyond them (e.g. from an interrupted write) is
+ignored and overwritten by the next append.
+
+Columns are read on their own (and memory mapped), so e.g. getting the
+number of clusters in each frame only reads that column. The store can
+be exported as the frame properties JSON (frames.json) written by
+earlier versions of process-frames.py.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for the temporary files.
+import tempfile
+
+#...for the MATH.
+import numpy as np
+
+## The frame store version.
+FRAME_STORE_VERSION = 1
+
+## The name of the frame store header file.
+FRAME_STORE_HEADER = "table.json"
+
+## The name of the frame store folder (in the process-frames.py output folder).
+FRAME_STORE_FOLDER = "frames"
+
+## The name of the frame properties JSON (in the process-frames.py output folder).
+FRAME_PROPERTIES_JSON = "frames.json"
+
+## The frame store columns (name, NumPy type), in the frame properties order.
+FRAME_COLUMNS = [
+    ("id",          "S64"),
+    ("chipid",      "S16"),
+    ("hv",          "<f8"),
+    ("ikrum",       "<i4"),
+    ("lat",         "<f8"),
+    ("lon",         "<f8"),
+    ("alt",         "<f8"),
+    ("start_time",  "<i8"),
+    ("end_time",    "<i8"),
+    ("acqtime",     "<f8"),
+    ("n_pixel",     "<u4"),
+    ("occ",         "<u4"),
+    ("occ_pc",      "<f8"),
+    ("n_kluster",   "<u4"),
+    ("n_gamma",     "<u4"),
+    ("n_non_gamma", "<u4"),
+    ("ismc",        "<u1")
+    ]
+
+def getFramePropertiesPath(datapath):
+    """
+    Get the path of the frame properties of a process-frames.py output
+    folder - the frame store header or, for output from older versions
+    of process-frames.py, frames.json.
+    """
+
+    ## The path of the frame store header.
+    header_path = os.path.join(datapath, FRAME_STORE_FOLDER, FRAME_STORE_HEADER)
+
+    if os.path.exists(header_path):
+        return header_path
+
+    ## The path of the frame properties JSON.
+    json_path = os.path.join(datapath, FRAME_PROPERTIES_JSON)
+
+    if os.path.exists(json_path):
+        return json_path
+
+    raise IOError("* ERROR: no frame properties found in '%s'!" % (datapath))
+
+def readFrameColumns(datapath, names):
+    """
+    Read some of the frame properties from a process-frames.py output folder.
+
+    @param [in] datapath The path of the process-frames.py output.
+    @param [in] names The names of the frame properties.
+    @returns cols A dictionary of the frame properties {name:list}.
+    """
+
+    ## The frame properties path.
+    path = getFramePropertiesPath(datapath)
+
+    # Only the columns needed are read from the frame store.
+    if os.path.basename(path) == FRAME_STORE_HEADER:
+        store = FrameStore(os.path.dirname(path))
+        return dict((name, store.getColumn(name).tolist()) for name in names)
+
+    with open(path, "r") as ff:
+        frames = json.load(ff)
+
+    return dict((name, [f[name] for f in frames]) for name in names)
+
+class FrameStore:
+    """
+    Wrapper class for a columnar frame properties store.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor - opens the store, creating it if it doesn't exist.
+
+        @param [in] path The path to the store folder.
+        """
+
+        ## The path to the store folder.
+        self.path = path
+
+        ## The column types {name:NumPy type}.
+        self.dtypes = dict((name, np.dtype(dtype)) for name, dtype in FRAME_COLUMNS)
+
+        ## The number of (complete) frames in the store.
+        self.n = 0
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        ## The path of the header file.
+        header_path = os.path.join(path, FRAME_STORE_HEADER)
+
+        if os.path.exists(header_path):
+
+            with open(header_path, "r") as f:
+                header = json.load(f)
+
+            if header["version"] != FRAME_STORE_VERSION or header["columns"] != [list(col) for col in FRAME_COLUMNS]:
+                raise IOError("FRAME_STORE_BAD_VERSION")
+
+            self.n = header["n"]
+
+        lg.debug(" * Opened frame store '%s' (%d frames)." % (path, self.n))
+
+    def getNumberOfFrames(self):
+        return self.n
+
+    def getColumnNames(self):
+        return [name for name, dtype in FRAME_COLUMNS]
+
+    def getColumnPath(self, name):
+        """ Get the path of a column file. """
+        return os.path.join(self.path, "%s.bin" % (name))
+
+    def getColumn(self, name):
+        """
+        Get a column of the frame properties.
+
+        @param [in] name The name of the column.
+        @returns col A (read-only, memory mapped) NumPy array of the column values.
+        """
+
+        if name not in self.dtypes:
+            raise IOError("FRAME_STORE_BAD_COLUMN")
+
+        if self.n == 0:
+            return np.zeros(0, dtype=self.dtypes[name])
+
+        return np.memmap(self.getColumnPath(name), dtype=self.dtypes[name], mode="r", shape=(self.n,))
+
+    def getColumns(self, names):
+        """ Get some columns of the frame properties {name:column}. """
+        return dict((name, self.getColumn(name)) for name in names)
+
+    def getFrames(self):
+        """
+        Get the properties of each frame.
+
+        @returns frames A list of the frame properties dictionaries (as written by process-frames.py).
+        """
+
+        ## The columns, as lists of Python values.
+        cols = [self.getColumn(name).tolist() for name, dtype in FRAME_COLUMNS]
+
+        # The dictionaries are filled in the column order, so that they
+        # are written out to JSON in the same way as the originals.
+        return [dict(zip(self.getColumnNames(), vals)) for vals in zip(*cols)]
+
+    def writeHeader(self):
+        """ Write the header, via a temporary file, so that it is never seen half written. """
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version":FRAME_STORE_VERSION, "n":self.n, "columns":FRAME_COLUMNS}, f)
+
+        os.rename(tmp_path, os.path.join(self.path, FRAME_STORE_HEADER))
+
+    def append(self, frames):
+        """
+        Add frames to the end of the store.
+
+        @param [in] frames A list of the frame properties dictionaries.
+        """
+
+        if len(frames) == 0:
+            return None
+
+        for name, dtype in FRAME_COLUMNS:
+
+            # Don't silently cut short any strings that don't fit.
+            if self.dtypes[name].kind == "S" and max(len(f[name]) for f in frames) > self.dtypes[name].itemsize:
+                raise IOError("FRAME_STORE_VALUE_TOO_LONG")
+
+            ## The new column values.
+            vals = np.array([f[name] for f in frames], dtype=dtype)
+
+            ## The path of the column file.
+            col_path = self.getColumnPath(name)
+
+            with open(col_path, "r+b" if os.path.exists(col_path) else "wb") as f:
+
+                # Drop anything written after the last complete frame.
+                f.seek(self.n * vals.itemsize)
+                f.truncate()
+
+                f.write(vals.tostring())
+
+        self.n += len(frames)
+
+        self.writeHeader()
+
+    def clear(self):
+        """ Remove all of the frames. """
+
+        self.n = 0
+
+        self.writeHeader()
+
+    def exportJson(self, path):
+        """
+        Export the frame properties to a JSON file (as written by earlier versions of process-frames.py).
+
+        @param [in] path The path of the JSON file.
+        """
+
+        with open(path, "w") as jf:
+            json.dump(self.getFrames(), jf)
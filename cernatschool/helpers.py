@@ -5,6 +5,9 @@
 Various helper functions for processing CERN@school Timepix datasets.
 """
 
+#...for the operating stuff.
+import os
+
 #...for the logging.
 import logging as lg
 
@@ -14,9 +17,15 @@ import numpy as np
 #...for the least squares stuff.
 from scipy.optimize import leastsq
 
+#...for the connected component labelling.
+from scipy import ndimage
+
 #...for the data values.
 from datavals import *
 
+#...for the timings.
+from instrumentation import timed
+
 def getConsistentValue(thelist, error, emptyval=None):
     """
     Function for extracting a consistent value from a list,
@@ -38,65 +47,161 @@ def getConsistentValue(thelist, error, emptyval=None):
         else:
             raise ValueError("Empty list supplied but no empty value given!")
 
-def getFormat(fn):
+## The characters found in the ASCII data and DSC files.
+ASCII_CHARS = "0123456789-+.eE \t\r\n"
+
+def isBinary(head):
+    """
+    Check if the start of a data file is binary (rather than ASCII) data.
+
+    @param [in] head The first bytes of the file.
+    """
+    return len(head.translate(None, ASCII_CHARS)) > 0
+
+def getDscFrameType(l):
+    """
+    Get the data type and pixel layout from a DSC file's frame type line,
+    e.g. "Type=i16 [X,Y,C] width=256 height=256".
+
+    @param [in] l The frame type line.
+    @returns typename The Pixelman data type of the pixel counts (e.g. "i16").
+    @returns layout The pixel layout (e.g. "[X,Y,C]"), or "" if none is given.
+    """
+
+    vals = l.strip().split(" ")
+
+    if not vals[0].startswith("Type="):
+        raise IOError("BAD_FRAME_TYPE")
+
+    ## The pixel layout.
+    layout = ""
+    #
+    for val in vals[1:]:
+        if val.startswith("["):
+            layout = val
+
+    return vals[0].split("=")[1], layout
+
+def getBinaryFormat(dsc):
+    """
+    Get the format of a binary data file from its DSC file.
+
+    Binary files have no delimiters to count, so the pixel layout is
+    taken from the frame type line of the accompanying DSC file.
+
+    @param [in] dsc The contents of the DSC file (None if there isn't one).
+    """
+
+    if dsc is None:
+        lg.debug(" No DSC file found for the binary data file.")
+        return 0
 
-    ## Open the file and look at the first line.
-    with open(fn, "r") as f:
+    ls = dsc.splitlines()
 
-        l = f.readline().strip()
+    try:
+        typename, layout = getDscFrameType(ls[2])
+    except (IndexError, IOError):
+        lg.debug(" The DSC file has no valid frame type line.")
+        return 0
 
-        lg.debug("")
-        lg.debug(" *--> First line is:")
-        lg.debug("\n\n%s\n" % (l))
-        lg.debug("")
+    if typename not in PIXELMAN_DATA_TYPES:
+        lg.debug(" Unsupported Pixelman data type '%s'." % (typename))
+        return 0
 
-        ## The file type value.
-        filetypeval = 0
+    filetypeval = BINARY_LAYOUT_FORMATS.get(layout, BINARY_MATRIX_FORMAT)
 
-        # Is it a DSC file?
-        # TODO: check all possible DSC file starts...
-        if   l == "A000000001":
-            filetypeval = -1
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+    lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
 
-        # Try to break up the first line into tab-separated integers.
+    return filetypeval
 
-        try:
-            ## Values separated by tab
-            tabvals = [int(x) for x in l.split('\t')]
+def getFormatFromBytes(head, dsc=None):
+    """
+    Get the format of a file from its first bytes.
+
+    @param [in] head The first bytes of the file (including all of the first line).
+    @param [in] dsc The contents of the accompanying DSC file, if any (binary files only).
+    """
 
-            lg.debug(" %d tab separated values found in the first line." % (len(tabvals)))
+    l = head.split("\n", 1)[0].strip()
 
-            if len(tabvals) == 2:
-                filetypeval = 8210
-            elif len(tabvals) == 3:
-                filetypeval = 4114
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+    lg.debug("")
+    lg.debug(" *--> First line is:")
+    lg.debug("\n\n%s\n" % (l))
+    lg.debug("")
 
-        except ValueError:
-            lg.debug(" Tab separation into integers failed!")
-            pass
+    ## The file type value.
+    filetypeval = 0
 
-        try:
-            ## Values separated by spaces.
-            spcvals = [int(x) for x in l.split(' ')]
+    # Is it a DSC file?
+    # TODO: check all possible DSC file starts...
+    if   l == "A000000001":
+        filetypeval = -1
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
+
+    # Is it a binary file?
+    if isBinary(head[:1024]):
+        lg.debug(" Binary data found.")
+        return getBinaryFormat(dsc)
 
-            lg.debug(" %d space separated values found in the first line." % (len(spcvals)))
+    # Try to break up the first line into tab-separated integers.
 
-            if len(spcvals) == 256:
-                filetypeval = 18
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+    try:
+        ## Values separated by tab
+        tabvals = [int(x) for x in l.split('\t')]
 
-        except ValueError:
-            lg.debug(" Space separation into integers failed!")
-            pass
+        lg.debug(" %d tab separated values found in the first line." % (len(tabvals)))
 
-        lg.debug(" This is not a valid data file.")
+        if len(tabvals) == 2:
+            filetypeval = 8210
+        elif len(tabvals) == 3:
+            filetypeval = 4114
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
         return filetypeval
 
+    except ValueError:
+        lg.debug(" Tab separation into integers failed!")
+        pass
+
+    try:
+        ## Values separated by spaces.
+        spcvals = [int(x) for x in l.split(' ')]
+
+        lg.debug(" %d space separated values found in the first line." % (len(spcvals)))
+
+        if len(spcvals) == 256:
+            filetypeval = 18
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
+
+    except ValueError:
+        lg.debug(" Space separation into integers failed!")
+        pass
+
+    lg.debug(" This is not a valid data file.")
+    return filetypeval
+
+@timed("format")
+def getFormat(fn):
+    """ Get the format of a file from its first bytes. """
+
+    ## Open the file and look at the first bytes (and the whole first line).
+    with open(fn, "rb") as f:
+
+        head = f.read(1024)
+
+        if "\n" not in head:
+            head += f.readline()
+
+    ## The contents of the DSC file (only needed for binary files).
+    dsc = None
+    #
+    if isBinary(head[:1024]) and os.path.isfile(fn + ".dsc"):
+        with open(fn + ".dsc", "rb") as f:
+            dsc = f.read()
+
+    return getFormatFromBytes(head, dsc)
+
 
 def residuals(p, y, x):
     """ The residual function required by leastsq."""
@@ -116,6 +221,7 @@ def residuals(p, y, x):
     # Return it!
     return res
 
+@timed("linearity")
 def getLinearity(pixel_dict):
     """
     A helper function for finding the linearity of a cluster.
@@ -236,6 +342,109 @@ def getLinearity(pixel_dict):
 
     print("* ERROR - should not reach this point...")
 
+def getLinearities(xs, ys, ks, n):
+    """
+    Find the linearity of one or more clusters with a closed-form fit.
+
+    The line of best fit (minimising the residuals in y, as in
+    getLinearity) is found analytically from the sums of x, y, x^2, y^2
+    and xy for each cluster, so every cluster in a frame is fitted in a
+    single call. The special cases (single pixels, vertical and
+    horizontal lines) are treated as they are in getLinearity.
+
+    @param [in] xs A NumPy array of the pixel x values.
+    @param [in] ys A NumPy array of the pixel y values.
+    @param [in] ks A NumPy array of the cluster number (0 to n-1) of each pixel.
+    @param [in] n The number of clusters.
+    @returns m NumPy array of the gradients of the lines of best fit.
+    @returns c NumPy array of the intercepts of the lines of best fit.
+    @returns sumR NumPy array of the sums of the residuals.
+    @returns lin NumPy array of the linearities, sumR/N_pixels.
+    """
+
+    xs = np.asarray(xs, dtype=np.int64); ys = np.asarray(ys, dtype=np.int64)
+
+    ks = np.asarray(ks, dtype=np.int64)
+
+    # The moment sums for each cluster (exact, as integers).
+    #
+    ## The number of pixels in each cluster.
+    N = np.bincount(ks, minlength=n)
+    #
+    Sx  = np.bincount(ks, weights=xs,    minlength=n).astype(np.int64)
+    Sy  = np.bincount(ks, weights=ys,    minlength=n).astype(np.int64)
+    Sxx = np.bincount(ks, weights=xs*xs, minlength=n).astype(np.int64)
+    Syy = np.bincount(ks, weights=ys*ys, minlength=n).astype(np.int64)
+    Sxy = np.bincount(ks, weights=xs*ys, minlength=n).astype(np.int64)
+
+    ## N^2 times the variance of x.
+    var_x = N*Sxx - Sx*Sx
+
+    ## N^2 times the variance of y.
+    var_y = N*Syy - Sy*Sy
+
+    ## N^2 times the covariance of x and y.
+    cov_xy = N*Sxy - Sx*Sy
+
+    ## The clusters with a (non-trivial) line to fit.
+    is_fit = (N > 1) & (var_x > 0) & (var_y > 0)
+
+    m = np.zeros(n); c = np.zeros(n)
+
+    m[is_fit] = cov_xy[is_fit].astype(np.float64) / var_x[is_fit]
+
+    c[is_fit] = (Sy[is_fit] - m[is_fit]*Sx[is_fit]) / N[is_fit]
+
+    # The perpendicular distances of the pixels from the lines.
+    d = np.fabs(m[ks]*xs - ys + c[ks]) / np.sqrt(1.0 + m[ks]*m[ks])
+
+    sumR = np.where(is_fit, np.bincount(ks, weights=d, minlength=n), 0.0)
+
+    lin = np.where(is_fit, sumR / np.maximum(N, 1), 0.0)
+
+    # Single pixel clusters: c is the pixel's x value (see getLinearity).
+    is_single = (N == 1)
+    #
+    c[is_single] = Sx[is_single]
+
+    # Vertical lines.
+    is_vertical = (N > 1) & (var_x == 0)
+    #
+    m[is_vertical] = 999999.9; c[is_vertical] = 999999.9
+
+    # Horizontal lines.
+    is_horizontal = (N > 1) & (var_x > 0) & (var_y == 0)
+    #
+    c[is_horizontal] = Sy[is_horizontal] / N[is_horizontal]
+
+    return m, c, sumR, lin
+
+@timed("linearity")
+def getLinearityClosedForm(pixel_dict):
+    """
+    A helper function for finding the linearity of a cluster.
+
+    This gives the same results as getLinearity, but uses the
+    closed-form fit from getLinearities rather than scipy's leastsq.
+
+    @param [in] pixel_dict A dictionary of pixel {X:C} values.
+    @returns m The gradient of the line of best fit.
+    @returns c The intercept of the line of best fit.
+    @returns sumR The sum of the residuals.
+    @returns lin The linearity, sumR/N_pixels.
+    """
+
+    # If there are no pixels, return None.
+    if len(pixel_dict) == 0:
+        lg.debug("*--> No pixels provided; exiting returning 0.0!")
+        return None, None, None, None
+
+    Xs = np.fromiter(pixel_dict.iterkeys(), dtype=np.int64, count=len(pixel_dict))
+
+    m, c, sumR, lin = getLinearities(Xs % 256, Xs // 256, np.zeros(len(Xs), dtype=np.int64), 1)
+
+    return m[0], c[0], sumR[0], lin[0]
+
 def countEdgePixels(pixels_dict, rows, cols):
     """ Count the number of edge pixels in the cluster. """
 
@@ -286,3 +495,28 @@ def countEdgePixels(pixels_dict, rows, cols):
             num_edge_pixels += 1
 
     return num_edge_pixels
+
+def labelKlusters(xs, rows, cols):
+    """
+    Label the 8-connected components (klusters) of a set of hit pixels.
+
+    The pixels are placed in a dense rows x cols array, which is then
+    labelled with a two-pass connected component labeller, so the cost
+    is linear in the number of pixels in the frame.
+
+    @param [in] xs A NumPy array of the pixel X (= y*cols + x) values.
+    @param [in] rows The number of rows in the frame.
+    @param [in] cols The number of columns in the frame.
+    @returns labels The kluster label (1 to N) of each pixel in xs.
+    @returns n The number of klusters found.
+    """
+
+    ## The dense hit array.
+    hits = np.zeros((rows, cols), dtype=bool)
+
+    hits.ravel()[xs] = True
+
+    ## The labelled array and the number of klusters found.
+    label_array, n = ndimage.label(hits, structure=np.ones((3, 3), dtype=bool))
+
+    return label_array.ravel()[xs], n
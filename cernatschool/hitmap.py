@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Hot (and noisy) pixel detection from the hit map of a run.
+
+The HitMapAccumulator counts the number of frames each pixel is hit in
+as the frames are read - e.g. with Dataset.iterFrames(hitmap=...) -
+so finding the hot pixels needs no extra pass over the data. If the
+hits were spread evenly over the sensor, the number of hits in each
+pixel would be Poisson distributed with a mean of the total number of
+hits divided by the number of pixels (the run's occupancy). A pixel is
+flagged as hot if it has been hit more often than that is likely to
+happen by chance anywhere on the sensor - the Poisson probability of
+at least that many hits is less than a false alarm probability divided
+by the number of pixels. The mean is worked out again without the hot
+pixels until no more are found.
+
+The hot pixels are written as a mask file in the same format as the
+datasets' masked_pixels.txt ("x<tab>y<tab>1" on each line), and can be
+given straight to the frames as the pixel mask {X:1}.
+
+The hit map can be saved (with the names of the frames counted in it)
+and loaded again, so that incremental runs only need to add the hits
+of the new frames.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for the MATH.
+import numpy as np
+
+#...for the Poisson distribution.
+from scipy.stats import poisson
+
+def readMask(path, width=256):
+    """
+    Read a pixel mask file.
+
+    @param [in] path The path of the mask file ("x<tab>y<tab>C" on each line).
+    @param [in] width The width of the frames [pixels].
+    @returns mask The pixel mask {X:1}, where X = width * y + x.
+    """
+
+    mask = {}
+
+    with open(path, "r") as mpf:
+        for row in mpf.readlines():
+            if row.strip() == "":
+                continue
+            vals = [int(val) for val in row.strip().split("\t")]
+            x = vals[0]; y = vals[1]; X = (width*y) + x; C = 1
+            mask[X] = C
+
+    return mask
+
+def writeMask(path, mask, width=256):
+    """
+    Write a pixel mask file.
+
+    @param [in] path The path of the mask file.
+    @param [in] mask The masked pixels - a {X:1} dictionary or a list of X values.
+    @param [in] width The width of the frames [pixels].
+    """
+
+    with open(path, "w") as mpf:
+        for X in sorted(mask):
+            mpf.write("%d\t%d\t1\n" % (X % width, X // width))
+
+class HitMapAccumulator:
+    """
+    Counts the number of frames each pixel is hit in.
+    """
+
+    def __init__(self, width=256, height=256):
+        """
+        Constructor.
+
+        @param [in] width The width of the frames [pixels].
+        @param [in] height The height of the frames [pixels].
+        """
+
+        ## The width of the frames [pixels].
+        self.width = width
+
+        ## The height of the frames [pixels].
+        self.height = height
+
+        ## The number of frames each pixel is hit in (indexed by X = width * y + x).
+        self.hits = np.zeros(width * height, dtype=np.int64)
+
+        ## The number of frames added.
+        self.n_frames = 0
+
+    def add(self, pixels):
+        """
+        Add a frame's hit pixels.
+
+        @param [in] pixels The frame's pixel map {X:C} (or a sequence of the hit pixels' X values).
+        """
+
+        ## The hit pixels' X values.
+        xs = np.fromiter(pixels, dtype=np.int64, count=len(pixels))
+
+        # Each pixel can only be hit once in a frame.
+        self.hits[xs] += 1
+
+        self.n_frames += 1
+
+    def addFrame(self, frame):
+        """ Add a Frame's (unmasked) hit pixels. """
+        self.add(frame.getPixelMap())
+
+    def merge(self, other):
+        """ Add the hits of another HitMapAccumulator (e.g. from another process). """
+
+        if other.hits.shape != self.hits.shape:
+            raise IOError("HIT_MAP_BAD_SIZE")
+
+        self.hits += other.hits
+        self.n_frames += other.n_frames
+
+    def getHitMap(self):
+        """ Get the hit map as a (height, width) array. """
+        return self.hits.reshape((self.height, self.width))
+
+    def getHotPixels(self, alpha=0.001, max_iterations=10):
+        """
+        Find the hot pixels.
+
+        @param [in] alpha The probability of flagging a pixel in a run without any hot pixels.
+        @param [in] max_iterations The maximum number of times to work out the mean again.
+        @returns hot The (sorted) X values of the hot pixels.
+        """
+
+        ## The number of pixels.
+        n_pixels = len(self.hits)
+
+        ## Which pixels are hot.
+        hot = np.zeros(n_pixels, dtype=bool)
+
+        for i in range(max_iterations):
+
+            ## The expected number of hits in each pixel.
+            mu = self.hits[~hot].mean()
+
+            if mu == 0.0:
+                break
+
+            # The probability of at least that many hits in a pixel.
+            new_hot = poisson.sf(self.hits - 1, mu) < (alpha / n_pixels)
+
+            lg.debug(" * Hit map: expected %f hits per pixel, %d hot pixels." % (mu, new_hot.sum()))
+
+            if np.array_equal(new_hot, hot):
+                break
+
+            hot = new_hot
+
+        return np.flatnonzero(hot)
+
+    def getPixelMask(self, alpha=0.001):
+        """ Get the hot pixels as a pixel mask {X:1}. """
+        return dict((int(X), 1) for X in self.getHotPixels(alpha))
+
+    def writeMask(self, path, alpha=0.001):
+        """ Write the hot pixels to a mask file (see writeMask). """
+
+        ## The hot pixels.
+        hot = self.getHotPixels(alpha)
+
+        writeMask(path, hot.tolist(), self.width)
+
+        lg.info(" * Wrote %d hot pixels (from %d frames) to '%s'." % (len(hot), self.n_frames, path))
+
+        return hot
+
+def saveHitMap(path, hitmap, names):
+    """
+    Save a hit map, via a temporary file in the same folder.
+
+    @param [in] path The path of the hit map (.npz) file.
+    @param [in] hitmap The HitMapAccumulator.
+    @param [in] names The names of the frames counted in the hit map.
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+
+    with os.fdopen(fd, "wb") as f:
+        np.savez_compressed(f, hits=hitmap.hits, n_frames=hitmap.n_frames, \
+            width=hitmap.width, height=hitmap.height, names=np.array(sorted(names), dtype=str))
+
+    os.rename(tmp_path, path)
+
+def loadHitMap(path):
+    """
+    Load a saved hit map.
+
+    @param [in] path The path of the hit map (.npz) file.
+    @returns hitmap The HitMapAccumulator.
+    @returns names The names of the frames counted in the hit map.
+    """
+
+    npz = np.load(path)
+
+    hitmap = HitMapAccumulator(int(npz["width"]), int(npz["height"]))
+
+    hitmap.hits[:] = npz["hits"]
+    hitmap.n_frames = int(npz["n_frames"])
+
+    return hitmap, npz["names"].tolist()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Timers and counters for finding where the time goes in a run.
+
+The instrumentation is off by default. The timed functions then only
+pay for a check of a flag - the timings are only recorded once
+enable() has been called. Timers are inclusive, so a timed function
+called from another is counted in both.
+
+Each worker process keeps its own timings. These can be taken with
+drain() and added to the main process's timings with merge(). Worker
+processes should be started with initWorker(), so that the timings a
+forked worker inherits from its parent aren't sent back and counted
+twice.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the timing.
+import timeit
+
+# Import the JSON library.
+import json
+
+#...for the decorators.
+import functools
+
+#...for the MATH.
+import numpy as np
+
+## The timings - whether they're being recorded, the timer samples
+## {name:[durations [s]]} and the counters {name:count}.
+TIMINGS = {"enabled":False, "timers":{}, "counters":{}}
+
+def enable():
+    """ Start recording the timings. """
+    TIMINGS["enabled"] = True
+
+def disable():
+    """ Stop recording the timings. """
+    TIMINGS["enabled"] = False
+
+def setEnabled(enabled):
+    """ Record the timings (or not) - e.g. as a worker process initialiser. """
+    TIMINGS["enabled"] = enabled
+
+def initWorker(enabled):
+    """
+    Worker process initialiser - record the timings (or not), starting
+    with none (rather than those inherited from the parent process).
+    """
+    setEnabled(enabled)
+    reset()
+
+def isEnabled():
+    return TIMINGS["enabled"]
+
+def reset():
+    """ Clear the timings recorded so far. """
+    TIMINGS["timers"] = {}
+    TIMINGS["counters"] = {}
+
+def addTime(name, dt):
+    """ Add a sample [s] to a timer. """
+    TIMINGS["timers"].setdefault(name, []).append(dt)
+
+def count(name, n=1):
+    """ Add to a counter (if the timings are being recorded). """
+    if TIMINGS["enabled"]:
+        TIMINGS["counters"][name] = TIMINGS["counters"].get(name, 0) + n
+
+def timed(name):
+    """
+    Decorator timing each call of a function.
+
+    @param [in] name The name of the timer.
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if not TIMINGS["enabled"]:
+                return func(*args, **kwargs)
+
+            t0 = timeit.default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                addTime(name, timeit.default_timer() - t0)
+
+        return wrapper
+
+    return decorator
+
+def drain():
+    """
+    Take the timings recorded so far (e.g. in a worker process), clearing them.
+
+    @returns timings The {"timers", "counters"} dictionary (None if the timings aren't being recorded).
+    """
+
+    if not TIMINGS["enabled"]:
+        return None
+
+    timings = {"timers":TIMINGS["timers"], "counters":TIMINGS["counters"]}
+
+    reset()
+
+    return timings
+
+def merge(timings):
+    """ Add timings taken with drain() (e.g. from a worker process) to this process's timings. """
+
+    if timings is None:
+        return None
+
+    for name, dts in timings["timers"].iteritems():
+        TIMINGS["timers"].setdefault(name, []).extend(dts)
+
+    for name, n in timings["counters"].iteritems():
+        TIMINGS["counters"][name] = TIMINGS["counters"].get(name, 0) + n
+
+def getSummary(wall_time=None):
+    """
+    Summarise the timings.
+
+    @param [in] wall_time The run's wall clock time [s] (for the rates).
+    @returns summary Dictionary of the timer statistics, counters and rates.
+    """
+
+    timers = {}
+
+    for name, dts in TIMINGS["timers"].iteritems():
+
+        dts = np.array(dts)
+
+        p50, p90, p99 = np.percentile(dts, [50, 90, 99])
+
+        timers[name] = {
+            "n"        : len(dts),
+            "total_s"  : float(dts.sum()),
+            "mean_ms"  : 1000.0 * float(dts.mean()),
+            "p50_ms"   : 1000.0 * float(p50),
+            "p90_ms"   : 1000.0 * float(p90),
+            "p99_ms"   : 1000.0 * float(p99),
+            "max_ms"   : 1000.0 * float(dts.max())
+            }
+
+    summary = {"timers":timers, "counters":dict(TIMINGS["counters"]), "wall_time_s":wall_time}
+
+    if wall_time:
+        summary["frames_per_s"] = TIMINGS["counters"].get("frames", 0) / wall_time
+        summary["pixels_per_s"] = TIMINGS["counters"].get("pixels", 0) / wall_time
+
+    return summary
+
+def logSummary(summary):
+    """ Write a summary of the timings (see getSummary) to the log. """
+
+    lg.info(" *")
+    lg.info(" * Timings")
+    lg.info(" *---------")
+    lg.info(" * %-16s | %7s | %10s | %9s | %9s | %9s" % ("Timer", "Calls", "Total [s]", "p50 [ms]", "p90 [ms]", "p99 [ms]"))
+    #
+    for name, t in sorted(summary["timers"].iteritems(), key=lambda item: -item[1]["total_s"]):
+        lg.info(" * %-16s | %7d | %10.3f | %9.3f | %9.3f | %9.3f" % \
+            (name, t["n"], t["total_s"], t["p50_ms"], t["p90_ms"], t["p99_ms"]))
+    #
+    for name, n in sorted(summary["counters"].iteritems()):
+        lg.info(" * Counter %-16s: %d" % (name, n))
+    #
+    if summary["wall_time_s"]:
+        lg.info(" * Wall time: %.3f [s] (%.2f frames/s, %.0f pixels/s)" % \
+            (summary["wall_time_s"], summary["frames_per_s"], summary["pixels_per_s"]))
+    lg.info(" *")
+
+def writeSummary(path, wall_time=None):
+    """
+    Write a summary of the timings to the log and to a JSON file.
+
+    @param [in] path The path of the JSON file.
+    @param [in] wall_time The run's wall clock time [s] (for the rates).
+    """
+
+    summary = getSummary(wall_time)
+
+    logSummary(summary)
+
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+    return summary
@@ -20,7 +20,16 @@ from datavals import *
 from pixel import *
 
 #...for the linearity calculations.
-from helpers import getLinearity, countEdgePixels
+from helpers import getLinearityClosedForm, countEdgePixels
+
+#...for the connected component labelling.
+from helpers import labelKlusters
+
+#...for the kluster property tables.
+from klustertable import KlusterTable
+
+#...for the timings.
+from instrumentation import timed
 
 class Kluster:
     """
@@ -224,6 +233,7 @@ class Kluster:
         rad = self.getRadiusUW()
         return npix == 1 or npix == 2 or (npix==3 and rad<TRIPIXEL_RADIUS) or (npix==4 and rad<TETRAPIXEL_RADIUS)
 
+    @timed("kluster_process")
     def process(self, pixels):
         #
         # Note that the pixels are stored in and obtained from the KlusterFinder.
@@ -310,7 +320,7 @@ class Kluster:
 
         # Linearity information
         #-----------------------
-        self.__lin_m, self.__lin_c, self.__lin_sumR, self.__linearity = getLinearity(self.__pixel_dict)
+        self.__lin_m, self.__lin_c, self.__lin_sumR, self.__linearity = getLinearityClosedForm(self.__pixel_dict)
 
         # Edge pixel information.
         self.__n_edge = countEdgePixels(self.__pixel_dict, self.__frame_rows, self.__frame_cols)
@@ -360,6 +370,54 @@ class Kluster:
         lg.debug("* Number of edge pixels    = %5d" % (self.__n_edge))
         lg.debug("*")
 
+    def processFromTable(self, table, i):
+        """
+        Set the kluster properties from a row of a frame's KlusterTable.
+
+        @param [in] table The KlusterTable for the originating frame.
+        @param [in] i The kluster's row in the table.
+        """
+
+        row = table.getRow(i)
+
+        self.pixel_xy_list = table.getPixelXs(i).tolist()
+
+        self.total_counts = row["totalcounts"]
+
+        self.__pixel_dict = table.getPixelMap(i)
+
+        self.pixels_string = table.getPixelsString(i)
+
+        self.__xmin, self.__xmax = row["xmin"], row["xmax"]
+
+        self.__ymin, self.__ymax = row["ymin"], row["ymax"]
+
+        self.__width, self.__height = row["width"], row["height"]
+
+        self.__x_uw, self.__y_uw = row["x_uw"], row["y_uw"]
+
+        self.__r_uw, self.__rho_uw = row["radius_uw"], row["density_uw"]
+
+        self.__total_counts = row["totalcounts"]
+
+        self.__count_max = row["maxcounts"]
+
+        self.__lin_m, self.__lin_c = row["lin_m"], row["lin_c"]
+
+        self.__lin_sumR, self.__linearity = row["lin_sumofres"], row["lin_linearity"]
+
+        self.__n_edge = row["n_edgepixels"]
+
+        self.__outer_pixels_frac = row["edgefrac"]
+
+        self.__inner_pixels_frac = row["innerfrac"]
+
+        self.__is_edge_kluster = row["isedgekluster"]
+
+        # TMP
+        self.__energy_total = 0.0
+        self.__energy_max = 0.0
+
     def getKlusterPropertiesJson(self):
 
         m, c, sumR = self.getLineOfBestFitValues()
@@ -407,6 +465,7 @@ class KlusterFinder:
     dir_x = [-1, -1,  0,  1,  1,  1,  0, -1]
     dir_y = [ 0,  1,  1,  1,  0, -1, -1, -1]
 
+    @timed("kluster_find")
     def __init__(self, data, r, c, ismc, maskdict={}):
 
         """
@@ -527,6 +586,12 @@ class KlusterFinder:
             # end of loop over blobs
             print "DEBUG:------------------------------"
 
+        # Calculate the blob properties and count the gamma candidates.
+        self.processKlusters()
+
+    def processKlusters(self):
+        """ Calculate the blob properties and count the gamma candidates. """
+
         ## The number of gamma candidates.
         self.__n_gammas = 0
 
@@ -542,7 +607,7 @@ class KlusterFinder:
         ## The number of tetrapixel candidates.
         self.__n_g4 = 0
 
-        # Calculate the blob properties
+        # Calculate the blob properties.
         for b in self.blob_list:
             b.process(self.pixels)
 
@@ -594,6 +659,135 @@ class KlusterFinder:
         return self.__n_g4
 
 
+class ArrayKlusterFinder(KlusterFinder):
+    """
+    Finds Klusters (blobs) in Timepix frames using an array-based labeller.
+
+    Rather than building a neighbour dictionary for each pixel and growing
+    each blob pixel by pixel, the hit pixels are placed in a dense array
+    and the 8-connected components are labelled in a single pass. The
+    blob properties are then calculated for all of the blobs at once
+    (see the KlusterTable), and the Kluster objects themselves are only
+    created if the list of klusters is requested.
+
+    The blobs found - and the order in which they are listed - are the
+    same as those found by the KlusterFinder; the pixels within each
+    blob are listed in order of their X value.
+    """
+
+    @timed("kluster_find")
+    def __init__(self, data, r, c, ismc, maskdict={}):
+
+        """
+        Constructor.
+
+        @param [in] data A dictionary of pixel data - {X:C}.
+        @param [in] r The number of rows in the originating frame.
+        @param [in] c The number of columns in the originating frame.
+        @param [in] ismc Is the cluster from simulated data?
+        @param [in] maskdict A dictionary of masked pixels.
+        """
+        lg.debug(""); lg.debug(" Instantiating an array cluster finder object."); lg.debug("")
+
+        self.dbg = False
+
+        self.blob_list = None
+
+        self.rows = r
+
+        self.cols = c
+
+        ## Are we looking at simulated data?
+        self.__is_mc = ismc
+
+        # Build the pixel map the same way as the KlusterFinder, so that
+        # the blobs are seeded (and so listed) in the same order.
+        pixel_map = {X: C for X, C in data.iteritems()}
+
+        # Remove the masked pixels from the data.
+        if maskdict is not None:
+            for X in maskdict:
+                if X in pixel_map:
+                    del pixel_map[X]
+
+        ## The map of {X:C} in the order the KlusterFinder visits the pixels.
+        ordered_map = {X: C for X, C in pixel_map.iteritems()}
+
+        ## The pixel X values.
+        xs = np.fromiter(ordered_map.iterkeys(), dtype=np.int64, count=len(ordered_map))
+
+        ## The pixel count values.
+        cs = np.fromiter(ordered_map.itervalues(), dtype=np.int64, count=len(ordered_map))
+
+        ## The kluster label of each pixel and the number of klusters.
+        labels, n_klusters = labelKlusters(xs, self.rows, self.cols)
+
+        ## The table row of each kluster label (label 0 is unused).
+        rows_of_labels = np.zeros(n_klusters + 1, dtype=np.int64)
+
+        if n_klusters > 0:
+
+            # Order the klusters by the first pixel visited in each one...
+            _, first_seen = np.unique(labels, return_index=True)
+            #
+            kluster_order = labels[np.sort(first_seen)]
+
+            # ...then by size (largest first), as the KlusterFinder does.
+            sizes = np.bincount(labels)[kluster_order]
+            #
+            kluster_order = kluster_order[np.argsort(-sizes, kind="mergesort")]
+
+            rows_of_labels[kluster_order] = np.arange(n_klusters)
+
+        ## The table of kluster properties.
+        self.__table = KlusterTable(xs, cs, rows_of_labels[labels], n_klusters, self.rows, self.cols)
+
+        ## The gamma candidate counts.
+        self.__n_g1, self.__n_g2, self.__n_g3, self.__n_g4 = self.__table.getGammaCounts()
+
+    def getKlusterTable(self):
+        return self.__table
+
+    def getNumberOfKlusters(self):
+        return self.__table.getNumberOfKlusters()
+
+    def getListOfKlusters(self):
+        """ Get the list of Klusters, creating them if required. """
+
+        if self.blob_list is None:
+
+            self.blob_list = []
+
+            for i in range(self.__table.getNumberOfKlusters()):
+                blob = Kluster(self.rows, self.cols, self.__is_mc)
+                blob.processFromTable(self.__table, i)
+                self.insert(blob)
+
+        return self.blob_list
+
+    def getNumberOfGammas(self):
+        return self.__n_g1 + self.__n_g2 + self.__n_g3 + self.__n_g4
+
+    def getNumberOfMonopixels(self):
+        return self.__n_g1
+
+    def getNumberOfBipixels(self):
+        return self.__n_g2
+
+    def getNumberOfTripixelGammas(self):
+        return self.__n_g3
+
+    def getNumberOfTetrapixelGammas(self):
+        return self.__n_g4
+
+
+## The available cluster finders (see the Frame "klusterfinder" argument).
+KLUSTER_FINDERS = {
+    "dict"  : KlusterFinder,
+    "array" : ArrayKlusterFinder
+    }
+
+
 
 #class KlustersModel(QSqlRelationalTableModel, Table):
 #    """
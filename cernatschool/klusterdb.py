@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+An SQLite database of the kluster properties.
+
+The Klusters table has a row for each kluster found in the frames
+processed, with the kluster properties of the KlusterTable (the
+columns of the old KlustersModel), whether the kluster is from a
+Monte Carlo simulation and the ID of the frame it was found in.
+Each frame's klusters are added in one go (with executemany), and the
+properties can be read back a column at a time - e.g. for histograms -
+without finding the klusters again.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the database.
+import sqlite3
+
+#...for the MATH.
+import numpy as np
+
+#...for the kluster property columns.
+from klustertable import KLUSTER_TABLE_COLUMNS
+
+## The SQL types of the kluster property columns {name:type}.
+KLUSTER_COLUMN_TYPES = {
+    "size"          : "INTEGER",
+    "xmin"          : "INTEGER",
+    "xmax"          : "INTEGER",
+    "ymin"          : "INTEGER",
+    "ymax"          : "INTEGER",
+    "width"         : "INTEGER",
+    "height"        : "INTEGER",
+    "x_uw"          : "REAL",
+    "y_uw"          : "REAL",
+    "radius_uw"     : "REAL",
+    "density_uw"    : "REAL",
+    "totalcounts"   : "INTEGER",
+    "maxcounts"     : "INTEGER",
+    "lin_m"         : "REAL",
+    "lin_c"         : "REAL",
+    "lin_sumofres"  : "REAL",
+    "lin_linearity" : "REAL",
+    "n_edgepixels"  : "INTEGER",
+    "edgefrac"      : "REAL",
+    "innerfrac"     : "REAL",
+    "isedgekluster" : "INTEGER",
+    "ismc"          : "INTEGER",
+    "frameid"       : "TEXT"
+    }
+
+## The columns of the Klusters table (after the row ID), in order.
+KLUSTER_DB_COLUMNS = KLUSTER_TABLE_COLUMNS + ["ismc", "frameid"]
+
+def getKlusterRows(table, frameid, ismc=False):
+    """
+    Get the Klusters table rows for the klusters in a frame.
+
+    @param [in] table The frame's KlusterTable.
+    @param [in] frameid The frame ID.
+    @param [in] ismc Is the frame from a Monte Carlo simulation?
+    @returns rows A list of the row tuples (in KLUSTER_DB_COLUMNS order).
+    """
+
+    n = table.getNumberOfKlusters()
+
+    if n == 0:
+        return []
+
+    ## The columns, as lists of Python values.
+    cols = [table.getColumn(name).tolist() for name in KLUSTER_TABLE_COLUMNS]
+
+    return [row + (int(ismc), frameid) for row in zip(*cols)]
+
+class KlusterDatabase:
+    """
+    Wrapper class for the kluster properties database.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor - opens the database, creating the Klusters table if needed.
+
+        @param [in] path The path of the SQLite database file.
+        """
+
+        ## The path of the database file.
+        self.path = path
+
+        ## The database connection.
+        self.db = sqlite3.connect(path)
+
+        self.db.execute("CREATE TABLE IF NOT EXISTS Klusters (id INTEGER PRIMARY KEY, %s)" % \
+            (", ".join("%s %s NOT NULL" % (name, KLUSTER_COLUMN_TYPES[name]) for name in KLUSTER_DB_COLUMNS)))
+
+        self.db.execute("CREATE INDEX IF NOT EXISTS KlustersFrameId ON Klusters (frameid)")
+
+        self.db.commit()
+
+        lg.debug(" * Opened kluster database '%s'." % (path))
+
+    def getNumberOfKlusters(self):
+        return self.db.execute("SELECT COUNT(*) FROM Klusters").fetchone()[0]
+
+    def addKlusters(self, rows):
+        """
+        Add klusters to the database (committed with commit()).
+
+        @param [in] rows A list of the row tuples (see getKlusterRows).
+        """
+
+        self.db.executemany("INSERT INTO Klusters (%s) VALUES (%s)" % \
+            (", ".join(KLUSTER_DB_COLUMNS), ", ".join(["?"] * len(KLUSTER_DB_COLUMNS))), rows)
+
+    def removeFrame(self, frameid):
+        """ Remove the klusters of a frame (committed with commit()). """
+        self.db.execute("DELETE FROM Klusters WHERE frameid = ?", (frameid,))
+
+    def clear(self):
+        """ Remove all of the klusters. """
+        self.db.execute("DELETE FROM Klusters")
+        self.db.commit()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def getColumn(self, name, where=None):
+        """
+        Get a column of the kluster properties.
+
+        @param [in] name The name of the column.
+        @param [in] where An SQL condition selecting the klusters (e.g. "isedgekluster = 0").
+        @returns col A NumPy array of the column values (in the order the klusters were added).
+        """
+
+        return self.getColumns([name], where)[name]
+
+    def getColumns(self, names, where=None):
+        """
+        Get some columns of the kluster properties.
+
+        @param [in] names The names of the columns.
+        @param [in] where An SQL condition selecting the klusters (e.g. "isedgekluster = 0").
+        @returns cols A dictionary of the columns {name:NumPy array}.
+        """
+
+        for name in names:
+            if name not in KLUSTER_COLUMN_TYPES:
+                raise IOError("KLUSTER_DB_BAD_COLUMN")
+
+        ## The query.
+        query = "SELECT %s FROM Klusters" % (", ".join(names))
+        #
+        if where is not None:
+            query += " WHERE %s" % (where)
+        #
+        query += " ORDER BY id"
+
+        ## The rows found.
+        rows = self.db.execute(query).fetchall()
+
+        cols = {}
+
+        for i, name in enumerate(names):
+
+            if KLUSTER_COLUMN_TYPES[name] == "INTEGER":
+                cols[name] = np.array([row[i] for row in rows], dtype=np.int64)
+            elif KLUSTER_COLUMN_TYPES[name] == "REAL":
+                cols[name] = np.array([row[i] for row in rows], dtype=np.float64)
+            else:
+                cols[name] = np.array([row[i] for row in rows])
+
+        return cols
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Columnar tables of the kluster properties for a whole frame.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the data values.
+from datavals import *
+
+#...for the linearity calculations.
+from helpers import getLinearities
+
+## The x and y offsets of the eight neighbouring pixels.
+NEIGHBOUR_DIR_X = [-1, -1,  0,  1,  1,  1,  0, -1]
+NEIGHBOUR_DIR_Y = [ 0,  1,  1,  1,  0, -1, -1, -1]
+
+## The kluster property columns, in KlustersModel order.
+KLUSTER_TABLE_COLUMNS = [
+    "size",
+    "xmin",
+    "xmax",
+    "ymin",
+    "ymax",
+    "width",
+    "height",
+    "x_uw",
+    "y_uw",
+    "radius_uw",
+    "density_uw",
+    "totalcounts",
+    "maxcounts",
+    "lin_m",
+    "lin_c",
+    "lin_sumofres",
+    "lin_linearity",
+    "n_edgepixels",
+    "edgefrac",
+    "innerfrac",
+    "isedgekluster"
+    ]
+
+## The linearity columns (calculated on demand, for all klusters at once).
+LINEARITY_COLUMNS = ["lin_m", "lin_c", "lin_sumofres", "lin_linearity"]
+
+class KlusterTable:
+    """
+    A columnar table of the properties of all of the klusters in a frame.
+
+    The properties are calculated for every kluster at once with grouped
+    NumPy reductions over the frame's pixels, rather than kluster by
+    kluster. Row i of each column describes kluster i.
+
+    @param [in] xs A NumPy array of the pixel X (= y*cols + x) values.
+    @param [in] cs A NumPy array of the pixel count values.
+    @param [in] ks A NumPy array of the kluster (row) number of each pixel.
+    @param [in] n The number of klusters.
+    @param [in] rows The number of rows in the frame.
+    @param [in] cols The number of columns in the frame.
+    """
+
+    def __init__(self, xs, cs, ks, n, rows, cols):
+        """ Constructor. """
+
+        lg.debug(" Instantiating a KlusterTable object.")
+
+        ## The number of klusters.
+        self.__n = n
+
+        ## The number of rows in the frame.
+        self.__frame_rows = rows
+
+        ## The number of columns in the frame.
+        self.__frame_cols = cols
+
+        # Group the pixels by kluster, in X order within each kluster.
+        order = np.lexsort((xs, ks))
+
+        ## The pixel X values, grouped by kluster.
+        self.__xs = np.asarray(xs, dtype=np.int64)[order]
+
+        ## The pixel count values, grouped by kluster.
+        self.__cs = np.asarray(cs, dtype=np.int64)[order]
+
+        ## The kluster number of each pixel.
+        self.__ks = np.asarray(ks, dtype=np.int64)[order]
+
+        ## The index of the first pixel of each kluster.
+        self.__starts = np.searchsorted(self.__ks, np.arange(n + 1))
+
+        ## The table columns {name:array}.
+        self.__columns = {}
+
+        if n > 0:
+            self.__process()
+
+    def __process(self):
+        """ Calculate the kluster properties. """
+
+        n = self.__n; ks = self.__ks; starts = self.__starts[:-1]
+
+        ## The pixel x values.
+        px = (self.__xs % self.__frame_cols).astype(np.float64)
+
+        ## The pixel y values.
+        py = (self.__xs // self.__frame_cols).astype(np.float64)
+
+        cols = self.__columns
+
+        # The kluster sizes [pixels].
+        size = np.bincount(ks, minlength=n)
+        #
+        cols["size"] = size
+
+        # The bounding boxes.
+        cols["xmin"] = np.minimum.reduceat(px, starts)
+        cols["xmax"] = np.maximum.reduceat(px, starts)
+        cols["ymin"] = np.minimum.reduceat(py, starts)
+        cols["ymax"] = np.maximum.reduceat(py, starts)
+        #
+        cols["width"]  = cols["xmax"] - cols["xmin"] + 1
+        cols["height"] = cols["ymax"] - cols["ymin"] + 1
+
+        # The unweighted kluster positions.
+        x_uw = np.bincount(ks, weights=px, minlength=n) / size
+        y_uw = np.bincount(ks, weights=py, minlength=n) / size
+        #
+        cols["x_uw"] = x_uw
+        cols["y_uw"] = y_uw
+
+        # The kluster radius is the maximum distance of a pixel from the centre.
+        r_i = np.sqrt((px - x_uw[ks])**2 + (py - y_uw[ks])**2)
+        #
+        radius = np.maximum.reduceat(r_i, starts)
+        #
+        cols["radius_uw"] = radius
+
+        # The spatial density (zero for single pixel klusters).
+        density = np.zeros(n)
+        #
+        has_area = radius > 0.0
+        #
+        density[has_area] = size[has_area] / (radius[has_area]**2 * np.pi)
+        #
+        cols["density_uw"] = density
+
+        # The kluster counts.
+        cols["totalcounts"] = np.bincount(ks, weights=self.__cs, minlength=n).astype(np.int64)
+        cols["maxcounts"]   = np.maximum.reduceat(self.__cs, starts).astype(np.float64)
+
+        # Edge pixels - pixels with one or more neighbours outside the kluster.
+        #
+        ## A (padded) map of the kluster number (+1) of each pixel.
+        kmap = np.zeros((self.__frame_rows + 2, self.__frame_cols + 2), dtype=np.int64)
+        #
+        ix = px.astype(np.int64) + 1; iy = py.astype(np.int64) + 1
+        #
+        kmap[iy, ix] = ks + 1
+        #
+        is_edge_pixel = np.zeros(len(ks), dtype=bool)
+        #
+        for dx, dy in zip(NEIGHBOUR_DIR_X, NEIGHBOUR_DIR_Y):
+            is_edge_pixel |= (kmap[iy + dy, ix + dx] != ks + 1)
+        #
+        n_edge = np.bincount(ks, weights=is_edge_pixel, minlength=n).astype(np.int64)
+        #
+        cols["n_edgepixels"] = n_edge
+        cols["edgefrac"]     = n_edge / size.astype(np.float64)
+        cols["innerfrac"]    = 1.0 - cols["edgefrac"]
+
+        # Is the kluster on the edge of the frame?
+        on_frame_edge = (px == 0) | (py == 0) | \
+                        (px == self.__frame_cols - 1) | (py == self.__frame_rows - 1)
+        #
+        cols["isedgekluster"] = np.bincount(ks, weights=on_frame_edge, minlength=n) > 0
+
+    def __processLinearity(self):
+        """ Calculate the linearity of each kluster. """
+
+        lin = getLinearities(self.__xs % self.__frame_cols, self.__xs // self.__frame_cols, self.__ks, self.__n)
+
+        for name, vals in zip(LINEARITY_COLUMNS, lin):
+            self.__columns[name] = vals
+
+    def getNumberOfKlusters(self):
+        return self.__n
+
+    def getColumnNames(self):
+        return KLUSTER_TABLE_COLUMNS
+
+    def getColumn(self, name):
+        """ Get a column (NumPy array) of the table. """
+
+        if name not in KLUSTER_TABLE_COLUMNS:
+            raise IOError("BAD_KLUSTER_TABLE_COLUMN")
+
+        if self.__n == 0:
+            return np.array([])
+
+        if name in LINEARITY_COLUMNS and name not in self.__columns:
+            self.__processLinearity()
+
+        return self.__columns[name]
+
+    def getPixelXs(self, i):
+        """ Get the X values of the pixels in kluster i. """
+        return self.__xs[self.__starts[i]:self.__starts[i+1]]
+
+    def getPixelCounts(self, i):
+        """ Get the count values of the pixels in kluster i. """
+        return self.__cs[self.__starts[i]:self.__starts[i+1]]
+
+    def getPixelMap(self, i):
+        """ Get the {X:C} pixel dictionary for kluster i. """
+        return dict(zip(self.getPixelXs(i).tolist(), [float(C) for C in self.getPixelCounts(i).tolist()]))
+
+    def getPixelsString(self, i):
+        """ Get the pixel JSON string for kluster i. """
+
+        s = "pixels = [\n"
+
+        for X, C in zip(self.getPixelXs(i).tolist(), self.getPixelCounts(i).tolist()):
+            s += "  {\"x\":%d, \"y\":%d, \"c\":%d},\n" % (X % self.__frame_cols, X // self.__frame_cols, C)
+
+        s += "]"
+
+        return s
+
+    def getRow(self, i):
+        """ Get all of the properties of kluster i {name:value}. """
+        return dict((name, self.getColumn(name)[i].item()) for name in KLUSTER_TABLE_COLUMNS)
+
+    def getKlusterPropertiesJson(self, i):
+        """ Get the kluster properties as served by Kluster.getKlusterPropertiesJson. """
+
+        row = self.getRow(i)
+
+        return dict((name, row[name]) for name in KLUSTER_TABLE_COLUMNS[:17])
+
+    def getGammaCounts(self):
+        """
+        Count the gamma candidates in the frame.
+
+        @returns n_g1 The number of monopixel candidates.
+        @returns n_g2 The number of bipixel candidates.
+        @returns n_g3 The number of tripixel gamma candidates.
+        @returns n_g4 The number of tetrapixel gamma candidates.
+        """
+
+        if self.__n == 0:
+            return 0, 0, 0, 0
+
+        size = self.__columns["size"]; radius = self.__columns["radius_uw"]
+
+        n_g1 = int(np.count_nonzero(size == 1))
+        n_g2 = int(np.count_nonzero(size == 2))
+        n_g3 = int(np.count_nonzero((size == 3) & (radius < TRIPIXEL_RADIUS)))
+        n_g4 = int(np.count_nonzero((size == 4) & (radius < TETRAPIXEL_RADIUS)))
+
+        return n_g1, n_g2, n_g3, n_g4
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Poisson statistics for the particle rate estimates.
+
+The number of clusters found in each frame of a run should follow a
+Poisson distribution with a mean of \Lambda clusters per frame. This
+module estimates \Lambda and compares the clusters per frame histogram
+with the Poisson distribution - with array operations, and without
+any plotting - so that the rate estimates for many runs can be
+calculated in a batch job.
+
+The Poisson probabilities are calculated in log space (with the log
+gamma function), so they don't overflow for the large numbers of
+clusters found in noisy runs.
+
+The rate can also be estimated in (sliding) time windows over a run,
+e.g. to spot a source being moved or an unstable detector.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the log gamma function.
+from scipy.special import gammaln
+
+#...for the Chi^2 distribution.
+from scipy.stats import chi2 as chi2_dist
+
+def logPoissonPmf(k, Lambda):
+    """
+    Calculate the log of the Poisson probability of k events.
+
+    @param [in] k The number(s) of events - an integer or array of integers.
+    @param [in] Lambda The mean number of events.
+    @returns logp The log probabilities (-inf for impossible values).
+    """
+
+    k = np.asarray(k, dtype=np.float64)
+
+    if Lambda <= 0.0:
+        # All of the probability is in the k = 0 bin.
+        return np.where(k == 0.0, 0.0, -np.inf)
+
+    return k * np.log(Lambda) - Lambda - gammaln(k + 1.0)
+
+def poissonPmf(k, Lambda):
+    """
+    Calculate the Poisson probability of k events.
+
+    @param [in] k The number(s) of events - an integer or array of integers.
+    @param [in] Lambda The mean number of events.
+    @returns p The probabilities.
+    """
+
+    return np.exp(logPoissonPmf(k, Lambda))
+
+def estimateRate(cpf):
+    """
+    Estimate the rate from the number of clusters in each frame.
+
+    The maximum likelihood estimate of \Lambda is the mean number of
+    clusters per frame, M/N, and its standard error (from the Fisher
+    information) is sqrt(\Lambda/N) = sqrt(M)/N.
+
+    @param [in] cpf A list (or array) of the number of clusters per frame.
+    @returns Lambda The estimated rate [clusters per frame].
+    @returns Lambda_err The standard error on the estimated rate.
+    """
+
+    ## The number of frames.
+    n_f = len(cpf)
+
+    if n_f == 0:
+        raise IOError("RATE_NO_FRAMES")
+
+    ## The total number of clusters.
+    n_k = float(np.sum(cpf))
+
+    return n_k / float(n_f), np.sqrt(n_k) / float(n_f)
+
+def getRateHistogram(cpf, bin_w=1):
+    """
+    Histogram the number of clusters per frame.
+
+    The bins go up to the maximum number of clusters rounded up to the
+    next ten (as for the RateHistogram plots).
+
+    @param [in] cpf A list (or array) of the number of clusters per frame.
+    @param [in] bin_w The bin width.
+    @returns n The histogram bin contents.
+    @returns bins The histogram bin edges.
+    """
+
+    cpf = np.asarray(cpf)
+
+    ## The maximum number of clusters, rounded up to the nearest 10.
+    max_x_r = np.floor(float(cpf.max()) / 10.) * 10. + 10.
+
+    ## The bin edges.
+    bins = np.arange(0, max_x_r + bin_w, bin_w)
+
+    if bin_w == 1:
+        # Integer counts don't need the general binning.
+        return np.bincount(cpf.astype(np.int64), minlength=len(bins) - 1), bins
+
+    return np.histogram(cpf, bins=bins)
+
+def mergeBins(observed, expected, min_expected):
+    """
+    Merge the tail bins of a histogram with too few expected entries.
+
+    The bins below and above those with at least min_expected expected
+    entries are merged into one bin at each end; if a merged tail bin
+    still has too few, it is merged into its neighbour. This assumes
+    that the expected values are unimodal (as for the Poisson).
+
+    @param [in] observed The observed bin contents.
+    @param [in] expected The expected bin contents.
+    @param [in] min_expected The minimum number of expected entries per bin.
+    @returns observed The merged observed bin contents.
+    @returns expected The merged expected bin contents.
+    """
+
+    observed = np.asarray(observed, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+
+    ## The indices of the bins with enough expected entries.
+    ok = np.flatnonzero(expected >= min_expected)
+
+    if len(ok) == 0:
+        # Nothing to compare with - merge everything.
+        return np.array([observed.sum()]), np.array([expected.sum()])
+
+    ## The first and last bins with enough expected entries.
+    first, last = ok[0], ok[-1]
+
+    ## The bin edges of the merged bins (as indices into the original bins).
+    edges = np.arange(first, last + 2)
+
+    # Merge the low tail into a bin of its own - or into the first good bin.
+    if first > 0:
+        if expected[:first].sum() >= min_expected:
+            edges = np.concatenate(([0], edges))
+        else:
+            edges[0] = 0
+
+    # ...and the same for the high tail.
+    if last < len(expected) - 1:
+        if expected[last + 1:].sum() >= min_expected:
+            edges = np.concatenate((edges, [len(expected)]))
+        else:
+            edges[-1] = len(expected)
+
+    ## The cumulative sums, for summing over the merged bins.
+    cum_obs = np.concatenate(([0.0], np.cumsum(observed)))
+    cum_exp = np.concatenate(([0.0], np.cumsum(expected)))
+
+    return np.diff(cum_obs[edges]), np.diff(cum_exp[edges])
+
+def getChi2(observed, expected, n_fitted_params, min_expected=0.0):
+    """
+    Calculate Pearson's Chi^2 for the observed and expected bin contents.
+
+    @param [in] observed The observed bin contents (NaN is treated as zero).
+    @param [in] expected The expected bin contents.
+    @param [in] n_fitted_params The number of parameters estimated from the data.
+    @param [in] min_expected Merge the tail bins with fewer expected entries than this.
+    @returns chi2 The Chi^2 value.
+    @returns n_deg_free The number of degrees of freedom.
+    @returns chi2_div The Chi^2 per degree of freedom (NaN if there are none).
+    """
+
+    observed = np.nan_to_num(np.asarray(observed, dtype=np.float64))
+    expected = np.asarray(expected, dtype=np.float64)
+
+    if min_expected > 0.0:
+        observed, expected = mergeBins(observed, expected, min_expected)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vals = (observed - expected)**2 / expected
+
+    # Empty bins with nothing expected don't count.
+    vals[(observed == 0.0) & (expected == 0.0)] = 0.0
+
+    ## The Chi^2 value.
+    total = float(vals.sum())
+
+    ## The number of degrees of freedom.
+    n_deg_free = len(observed) - n_fitted_params
+
+    lg.debug(" * Chi^2 = %f for %d bins (%d degrees of freedom)." % (total, len(observed), n_deg_free))
+
+    if n_deg_free <= 0:
+        return total, n_deg_free, float("nan")
+
+    return total, n_deg_free, total / n_deg_free
+
+def fitRate(cpf, min_expected=0.0):
+    """
+    Estimate the rate and compare the clusters per frame with the Poisson.
+
+    The Chi^2 is calculated up to the last non-empty bin of the histogram.
+
+    @param [in] cpf A list (or array) of the number of clusters per frame.
+    @param [in] min_expected Merge the tail bins with fewer expected entries than this.
+    @returns fit A dictionary of the rate estimate, histogram and Chi^2.
+    """
+
+    Lambda, Lambda_err = estimateRate(cpf)
+
+    ## The clusters per frame histogram.
+    n, bins = getRateHistogram(cpf)
+
+    ## The expected number of frames in each bin.
+    expected = len(cpf) * poissonPmf(bins[:-1], Lambda)
+
+    ## The number of bins to compare (up to the last non-empty one).
+    n_cmp = np.flatnonzero(n)[-1] + 1
+
+    chi2, n_deg_free, chi2_div = getChi2(n[:n_cmp], expected[:n_cmp], 1, min_expected)
+
+    return {
+        "n_frames"   : len(cpf),
+        "n_klusters" : int(np.sum(cpf)),
+        "Lambda"     : Lambda,
+        "Lambda_err" : Lambda_err,
+        "n"          : n,
+        "bins"       : bins,
+        "expected"   : expected,
+        "chi2"       : chi2,
+        "n_deg_free" : n_deg_free,
+        "chi2_div"   : chi2_div
+        }
+
+def getWindowedRates(start_times, acq_times, cpf, window, step=None):
+    """
+    Estimate the rate in (sliding) time windows over a run's frames.
+
+    The frames in each window are those starting in [start, start +
+    window). The rate in each window is the number of clusters divided
+    by the total acquisition time, and the Poisson goodness-of-fit is
+    Pearson's Chi^2 for each frame's clusters compared with the rate
+    times the frame's acquisition time (the index of dispersion test),
+    with N - 1 degrees of freedom for N frames. All of the window sums
+    come from cumulative sums, so the cost is O(frames) for any window
+    size (plus sorting the frames by start time).
+
+    @param [in] start_times The frame start times [s].
+    @param [in] acq_times The frame acquisition times [s].
+    @param [in] cpf The number of clusters in each frame.
+    @param [in] window The window length [s].
+    @param [in] step The time between the window starts [s] (the window length if None).
+    @returns windows A dictionary of arrays, one value per window: the
+             start and end times, n_frames, n_klusters, acq_time, the
+             rate [clusters per second] and rate_err, Lambda [clusters
+             per frame] and Lambda_err, chi2, n_deg_free and p_value
+             (NaN for the windows without any frames).
+    """
+
+    if window <= 0 or (step is not None and step <= 0):
+        raise IOError("RATE_BAD_WINDOW")
+
+    if step is None:
+        step = window
+
+    ## The order of the frames by start time.
+    order = np.argsort(np.asarray(start_times), kind="mergesort")
+
+    sts = np.asarray(start_times, dtype=np.float64)[order]
+    ats = np.asarray(acq_times, dtype=np.float64)[order]
+    ks  = np.asarray(cpf, dtype=np.float64)[order]
+
+    if len(sts) == 0:
+        raise IOError("RATE_NO_FRAMES")
+
+    if np.any(ats <= 0.0):
+        raise IOError("RATE_BAD_ACQ_TIME")
+
+    ## The window start times.
+    w_starts = sts[0] + step * np.arange(int(np.floor((sts[-1] - sts[0]) / step)) + 1)
+
+    ## The first and (one after the) last frame in each window.
+    i0 = np.searchsorted(sts, w_starts, side="left")
+    i1 = np.searchsorted(sts, w_starts + window, side="left")
+
+    def windowSums(vals):
+        cum = np.concatenate(([0.0], np.cumsum(vals)))
+        return cum[i1] - cum[i0]
+
+    ## The number of frames in each window.
+    n_f = (i1 - i0).astype(np.int64)
+
+    ## The number of clusters, acquisition time and sum of k^2/t in each window.
+    n_k = windowSums(ks)
+    t   = windowSums(ats)
+    k2t = windowSums(ks**2 / ats)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+
+        ## The rate in each window [clusters per second].
+        rate = n_k / t
+
+        # sum((k - rate*t)^2/(rate*t)) = sum(k^2/t)/rate - 2*sum(k) + rate*sum(t),
+        # and rate*sum(t) = sum(k).
+        chi2 = np.where(n_k > 0, np.maximum(k2t / rate - n_k, 0.0), 0.0)
+        chi2[n_f == 0] = np.nan
+
+        ## The number of degrees of freedom in each window.
+        n_deg_free = np.maximum(n_f - 1, 0)
+
+        return {
+            "start"      : w_starts,
+            "end"        : w_starts + window,
+            "n_frames"   : n_f,
+            "n_klusters" : n_k.astype(np.int64),
+            "acq_time"   : t,
+            "rate"       : rate,
+            "rate_err"   : np.sqrt(n_k) / t,
+            "Lambda"     : n_k / n_f,
+            "Lambda_err" : np.sqrt(n_k) / n_f,
+            "chi2"       : chi2,
+            "n_deg_free" : n_deg_free,
+            "p_value"    : np.where(n_deg_free > 0, chi2_dist.sf(chi2, n_deg_free), np.nan)
+            }
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Readers for the Timepix data file formats.
+
+Each reader parses the whole of a data file's contents in one go with
+NumPy, returning the hit pixels as a pair of arrays - the pixel
+X (= y*width + x) values and the corresponding count values.
+
+The binary files are read without parsing, straight into NumPy record
+arrays (memory mapped when read from disk). The layouts assumed are
+packed and little-endian, with the counts stored in the Pixelman data
+type given in the DSC file's frame type line (e.g. "Type=i16 ..."):
+
+* Binary [x, y, C] (4113): x (u16), y (u16), C per hit pixel;
+* Binary [X, C] (8209): X (u32), C per hit pixel;
+* Binary Matrix (17): C for every pixel, row by row.
+"""
+
+#...for the operating stuff.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the data values.
+from datavals import *
+
+## Which byte values are whitespace (tab, newlines, vertical tab, form feed, carriage return and space).
+ASCII_WHITESPACE = np.zeros(256, dtype=bool)
+#
+ASCII_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+
+def countTokens(buf):
+    """ Count the whitespace separated tokens in a buffer (without splitting it). """
+
+    if len(buf) == 0:
+        return 0
+
+    ## Which bytes are whitespace.
+    ws = ASCII_WHITESPACE[np.frombuffer(buf, dtype=np.uint8)]
+
+    # Count the starts of the tokens.
+    return int(not ws[0]) + int(np.count_nonzero(ws[:-1] & ~ws[1:]))
+
+def parseAsciiValues(buf, n_per_row):
+    """
+    Parse whitespace separated integers into an array of rows.
+
+    @param [in] buf The contents of the data file.
+    @param [in] n_per_row The number of values in each row.
+    """
+
+    ## The values found in the file.
+    vals = np.fromstring(buf, dtype=np.int64, sep=' ')
+
+    # NumPy stops (silently) at the first value that isn't a number.
+    if len(vals) != countTokens(buf) or len(vals) % n_per_row != 0:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    return vals.reshape(-1, n_per_row)
+
+def readAsciiXyC(buf, width, height):
+    """
+    Read an ASCII [x, y, C] (4114) data file.
+
+    @param [in] buf The contents of the data file.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    vals = parseAsciiValues(buf, 3)
+
+    return height * vals[:, 1] + vals[:, 0], vals[:, 2]
+
+def readAsciiXC(buf, width, height):
+    """
+    Read an ASCII [X, C] (8210) data file.
+
+    @param [in] buf The contents of the data file.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    vals = parseAsciiValues(buf, 2)
+
+    return vals[:, 0], vals[:, 1]
+
+def readAsciiMatrix(buf, width, height):
+    """
+    Read an ASCII matrix (18) data file.
+
+    @param [in] buf The contents of the data file.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the (hit) pixel X values.
+    @returns cs NumPy array of the (hit) pixel count values.
+    """
+
+    ## The dense frame matrix.
+    matrix = parseAsciiValues(buf, width).ravel()
+
+    ## The hit pixels.
+    xs = np.flatnonzero(matrix > 0)
+
+    return xs, matrix[xs]
+
+def getCounts(cs):
+    """ Copy the count values from a binary file into a (64 bit) array. """
+
+    if np.issubdtype(cs.dtype, np.integer):
+        return cs.astype(np.int64)
+
+    return cs.astype(np.float64)
+
+def getBinaryEntryType(fmt, typename):
+    """
+    Get the NumPy type of the entries in a binary data file.
+
+    @param [in] fmt The data file format value.
+    @param [in] typename The Pixelman data type of the counts (e.g. "i16").
+    """
+
+    if typename not in PIXELMAN_DATA_TYPES:
+        raise IOError("FRAME_BAD_DATA_TYPE")
+
+    ## The NumPy type of the counts.
+    ctype = PIXELMAN_DATA_TYPES[typename]
+
+    if   fmt == 4113: # Binary xyC.
+        return np.dtype([("x", "<u2"), ("y", "<u2"), ("C", ctype)])
+    elif fmt == 8209: # Binary XC.
+        return np.dtype([("X", "<u4"), ("C", ctype)])
+
+    return np.dtype(ctype)
+
+def readBinaryXyC(entries, width, height):
+    """
+    Read the entries of a Binary [x, y, C] (4113) data file.
+
+    @param [in] entries The (x, y, C) NumPy record array.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    return height * entries["y"].astype(np.int64) + entries["x"], getCounts(entries["C"])
+
+def readBinaryXC(entries, width, height):
+    """
+    Read the entries of a Binary [X, C] (8209) data file.
+
+    @param [in] entries The (X, C) NumPy record array.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    return entries["X"].astype(np.int64), getCounts(entries["C"])
+
+def readBinaryMatrix(entries, width, height):
+    """
+    Read the entries of a Binary Matrix (17) data file.
+
+    @param [in] entries The NumPy array of all of the pixels' counts.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @returns xs NumPy array of the (hit) pixel X values.
+    @returns cs NumPy array of the (hit) pixel count values.
+    """
+
+    if len(entries) != width * height:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    ## The hit pixels.
+    xs = np.flatnonzero(entries > 0)
+
+    return xs, getCounts(entries[xs])
+
+## The ASCII data file readers {format:reader}.
+DATA_FILE_READERS = {
+    4114 : readAsciiXyC,
+    8210 : readAsciiXC,
+    18   : readAsciiMatrix
+    }
+
+## The binary data file readers {format:reader}.
+BINARY_FILE_READERS = {
+    4113 : readBinaryXyC,
+    8209 : readBinaryXC,
+    17   : readBinaryMatrix
+    }
+
+def readDataBuffer(buf, fmt, width, height, typename="i16"):
+    """
+    Read the contents of a data file in the given format.
+
+    @param [in] buf The contents of the data file.
+    @param [in] fmt The data file format value.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @param [in] typename The Pixelman data type of the counts (binary files only).
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    if fmt in BINARY_FILE_READERS:
+
+        lg.debug(" Reading a '%s' data file." % (DATA_FILE_TYPES[fmt]))
+
+        ## The type of the entries in the file.
+        dt = getBinaryEntryType(fmt, typename)
+
+        if len(buf) % dt.itemsize != 0:
+            raise IOError("FRAME_BAD_FORMAT")
+
+        return BINARY_FILE_READERS[fmt](np.frombuffer(buf, dtype=dt), width, height)
+
+    if fmt not in DATA_FILE_READERS:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    lg.debug(" Reading a '%s' data file." % (DATA_FILE_TYPES[fmt]))
+
+    return DATA_FILE_READERS[fmt](buf, width, height)
+
+def readDataFile(fn, fmt, width, height, typename="i16"):
+    """
+    Read a data file in the given format.
+
+    Binary data files are memory mapped rather than read.
+
+    @param [in] fn The data file name.
+    @param [in] fmt The data file format value.
+    @param [in] width The frame width.
+    @param [in] height The frame height.
+    @param [in] typename The Pixelman data type of the counts (binary files only).
+    @returns xs NumPy array of the pixel X values.
+    @returns cs NumPy array of the pixel count values.
+    """
+
+    if fmt in BINARY_FILE_READERS and os.path.getsize(fn) > 0:
+
+        lg.debug(" Reading a '%s' data file." % (DATA_FILE_TYPES[fmt]))
+
+        ## The type of the entries in the file.
+        dt = getBinaryEntryType(fmt, typename)
+
+        if os.path.getsize(fn) % dt.itemsize != 0:
+            raise IOError("FRAME_BAD_FORMAT")
+
+        return BINARY_FILE_READERS[fmt](np.memmap(fn, dtype=dt, mode="r"), width, height)
+
+    with open(fn, "rb") as f:
+        return readDataBuffer(f.read(), fmt, width, height, typename)
+
+def getPixelMapFromArrays(xs, cs):
+    """ Make a pixel map dictionary {X:C} from the pixel arrays. """
+    return dict(zip(xs.tolist(), cs.tolist()))
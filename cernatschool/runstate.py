@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The state of an incremental processing run.
+
+Records which of a dataset's frames have been processed - the sizes
+and modification times of each frame's data and DSC files, and the ID
+of the frame in the output - so that a later run only needs to process
+the frames that are new or have changed since. The state also holds the
+run's settings (the dataset, mask, etc.); if these change, the state is
+discarded and everything is processed again.
+
+The state is saved as JSON, via a temporary file, so an interrupted
+run always leaves the last saved (checkpointed) state behind.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for the temporary files.
+import tempfile
+
+## The run state file version.
+RUN_STATE_VERSION = 1
+
+def writeJson(path, data):
+    """
+    Write data to a JSON file, via a temporary file in the same folder,
+    so that the file is never seen half written.
+
+    @param [in] path The path of the JSON file.
+    @param [in] data The data to write.
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+
+    os.rename(tmp_path, path)
+
+class RunState:
+    """
+    The processed frames of an incremental run {data file name:{"stat", "id"}}.
+    """
+
+    def __init__(self, path, settings):
+        """
+        Constructor - loads the saved state, if there is one for the same settings.
+
+        @param [in] path The path of the state JSON file.
+        @param [in] settings A (JSON serialisable) dictionary of the run settings.
+        """
+
+        ## The path of the state file.
+        self.path = path
+
+        ## The run settings (as they would be read back from JSON).
+        self.settings = json.loads(json.dumps(settings))
+
+        ## The processed frames {data file name:{"stat", "id"}}.
+        self.frames = {}
+
+        ## Was a saved state found (for the same settings)?
+        self.resumed = False
+
+        if not os.path.exists(path):
+            return
+
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except ValueError:
+            lg.info(" * Ignoring the unreadable run state '%s'." % (path))
+            return
+
+        if state.get("version") != RUN_STATE_VERSION or state.get("settings") != self.settings:
+            lg.info(" * The run settings have changed - ignoring the run state '%s'." % (path))
+            return
+
+        self.frames = state["frames"]
+
+        self.resumed = True
+
+        lg.info(" * Found %d processed frames in the run state '%s'." % (len(self.frames), path))
+
+    def isResumed(self):
+        return self.resumed
+
+    def getNames(self):
+        """ Get the names of the processed data files. """
+        return self.frames.keys()
+
+    def getId(self, name):
+        """ Get the output ID of a processed frame (None if it hasn't been processed). """
+        if name not in self.frames:
+            return None
+        return self.frames[name]["id"]
+
+    def isDone(self, name, stat):
+        """
+        Has a frame been processed (and not changed since)?
+
+        @param [in] name The data file name.
+        @param [in] stat The frame's file sizes and modification times (see Dataset.getFileStat).
+        """
+        return name in self.frames and self.frames[name]["stat"] == list(stat)
+
+    def add(self, name, stat, frameid):
+        """
+        Record a processed frame.
+
+        @param [in] name The data file name.
+        @param [in] stat The frame's file sizes and modification times (see Dataset.getFileStat).
+        @param [in] frameid The frame's ID in the output.
+        """
+        self.frames[name] = {"stat":list(stat), "id":frameid}
+
+    def remove(self, name):
+        """ Forget a processed frame. """
+        self.frames.pop(name, None)
+
+    def clear(self):
+        """ Forget all of the processed frames (e.g. to process everything again). """
+        self.frames = {}
+        self.resumed = False
+
+    def save(self):
+        """ Save the state. """
+        writeJson(self.path, {"version":RUN_STATE_VERSION, "settings":self.settings, "frames":self.frames})
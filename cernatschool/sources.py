@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Sources of the files that make up a CERN@school Timepix dataset.
+
+A dataset can be read from a folder of DSC/data file pairs or,
+without extracting it, from a ZIP or tar(.gz) archive of them.
+Archive members are paired by name (the DSC file for a data file
+"<name>" is "<name>.dsc") and read straight into memory.
+
+Members of a compressed (gzip, bzip2) tar file can't be read out of
+order without decompressing the archive from the start each time, so
+these archives are decompressed once (streaming the members through,
+in archive order) to a temporary uncompressed tar file. This is then
+read member by member like any other tar file - by worker processes
+too - and removed when the source is closed (or the process exits).
+"""
+
+# The usual suspects.
+import os, glob
+
+#...for the temporary files.
+import tempfile, atexit
+
+#...for the logging.
+import logging as lg
+
+#...for the archives.
+import zipfile, tarfile
+
+#...for processing the file format.
+from helpers import getFormat, getFormatFromBytes, isBinary
+
+#...for the DSC file wrapper class.
+from dsc import DscFile
+
+#...for the timings.
+from instrumentation import timed
+
+## The open archives {(process ID, path):archive}.
+#
+# The archives are opened once per process, so that sources passed to
+# worker processes (which only carry the path) don't share file handles.
+# The entries are removed when the sources are released.
+OPEN_ARCHIVES = {}
+
+def removeTemporaryFile(path, pid):
+    """ Remove a temporary file (only in the process that made it). """
+    if os.getpid() == pid and os.path.exists(path):
+        lg.debug(" Removing the temporary file '%s'." % (path))
+        os.remove(path)
+
+class FolderSource:
+    """ A dataset source for a folder of DSC and data files. """
+
+    def __init__(self, path):
+        """ Constructor. """
+
+        ## The folder path.
+        self.path = path
+
+    def getNames(self):
+        """ Get the (sorted) names of the files in the folder. """
+
+        names = []
+
+        for fn in sorted(glob.glob(self.path + "/*")):
+
+            # If the "file" is a directory, raise an exception.
+            if os.path.isdir(fn):
+                raise IOError("CONTAINS_DIR")
+
+            names.append(os.path.basename(fn))
+
+        return names
+
+    def read(self, name):
+        """ Read the contents of a file. """
+        with open(os.path.join(self.path, name), "rb") as f:
+            return f.read()
+
+    def stat(self, name):
+        """ Get the (absolute path, size, modification time) of a file. """
+
+        fn = os.path.join(self.path, name)
+
+        st = os.stat(fn)
+
+        return os.path.abspath(fn), st.st_size, st.st_mtime
+
+    def getFormat(self, name):
+        """ Get the format of a file. """
+        return getFormat(os.path.join(self.path, name))
+
+    def makeDscFile(self, name, cache=None, dataformat=None):
+        """ Make the DSC file wrapper for a DSC file (see DscFile). """
+        return DscFile(self.path + "/" + name, cache=cache, dataformat=dataformat)
+
+    def release(self):
+        """ Release any open files (there are none for a folder). """
+        pass
+
+    def close(self):
+        """ Close the source. """
+        pass
+
+class ArchiveSource:
+    """
+    Base class for the dataset sources reading from archives.
+
+    The sub-classes provide openArchive(), closeArchive(), getMemberNames(),
+    getMemberSize(), readMember() and openMember().
+    """
+
+    def __init__(self, path):
+        """ Constructor. """
+
+        ## The archive path.
+        self.path = path
+
+    def getArchive(self):
+        """ Get the (open) archive for this process. """
+
+        key = (os.getpid(), self.path)
+
+        if key not in OPEN_ARCHIVES:
+            lg.debug(" Opening archive '%s'." % (self.path))
+            OPEN_ARCHIVES[key] = self.openArchive()
+
+        return OPEN_ARCHIVES[key]
+
+    def release(self):
+        """ Close this process's open archive (it is opened again if needed). """
+
+        ## The open archive.
+        archive = OPEN_ARCHIVES.pop((os.getpid(), self.path), None)
+
+        if archive is not None:
+            lg.debug(" Closing archive '%s'." % (self.path))
+            self.closeArchive(archive)
+
+    def close(self):
+        """ Close the source. """
+        self.release()
+
+    def getNames(self):
+        """ Get the (sorted) names of the files in the archive. """
+        return sorted(self.getMemberNames())
+
+    def has(self, name):
+        """ Is there a file with the given name in the archive? """
+        return name in self.getMemberNames()
+
+    def read(self, name):
+        """ Read the contents of a file. """
+
+        if not self.has(name):
+            raise IOError("NOT_EXIST")
+
+        return self.readMember(name)
+
+    def readHead(self, name):
+        """ Read the first bytes (and the whole first line) of a file. """
+
+        if not self.has(name):
+            raise IOError("NOT_EXIST")
+
+        f = self.openMember(name)
+
+        head = f.read(1024)
+
+        if "\n" not in head:
+            head += f.readline()
+
+        f.close()
+
+        return head
+
+    @timed("format")
+    def getFormat(self, name, data=None):
+        """
+        Get the format of a file from its first bytes.
+
+        @param [in] name The name of the file.
+        @param [in] data The contents of the file, if already read.
+        """
+
+        ## The first bytes of the file.
+        head = self.readHead(name) if data is None else data
+
+        ## The contents of the DSC file (only needed for binary files).
+        dsc = None
+        #
+        if isBinary(head[:1024]) and self.has(name + ".dsc"):
+            dsc = self.read(name + ".dsc")
+
+        return getFormatFromBytes(head, dsc)
+
+    def stat(self, name):
+        """ Get the (archive path/name, size, archive modification time) of a file. """
+        return os.path.join(os.path.abspath(self.path), name), self.getMemberSize(name), os.path.getmtime(self.path)
+
+    def makeDscFile(self, name, cache=None, dataformat=None):
+        """ Make the DSC file wrapper for a DSC file (see DscFile). """
+        return DscFile(name, self, cache, dataformat)
+
+class ZipSource(ArchiveSource):
+    """ A dataset source for a ZIP archive of DSC and data files. """
+
+    def openArchive(self):
+        return zipfile.ZipFile(self.path, "r")
+
+    def closeArchive(self, archive):
+        archive.close()
+
+    def getMemberNames(self):
+        return [n for n in self.getArchive().namelist() if not n.endswith("/")]
+
+    def has(self, name):
+        try:
+            self.getArchive().getinfo(name)
+        except KeyError:
+            return False
+        return True
+
+    def getMemberSize(self, name):
+        return self.getArchive().getinfo(name).file_size
+
+    def readMember(self, name):
+        return self.getArchive().read(name)
+
+    def openMember(self, name):
+        return self.getArchive().open(name)
+
+class TarSource(ArchiveSource):
+    """ A dataset source for a tar (or tar.gz, tar.bz2) archive of DSC and data files. """
+
+    def __init__(self, path):
+        """ Constructor - decompresses a compressed tar file to a temporary file. """
+
+        ArchiveSource.__init__(self, path)
+
+        ## The path of the (uncompressed) tar file to read.
+        self.tarpath = path
+
+        ## The ID of the process that made the temporary tar file (None if there isn't one).
+        self.owner = None
+
+        try:
+            tarfile.open(path, "r:").close()
+        except tarfile.ReadError:
+            self.decompress()
+
+    def decompress(self):
+        """ Decompress the archive to a temporary (uncompressed) tar file. """
+
+        fd, self.tarpath = tempfile.mkstemp(suffix=".tar"); os.close(fd)
+
+        self.owner = os.getpid()
+
+        atexit.register(removeTemporaryFile, self.tarpath, self.owner)
+
+        lg.debug(" Decompressing '%s' to '%s'." % (self.path, self.tarpath))
+
+        # Stream the members through in archive order.
+        with tarfile.open(self.path, "r|*") as src:
+            with tarfile.open(self.tarpath, "w:") as dst:
+                for m in src:
+                    dst.addfile(m, src.extractfile(m) if m.isfile() else None)
+
+    def close(self):
+        """ Close the source, removing the temporary tar file (if there is one). """
+
+        self.release()
+
+        if self.owner is not None:
+            removeTemporaryFile(self.tarpath, self.owner)
+
+    def openArchive(self):
+
+        ## The tar file.
+        tf = tarfile.open(self.tarpath, "r:")
+
+        # Index the (file) members by name, to read them as needed.
+        return tf, dict((m.name, m) for m in tf.getmembers() if m.isfile())
+
+    def closeArchive(self, archive):
+        archive[0].close()
+
+    def getMemberNames(self):
+        return self.getArchive()[1].keys()
+
+    def has(self, name):
+        return name in self.getArchive()[1]
+
+    def getMemberSize(self, name):
+        return self.getArchive()[1][name].size
+
+    def readMember(self, name):
+        tf, members = self.getArchive()
+        return tf.extractfile(members[name]).read()
+
+    def openMember(self, name):
+        tf, members = self.getArchive()
+        return tf.extractfile(members[name])
+
+def getSource(path):
+    """
+    Get the dataset source for a folder or archive.
+
+    @param [in] path The path to the folder or archive.
+    """
+
+    # Check if the path exists. If it doesn't, throw an exception.
+    if not os.path.exists(path):
+        raise IOError("NOT_EXIST")
+
+    if os.path.isdir(path):
+        return FolderSource(path)
+
+    if zipfile.is_zipfile(path):
+        lg.debug(" '%s' is a ZIP archive." % (path))
+        return ZipSource(path)
+
+    if tarfile.is_tarfile(path):
+        lg.debug(" '%s' is a tar archive." % (path))
+        return TarSource(path)
+
+    raise IOError("BAD_SOURCE")
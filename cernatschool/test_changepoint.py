@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for the MATH.
+import numpy as np
+
+#...for the rate change detection.
+from changepoint import RateChangeDetector, replayRates, saveDetector, loadDetector
+
+def makeFrames(rates, n_frames, acq_time=60.0, seed=42):
+    """ Make the start times, acquisition times and counts of frames with a rate [per second] for each block of frames. """
+
+    ## The random number generator.
+    rs = np.random.RandomState(seed)
+
+    ## The rate of each frame.
+    rs_f = np.repeat(rates, n_frames)
+
+    sts = 1396447375 + 60.0 * np.arange(len(rs_f))
+
+    return sts, np.full(len(rs_f), acq_time), rs.poisson(rs_f * acq_time)
+
+class RateChangeDetectorTest(unittest.TestCase):
+
+    def test_no_change(self):
+
+        sts, ats, ns = makeFrames([0.125], 5000)
+
+        ## The rate change detector.
+        detector = RateChangeDetector()
+
+        self.assertEqual(replayRates(sts, ats, ns, detector), [])
+
+        # Poisson counts - no extra dispersion.
+        self.assertAlmostEqual(detector.dispersion, 1.0, delta=0.1)
+
+    def test_changes(self):
+
+        sts, ats, ns = makeFrames([0.125, 0.25, 0.1], 500)
+
+        ## The rate change detector.
+        detector = RateChangeDetector(0.5, 10.0, 30)
+
+        # Feed the frames in one at a time, as they arrive.
+        changes = []
+        #
+        for st, at, n in zip(sts, ats, ns):
+            change = detector.update(st, at, n)
+            if change is not None:
+                changes.append(change)
+
+        self.assertEqual([c["direction"] for c in changes], ["up", "down"])
+
+        # The changes are flagged soon after they happen...
+        self.assertTrue(500 <= changes[0]["frame"] < 530)
+        self.assertTrue(1000 <= changes[1]["frame"] < 1030)
+
+        # ...and the change starts are estimated.
+        self.assertTrue(abs(changes[0]["start"] - sts[500]) <= 600)
+        self.assertTrue(abs(changes[1]["start"] - sts[1000]) <= 600)
+
+        self.assertAlmostEqual(changes[0]["rate_before"], 0.125, delta=0.01)
+        self.assertAlmostEqual(changes[1]["rate_before"], 0.25, delta=0.03)
+
+        self.assertEqual(detector.n_frames, 1500)
+        self.assertEqual(detector.n_changes, 2)
+
+        # The replay finds the same changes (whatever order the frames are in).
+        order = np.random.RandomState(1).permutation(len(sts))
+        #
+        self.assertEqual(replayRates(sts[order], ats[order], ns[order], RateChangeDetector(0.5, 10.0, 30)), changes)
+
+    def test_overdispersed_counts(self):
+
+        ## The random number generator.
+        rs = np.random.RandomState(3)
+
+        sts, ats, ks = makeFrames([0.125, 0.25, 0.1], 500)
+
+        ## The number of hit pixels in each frame (1-29 pixels per cluster).
+        ns = np.array([rs.randint(1, 30, k).sum() for k in ks])
+
+        ## The rate change detector.
+        detector = RateChangeDetector()
+
+        ## The changes found.
+        changes = replayRates(sts, ats, ns, detector)
+
+        # No false alarms - only the real changes are found.
+        self.assertEqual([c["direction"] for c in changes], ["up", "down"])
+        self.assertTrue(500 <= changes[0]["frame"] < 530)
+        self.assertTrue(1000 <= changes[1]["frame"] < 1030)
+
+        self.assertTrue(detector.dispersion > 10.0)
+
+    def test_saved_state(self):
+
+        sts, ats, ns = makeFrames([0.125, 0.25, 0.1], 500)
+
+        ## The changes found in one go.
+        changes = replayRates(sts, ats, ns, RateChangeDetector())
+
+        ## The state file.
+        fd, path = tempfile.mkstemp(suffix=".json"); os.close(fd)
+
+        ## The run settings.
+        settings = {"input":"test", "counts":"n_kluster"}
+
+        # Replay the frames in three runs, saving and loading the detector in between.
+        detector, found = RateChangeDetector(), []
+        #
+        for i, j in [(0, 520), (520, 1200), (1200, 1500)]:
+            found += replayRates(sts[i:j], ats[i:j], ns[i:j], detector)
+            saveDetector(path, detector, settings)
+            detector = loadDetector(path, settings)
+
+        self.assertEqual(found, changes)
+        self.assertEqual(detector.n_frames, 1500)
+        self.assertEqual(detector.last_time, sts[-1])
+
+        # The state is only used for the same settings.
+        self.assertEqual(loadDetector(path, {"input":"test", "counts":"n_pixel"}), None)
+
+        os.remove(path)
+
+        self.assertEqual(loadDetector(path, settings), None)
+
+    def test_warmup(self):
+
+        detector = RateChangeDetector(warmup=5)
+
+        for i in range(4):
+            detector.update(60.0 * i, 60.0, 0)
+            detector.update(60.0 * i, 0.0, 3)
+
+        self.assertTrue(detector.isWarmingUp())
+
+        detector.update(240.0, 60.0, 10)
+
+        self.assertFalse(detector.isWarmingUp())
+        self.assertAlmostEqual(detector.rate, 10.0 / 300.0)
+        self.assertEqual(detector.getStatistics(), (0.0, 0.0))
+
+    def test_bad_settings(self):
+        self.assertRaises(IOError, RateChangeDetector, 1.5)
+        self.assertRaises(IOError, RateChangeDetector, 0.5, -1.0)
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_changepoint.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=====================================================")
+    lg.info(" Logger output from cernatschool/test_changepoint.py ")
+    lg.info("=====================================================")
+    lg.info("")
+
+    unittest.main()
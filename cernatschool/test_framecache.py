@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the dataset wrapper.
+from dataset import Dataset
+
+#...for the MATH.
+import numpy as np
+
+#...for the frame cache.
+from framecache import FrameCache, FRAME_CACHE_ENV, FRAME_CACHE_SIZE_ENV, getFrameCacheSize, getDefaultFrameCache
+
+## The path to the test data.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/"
+
+class FrameCacheTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The cache folder.
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_cached_frames(self):
+
+        ## The frames, read from the data files.
+        ref_frames = Dataset(TEST_DATA_PATH).getFrames((0.0, 0.0, 0.0))
+
+        # Fill the cache, then read the frames from it.
+        for p in range(2):
+
+            cache = FrameCache(self.path, usehash=(p == 1))
+
+            ## The frames, read via the cache.
+            frames = Dataset(TEST_DATA_PATH, cache).getFrames((0.0, 0.0, 0.0))
+
+            # The tests
+            #-----------
+            #
+            # A (hashed) entry has been made for each frame.
+            self.assertEqual(len(cache.getEntries()), 60 * (p + 1))
+            #
+            for f, ref in zip(frames, ref_frames):
+                self.assertEqual(f.getPixelMap(), ref.getPixelMap())
+                self.assertEqual(f.getChipId(), ref.getChipId())
+                self.assertEqual(f.getStartTime(), ref.getStartTime())
+                self.assertEqual(f.getAcqTime(), ref.getAcqTime())
+                self.assertEqual(f.getNumberOfKlusters(), ref.getNumberOfKlusters())
+
+        # A changed file is not read from the cache.
+        fn = sorted(os.listdir(TEST_DATA_PATH))[0]
+        st = os.stat(os.path.join(TEST_DATA_PATH, fn))
+        cache = FrameCache(self.path)
+        key = cache.getKey(os.path.join(TEST_DATA_PATH, fn + ".dsc"), os.path.join(TEST_DATA_PATH, fn))
+        self.assertNotEqual(cache.load(key), None)
+        key[5] += 1.0
+        self.assertEqual(cache.load(key), None)
+
+    def test_eviction(self):
+
+        ## A cache with room for a few frames.
+        cache = FrameCache(self.path, maxsize=20000)
+
+        Dataset(TEST_DATA_PATH, cache).getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+        # The tests
+        #-----------
+        #
+        self.assertTrue(cache.getSize() <= 20000)
+        self.assertTrue(0 < len(cache.getEntries()) < 60)
+
+    def test_count_types(self):
+
+        cache = FrameCache(self.path)
+
+        ## The pixel X values.
+        xs = np.array([0, 1, 65535], dtype=np.int64)
+
+        # Counts that don't fit in 32-bit signed integers are kept as they are.
+        for cs in [np.array([1, 2**31, 2**32 - 1], dtype=np.uint32), \
+                   np.array([-1, 2**40, 7], dtype=np.int64), \
+                   np.array([1, 2, 3], dtype=">i4"), \
+                   np.array([0.5, 1e20, 3.0])]:
+
+            ## The cache key.
+            key = ["test", str(cs.dtype)]
+
+            cache.save(key, 0, {}, xs, cs)
+
+            self.assertEqual(cache.load(key)["counts"], cs.dtype.newbyteorder("<").str)
+
+            ## The pixel arrays read back from the cache.
+            xs2, cs2 = FrameCache(self.path).loadPixels(key)
+
+            self.assertEqual(xs2.tolist(), xs.tolist())
+            self.assertEqual(cs2.tolist(), cs.tolist())
+
+    def test_cache_size(self):
+
+        ## The environment variables to restore.
+        env = dict((k, os.environ.get(k)) for k in [FRAME_CACHE_ENV, FRAME_CACHE_SIZE_ENV])
+        #
+        try:
+            os.environ[FRAME_CACHE_ENV] = self.path
+            os.environ.pop(FRAME_CACHE_SIZE_ENV, None)
+
+            self.assertEqual(getFrameCacheSize(), None)
+            self.assertEqual(getFrameCacheSize(2.5), 2500000)
+            self.assertEqual(getDefaultFrameCache().maxsize, None)
+
+            os.environ[FRAME_CACHE_SIZE_ENV] = "0.02"
+
+            self.assertEqual(getFrameCacheSize(), 20000)
+            self.assertEqual(getFrameCacheSize(1), 1000000)
+
+            # The default cache (used by a Dataset without one) has the size limit.
+            Dataset(TEST_DATA_PATH).getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+            self.assertTrue(FrameCache(self.path).getSize() <= 20000)
+            self.assertTrue(0 < len(FrameCache(self.path).getEntries()) < 60)
+
+            os.environ[FRAME_CACHE_SIZE_ENV] = "lots"
+
+            self.assertRaises(IOError, getFrameCacheSize)
+            self.assertRaises(IOError, getFrameCacheSize, 0)
+        finally:
+            for k, v in env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_framecache.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("====================================================")
+    lg.info(" Logger output from cernatschool/test_framecache.py ")
+    lg.info("====================================================")
+    lg.info("")
+
+    unittest.main()
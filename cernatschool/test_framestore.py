@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+# Import the JSON library.
+import json
+
+#...for the frame store.
+from framestore import FrameStore
+
+def makeFrameProperties(i):
+    """ Make the properties of a test frame. """
+    return {
+        "id"          : "B06-W0212_2014-04-02-%06d" % (140255 + i),
+        "chipid"      : "B06-W0212",
+        "hv"          : 95.0,
+        "ikrum"       : 1,
+        "lat"         : 51.261015,
+        "lon"         : 1.084127,
+        "alt"         : 48.0,
+        "start_time"  : 1396447375 + 60 * i,
+        "end_time"    : 1396447435 + 60 * i,
+        "acqtime"     : 60.0,
+        "n_pixel"     : 10 * i,
+        "occ"         : 10 * i,
+        "occ_pc"      : (10. * i) / 65536.,
+        "n_kluster"   : i,
+        "n_gamma"     : i // 2,
+        "n_non_gamma" : i - i // 2,
+        "ismc"        : 0
+        }
+
+class FrameStoreTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The store folder.
+        self.path = os.path.join(tempfile.mkdtemp(), "frames")
+
+    def tearDown(self):
+        rmtree(os.path.dirname(self.path))
+
+    def test_append_and_read(self):
+
+        ## The frame properties.
+        frames = [makeFrameProperties(i) for i in range(25)]
+
+        store = FrameStore(self.path)
+
+        self.assertEqual(store.getNumberOfFrames(), 0)
+        self.assertEqual(len(store.getColumn("n_kluster")), 0)
+
+        store.append(frames[:10])
+        store.append(frames[10:])
+
+        # Reopen the store.
+        store = FrameStore(self.path)
+
+        self.assertEqual(store.getNumberOfFrames(), 25)
+
+        self.assertEqual(store.getColumn("n_kluster").tolist(), range(25))
+        self.assertEqual(store.getColumn("id").tolist(), [f["id"] for f in frames])
+
+        self.assertEqual(store.getFrames(), frames)
+
+        ## The exported frame properties JSON.
+        json_path = os.path.join(os.path.dirname(self.path), "frames.json")
+        #
+        store.exportJson(json_path)
+        #
+        with open(json_path, "r") as f:
+            self.assertEqual(f.read(), json.dumps(frames))
+
+    def test_interrupted_append(self):
+
+        store = FrameStore(self.path)
+
+        store.append([makeFrameProperties(i) for i in range(5)])
+
+        # Half write a frame, as if the run had been interrupted.
+        with open(store.getColumnPath("n_kluster"), "ab") as f:
+            f.write("\x07\x00")
+
+        store = FrameStore(self.path)
+
+        self.assertEqual(store.getNumberOfFrames(), 5)
+
+        store.append([makeFrameProperties(i) for i in range(5, 8)])
+
+        self.assertEqual(FrameStore(self.path).getColumn("n_kluster").tolist(), range(8))
+
+    def test_clear(self):
+
+        store = FrameStore(self.path)
+
+        store.append([makeFrameProperties(i) for i in range(5)])
+
+        store.clear()
+
+        self.assertEqual(FrameStore(self.path).getNumberOfFrames(), 0)
+
+        store.append([makeFrameProperties(3)])
+
+        self.assertEqual(FrameStore(self.path).getFrames(), [makeFrameProperties(3)])
+
+    def test_value_too_long(self):
+
+        ## A frame with an ID too long for the store.
+        frame = makeFrameProperties(0); frame["id"] = "x" * 100
+
+        self.assertRaises(IOError, FrameStore(self.path).append, [frame])
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_framestore.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("====================================================")
+    lg.info(" Logger output from cernatschool/test_framestore.py ")
+    lg.info("====================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the klusters.
+from kluster import KlusterFinder
+
+#...for the linearity calculations.
+from helpers import getLinearity, getLinearityClosedForm, getLinearities
+
+class HelpersTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_linearity_special_cases(self):
+
+        # The tests
+        #-----------
+        #
+        # No pixels.
+        self.assertEqual(getLinearityClosedForm({}), (None, None, None, None))
+        #
+        # A single pixel (100, 200).
+        self.assertEqual(getLinearityClosedForm({51300:1}), (0.0, 100.0, 0.0, 0.0))
+        #
+        # A vertical line at x = 100.
+        self.assertEqual(getLinearityClosedForm({51300:1, 51556:1, 51812:1}), (999999.9, 999999.9, 0.0, 0.0))
+        #
+        # A horizontal line at y = 200.
+        self.assertEqual(getLinearityClosedForm({51300:1, 51301:1, 51302:1}), (0.0, 200.0, 0.0, 0.0))
+
+    def test_linearity_against_leastsq(self):
+
+        for path in ["testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/", \
+                     "testdata/E09-W0092/2014-04-02-150315/RAW/ASCIIxyC/"]:
+
+            ## The frames from the dataset.
+            frames = Dataset(path).getFrames((51.261015, 1.084127, 48.0), skipclustering=True)
+
+            for f in frames:
+
+                ## The klusters found in the frame.
+                ks = KlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False).getListOfKlusters()
+
+                # The tests
+                #-----------
+                #
+                # Fit each kluster separately, comparing with leastsq.
+                for k in ks:
+                    for val, ref in zip(getLinearityClosedForm(k.getPixelMap()), getLinearity(k.getPixelMap())):
+                        self.assertAlmostEqual(val, ref, delta=1.0e-6*max(1.0, abs(ref)))
+
+                # Fit all of the klusters in the frame in one call.
+                xs = []; ys = []; ns = []
+                #
+                for i, k in enumerate(ks):
+                    for X in k.getPixelMap().keys():
+                        xs.append(X % 256); ys.append(X // 256); ns.append(i)
+                #
+                lins = getLinearities(np.array(xs), np.array(ys), np.array(ns), len(ks))
+                #
+                for i, k in enumerate(ks):
+                    for val, ref in zip([lin[i] for lin in lins], getLinearity(k.getPixelMap())):
+                        self.assertAlmostEqual(val, ref, delta=1.0e-6*max(1.0, abs(ref)))
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_helpers.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_helpers.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
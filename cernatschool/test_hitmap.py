@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for the MATH.
+import numpy as np
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the hit maps.
+from hitmap import HitMapAccumulator, readMask, writeMask, saveHitMap, loadHitMap
+
+## The path to the test data.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/"
+
+class HitMapTest(unittest.TestCase):
+
+    def test_hot_pixels(self):
+
+        ## The random number generator.
+        rs = np.random.RandomState(42)
+
+        ## The hot pixels.
+        hot = [256 * 10 + 20, 256 * 200 + 3, 256 * 255 + 255]
+
+        hitmap = HitMapAccumulator()
+
+        for i in range(100):
+
+            ## The frame's hit pixels - 200 at random, and the hot pixels in most frames.
+            pixels = set(rs.randint(0, 65536, 200).tolist())
+            #
+            if i % 10 != 0:
+                pixels.update(hot)
+
+            hitmap.add(dict((X, 1) for X in pixels))
+
+        self.assertEqual(hitmap.n_frames, 100)
+        self.assertEqual(hitmap.getHitMap().shape, (256, 256))
+        self.assertEqual(hitmap.getHitMap()[10, 20], 90)
+
+        self.assertEqual(hitmap.getHotPixels().tolist(), hot)
+        self.assertEqual(hitmap.getPixelMask(), dict((X, 1) for X in hot))
+
+        # Nothing is hot in an empty hit map.
+        self.assertEqual(len(HitMapAccumulator().getHotPixels()), 0)
+
+    def test_merge(self):
+
+        a = HitMapAccumulator(); a.add([1, 2, 3])
+        b = HitMapAccumulator(); b.add([2, 3]); b.add([3])
+
+        a.merge(b)
+
+        self.assertEqual(a.n_frames, 3)
+        self.assertEqual(a.hits[:5].tolist(), [0, 1, 2, 3, 0])
+
+        self.assertRaises(IOError, a.merge, HitMapAccumulator(16, 16))
+
+    def test_saved_hit_map(self):
+
+        hitmap = HitMapAccumulator(16, 8); hitmap.add([1, 2, 3]); hitmap.add([3, 127])
+
+        ## The hit map file.
+        fd, path = tempfile.mkstemp(suffix=".npz"); os.close(fd)
+
+        saveHitMap(path, hitmap, ["b.txt", "a.txt"])
+
+        saved, names = loadHitMap(path)
+
+        self.assertEqual((saved.width, saved.height, saved.n_frames), (16, 8, 2))
+        self.assertEqual(saved.hits.tolist(), hitmap.hits.tolist())
+        self.assertEqual(names, ["a.txt", "b.txt"])
+
+        # An empty hit map.
+        saveHitMap(path, HitMapAccumulator(), [])
+
+        saved, names = loadHitMap(path)
+
+        self.assertEqual((saved.n_frames, saved.hits.sum(), names), (0, 0, []))
+
+        os.remove(path)
+
+    def test_mask_file(self):
+
+        ## The dataset's (hand made) pixel mask.
+        mask = readMask(os.path.join(TEST_DATA_PATH, "masked_pixels.txt"))
+
+        self.assertEqual(len(mask), 29)
+
+        ## The rewritten mask file.
+        fd, path = tempfile.mkstemp(suffix=".txt"); os.close(fd)
+
+        writeMask(path, mask)
+
+        self.assertEqual(readMask(path), mask)
+
+        with open(path, "r") as f:
+            self.assertEqual(f.readline().split("\t")[2], "1\n")
+
+        os.remove(path)
+
+    def test_iter_frames(self):
+
+        ## The dataset.
+        ds = Dataset(os.path.join(TEST_DATA_PATH, "RAW/ASCIIxyC/"))
+
+        hitmap = HitMapAccumulator()
+
+        ## The frames (the hit map is filled as they are read).
+        frames = list(ds.iterFrames((0.0, 0.0, 0.0), hitmap=hitmap, klusterfinder="array"))
+
+        self.assertEqual(hitmap.n_frames, len(frames))
+        self.assertEqual(hitmap.hits.sum(), sum(f.getRawNumberOfPixels() for f in frames))
+
+        ## The hot pixels found.
+        hot = hitmap.getPixelMask()
+
+        # The hot pixels found have all been masked by hand too.
+        self.assertTrue(len(hot) > 0)
+        self.assertTrue(set(hot).issubset(set(readMask(os.path.join(TEST_DATA_PATH, "masked_pixels.txt")))))
+
+        # The mask can be used for the frames.
+        frames = ds.getFrames((0.0, 0.0, 0.0), pixelmask=hot, klusterfinder="array")
+
+        self.assertEqual(frames[0].getNumberOfMaskedPixels(), len(hot))
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_hitmap.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("================================================")
+    lg.info(" Logger output from cernatschool/test_hitmap.py ")
+    lg.info("================================================")
+    lg.info("")
+
+    unittest.main()
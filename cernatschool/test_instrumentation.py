@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the worker processes.
+from multiprocessing import Pool
+
+#...for the timings.
+import instrumentation
+from instrumentation import timed
+
+@timed("test")
+def double(x):
+    return 2 * x
+
+def runTask(x):
+    """ A (timed) task for a worker process, returning the worker's timings. """
+    double(x); instrumentation.count("frames")
+    return instrumentation.drain()
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled(self):
+
+        self.assertEqual(double(2), 4)
+
+        instrumentation.count("frames")
+
+        self.assertEqual(instrumentation.drain(), None)
+
+        self.assertEqual(instrumentation.getSummary()["timers"], {})
+        self.assertEqual(instrumentation.getSummary()["counters"], {})
+
+    def test_timers_and_counters(self):
+
+        instrumentation.enable()
+
+        for i in range(10):
+            self.assertEqual(double(i), 2 * i)
+
+        instrumentation.count("frames", 10)
+        instrumentation.count("pixels", 250)
+
+        ## The summary.
+        summary = instrumentation.getSummary(2.0)
+
+        self.assertEqual(summary["timers"]["test"]["n"], 10)
+        self.assertTrue(summary["timers"]["test"]["p50_ms"] <= summary["timers"]["test"]["p99_ms"])
+        self.assertTrue(summary["timers"]["test"]["p99_ms"] <= summary["timers"]["test"]["max_ms"])
+
+        self.assertEqual(summary["counters"], {"frames":10, "pixels":250})
+        self.assertAlmostEqual(summary["frames_per_s"], 5.0)
+        self.assertAlmostEqual(summary["pixels_per_s"], 125.0)
+
+    def test_drain_and_merge(self):
+
+        instrumentation.enable()
+
+        double(1); instrumentation.count("frames")
+
+        ## The timings (as if from a worker process).
+        timings = instrumentation.drain()
+
+        self.assertEqual(len(timings["timers"]["test"]), 1)
+        self.assertEqual(instrumentation.getSummary()["counters"], {})
+
+        double(2); instrumentation.count("frames")
+
+        instrumentation.merge(timings)
+
+        ## The summary.
+        summary = instrumentation.getSummary()
+
+        self.assertEqual(summary["timers"]["test"]["n"], 2)
+        self.assertEqual(summary["counters"], {"frames":2})
+    def test_worker_processes(self):
+
+        instrumentation.enable()
+
+        ## The timer and counter totals, with the tasks run here and in a pool of workers.
+        totals = []
+
+        for jobs in [1, 4]:
+
+            instrumentation.reset()
+
+            # Timings recorded before the workers are started.
+            double(0); instrumentation.count("frames")
+
+            if jobs == 1:
+                results = [runTask(x) for x in range(20)]
+            else:
+                pool = Pool(jobs, instrumentation.initWorker, (True,))
+                #
+                results = pool.map(runTask, range(20), chunksize=3)
+                #
+                pool.close(); pool.join()
+
+            for timings in results:
+                instrumentation.merge(timings)
+
+            ## The summary.
+            summary = instrumentation.getSummary()
+
+            totals.append((summary["timers"]["test"]["n"], summary["counters"]["frames"]))
+
+        # The tasks (and the timings from before) are counted once each.
+        self.assertEqual(totals, [(21, 21), (21, 21)])
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_instrumentation.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=========================================================")
+    lg.info(" Logger output from cernatschool/test_instrumentation.py ")
+    lg.info("=========================================================")
+    lg.info("")
+
+    unittest.main()
@@ -17,7 +17,7 @@ import json
 from dataset import Dataset
 
 #...for the klusters.
-from kluster import KlusterFinder
+from kluster import KlusterFinder, ArrayKlusterFinder
 
 class KlusterTest(unittest.TestCase):
 
@@ -124,6 +124,79 @@ class KlusterTest(unittest.TestCase):
         # Is it an edge cluster?
         self.assertEqual(ks[0].isEdgeCluster(), False)
 
+    def test_array_kluster_finder(self):
+
+        ## The dataset wrapper.
+        ds = Dataset("testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/")
+
+        ## The frames from the dataset (clustered separately below).
+        frames = ds.getFrames((51.261015, 1.084127, 48.0), skipclustering=True)
+
+        # The tests
+        #-----------
+        #
+        # Compare the array-based cluster finder with the original.
+        for f in frames:
+
+            ## The original cluster finder.
+            kf = KlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False)
+
+            ## The array-based cluster finder.
+            akf = ArrayKlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False)
+
+            self.assertEqual(akf.getNumberOfKlusters(), kf.getNumberOfKlusters())
+            self.assertEqual(akf.getNumberOfGammas(), kf.getNumberOfGammas())
+            self.assertEqual(akf.getNumberOfMonopixels(), kf.getNumberOfMonopixels())
+            self.assertEqual(akf.getNumberOfBipixels(), kf.getNumberOfBipixels())
+            self.assertEqual(akf.getNumberOfTripixelGammas(), kf.getNumberOfTripixelGammas())
+            self.assertEqual(akf.getNumberOfTetrapixelGammas(), kf.getNumberOfTetrapixelGammas())
+
+            # The klusters should be the same, and in the same order.
+            for k, ak in zip(kf.getListOfKlusters(), akf.getListOfKlusters()):
+                self.assertEqual(sorted(ak.get_pixel_xy_list()), sorted(k.get_pixel_xy_list()))
+                self.assertEqual(ak.getXMin(), k.getXMin())
+                self.assertEqual(ak.getYMax(), k.getYMax())
+                self.assertAlmostEqual(ak.getXUW(), k.getXUW(), places=6)
+                self.assertAlmostEqual(ak.getRadiusUW(), k.getRadiusUW(), places=6)
+                self.assertEqual(ak.getNumberOfEdgePixels(), k.getNumberOfEdgePixels())
+
+        # The largest cluster in the first frame - the total counts are
+        # summed over the cluster's own pixels.
+        akf = ArrayKlusterFinder(frames[0].getPixelMap(), 256, 256, False)
+        #
+        self.assertEqual(akf.getListOfKlusters()[0].getNumberOfPixels(), 25)
+        self.assertEqual(akf.getListOfKlusters()[0].getTotalCounts(), 850)
+
+    def test_kluster_table(self):
+
+        ## The dataset wrapper.
+        ds = Dataset("testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/")
+
+        ## The first frame from the dataset.
+        f = ds.getFrames((51.261015, 1.084127, 48.0), skipclustering=True)[0]
+
+        ## The array-based cluster finder.
+        akf = ArrayKlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False)
+
+        ## The kluster property table.
+        kt = akf.getKlusterTable()
+
+        # The tests
+        #-----------
+        self.assertEqual(kt.getNumberOfKlusters(), akf.getNumberOfKlusters())
+        self.assertEqual(list(kt.getColumn("size")), [k.getNumberOfPixels() for k in akf.getListOfKlusters()])
+
+        # The table should serve the same JSON as each (processed) Kluster.
+        for i, k in enumerate(KlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False).getListOfKlusters()):
+            kj = k.getKlusterPropertiesJson(); tj = kt.getKlusterPropertiesJson(i)
+            self.assertEqual(sorted(tj.keys()), sorted(kj.keys()))
+            for name in ["size", "xmin", "xmax", "ymin", "ymax", "width", "height", "maxcounts"]:
+                self.assertEqual(tj[name], kj[name])
+            for name in ["x_uw", "y_uw", "radius_uw", "density_uw"]:
+                self.assertAlmostEqual(tj[name], kj[name], places=6)
+            self.assertEqual(kt.getColumn("n_edgepixels")[i], k.getNumberOfEdgePixels())
+            self.assertEqual(kt.getColumn("isedgekluster")[i], k.isEdgeCluster())
+
 
 if __name__ == "__main__":
 
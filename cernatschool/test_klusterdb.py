@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the MATH.
+import numpy as np
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the klusters.
+from kluster import ArrayKlusterFinder
+
+#...for the kluster properties database.
+from klusterdb import KlusterDatabase, getKlusterRows
+
+## The path to the test data.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/"
+
+class KlusterDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The database folder.
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_add_and_read(self):
+
+        ## The kluster tables of the first few frames.
+        tables = [ArrayKlusterFinder(df.getPixelMap(), 256, 256, False).getKlusterTable() \
+            for df in Dataset(TEST_DATA_PATH).getDscFiles()[:5]]
+
+        ## The database.
+        kdb = KlusterDatabase(os.path.join(self.path, "klusters.db"))
+
+        for i, table in enumerate(tables):
+            kdb.addKlusters(getKlusterRows(table, "frame_%d" % (i)))
+
+        kdb.commit(); kdb.close()
+
+        # Reopen the database.
+        kdb = KlusterDatabase(os.path.join(self.path, "klusters.db"))
+
+        self.assertEqual(kdb.getNumberOfKlusters(), sum(t.getNumberOfKlusters() for t in tables))
+
+        for name in ["size", "totalcounts", "radius_uw", "lin_linearity", "isedgekluster"]:
+            self.assertTrue(np.allclose(kdb.getColumn(name), np.concatenate([t.getColumn(name) for t in tables])))
+
+        ## The klusters of the first frame.
+        cols = kdb.getColumns(["size", "frameid"], "frameid = 'frame_0'")
+
+        self.assertEqual(cols["size"].tolist(), tables[0].getColumn("size").tolist())
+        self.assertEqual(set(cols["frameid"].tolist()), set(["frame_0"]))
+
+        kdb.removeFrame("frame_0"); kdb.commit()
+
+        self.assertEqual(kdb.getNumberOfKlusters(), sum(t.getNumberOfKlusters() for t in tables[1:]))
+
+        kdb.clear()
+
+        self.assertEqual(kdb.getNumberOfKlusters(), 0)
+        self.assertEqual(len(kdb.getColumn("size")), 0)
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_klusterdb.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===================================================")
+    lg.info(" Logger output from cernatschool/test_klusterdb.py ")
+    lg.info("===================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for the binary stuff.
+import struct
+
+#...for the time functionality.
+import time
+
+#...for the MATH.
+import numpy as np
+
+#...for the pixel rate profiles.
+from timestuff.profile import PROFILE_RECORD, PROFILE_RECORD_V2, PROFILE_HEADER_V2, \
+    getHourIndex, writeProfile, writeProfileV1, readProfileHeader, PixelRateProfile, splitFramesByDay
+
+#...for the day start times.
+from timestuff.handlers import getDayStartTime
+
+def makeRecords(n, seed=42):
+    """ Make n (version 2) profile records over a few hours, not in start time order. """
+
+    ## The random number generator.
+    rs = np.random.RandomState(seed)
+
+    records = np.zeros(n, dtype=PROFILE_RECORD_V2)
+
+    records["st"]        = 1396447375 + rs.uniform(0, 5 * 3600, n)
+    records["acqtime"]   = 60.0
+    records["n_pixel"]   = rs.randint(0, 1000, n)
+    records["n_kluster"] = rs.randint(0, 100, n)
+    records["n_gamma"]   = rs.randint(0, 50, n)
+
+    return records
+
+class ProfileTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary profile file.
+        fd, self.path = tempfile.mkstemp(suffix=".bin"); os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_v2_round_trip(self):
+
+        ## The records (not in start time order).
+        records = makeRecords(500)
+
+        writeProfile(self.path, records, "B06-W0212", "2014-04-02-150255")
+
+        ## The header.
+        header = readProfileHeader(self.path)
+
+        ## The size of the header [bytes].
+        header_size = struct.calcsize(PROFILE_HEADER_V2)
+
+        self.assertEqual(header["version"], 2)
+        self.assertEqual(header["chipid"], "B06-W0212")
+        self.assertEqual(header["runid"], "2014-04-02-150255")
+        self.assertEqual(header["n_frames"], 500)
+        self.assertEqual(header["first_hour"], int(records["st"].min() // 3600))
+        self.assertEqual(header["n_hours"], int(records["st"].max() // 3600) - header["first_hour"] + 1)
+        self.assertEqual(header["index_offset"], header_size)
+        self.assertEqual(header["offset"], header_size + 4 * (header["n_hours"] + 1))
+        self.assertEqual(os.path.getsize(self.path), header["offset"] + 500 * PROFILE_RECORD_V2.itemsize)
+
+        ## The profile.
+        pf = PixelRateProfile(self.path)
+
+        self.assertEqual(pf.getVersion(), 2)
+        self.assertEqual(pf.getChipId(), "B06-W0212")
+        self.assertEqual(pf.getRunId(), "2014-04-02-150255")
+        self.assertEqual(pf.getNumberOfFrames(), 500)
+        self.assertTrue(pf.isOrdered())
+
+        # The records are written in start time order.
+        self.assertEqual(pf.getRecords().tolist(), np.sort(records, order="st").tolist())
+
+    def test_hour_index(self):
+
+        ## The frame start times [s], in order.
+        sts = np.sort(makeRecords(500)["st"])
+
+        first_hour, index = getHourIndex(sts)
+
+        self.assertEqual(first_hour, int(sts[0] // 3600))
+        self.assertEqual(index[-1], len(sts))
+
+        # Check the index against a brute force count.
+        for h, i in enumerate(index):
+            self.assertEqual(i, np.sum(sts < 3600.0 * (first_hour + h)))
+
+        # Unsorted records - the index written must still be right.
+        writeProfile(self.path, makeRecords(500, seed=7))
+
+        ## The profile.
+        pf = PixelRateProfile(self.path)
+
+        ## The start times [s] in the file.
+        sts = pf.getRecords()["st"]
+
+        for start in range(1396447375 - 3600, 1396447375 + 7 * 3600, 1800):
+
+            ## The hours covering the range.
+            lo, hi = pf.getHourBounds(start, start + 2999)
+
+            ## The frames in the range (by brute force).
+            sel = np.flatnonzero((sts >= start) & (sts <= start + 2999))
+
+            if len(sel) > 0:
+                self.assertTrue(lo <= sel[0] and sel[-1] < hi)
+
+            self.assertEqual(pf.getFramesInRange(start, start + 2999).tolist(), pf.getRecords()[sel].tolist())
+
+        # An empty profile.
+        first_hour, index = getHourIndex(np.zeros(0))
+
+        self.assertEqual(index.tolist(), [0])
+
+        writeProfile(self.path, np.zeros(0, dtype=PROFILE_RECORD_V2))
+
+        self.assertEqual(readProfileHeader(self.path)["n_frames"], 0)
+        self.assertEqual(readProfileHeader(self.path)["n_hours"], 0)
+
+        pf = PixelRateProfile(self.path)
+
+        self.assertEqual(pf.getNumberOfFrames(), 0)
+        self.assertEqual(len(pf.getFramesInRange(0, 2**32)), 0)
+
+    def test_v1_profile(self):
+
+        ## The frames (start time [s], acquisition time [s], number of hit pixels), not in order.
+        frames = [(1396447375 + 60 * i, 60, (37 * i) % 1000) for i in [3, 0, 2, 1, 4]]
+
+        # Write the profile as get-pixel-rate-binary.py did.
+        with open(self.path, "wb") as f:
+            for st, acqtime, n_pixel in frames:
+                f.write(struct.pack('IhH', st, acqtime, n_pixel))
+
+        self.assertEqual(readProfileHeader(self.path), None)
+
+        ## The profile.
+        pf = PixelRateProfile(self.path)
+
+        self.assertEqual(pf.getVersion(), 1)
+        self.assertEqual(pf.getChipId(), "")
+        self.assertEqual(pf.getRecords().dtype, PROFILE_RECORD)
+        self.assertEqual(pf.getRecords().tolist(), frames)
+        self.assertFalse(pf.isOrdered())
+
+        self.assertEqual(pf.getFramesInRange(1396447375 + 60, 1396447375 + 180).tolist(), sorted(frames)[1:4])
+
+    def test_v1_write(self):
+
+        ## The frames (start time [s], acquisition time [s], number of hit pixels), at the edges of the ranges.
+        frames = [(1396447375, 60, 0), (2**32 - 1, 32767, 65535), (0, -32768, 12)]
+
+        writeProfileV1(self.path, frames)
+
+        # The file is as struct.pack wrote it.
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), "".join(struct.pack('IhH', *fr) for fr in frames))
+
+        self.assertEqual(PixelRateProfile(self.path).getRecords().tolist(), frames)
+
+        # Values that don't fit are an error, not wrapped around.
+        for bad in [(1396447375, 60, 65536), (1396447375, 32768, 10), (1396447375, -32769, 10), \
+                    (2**32, 60, 10), (-1, 60, 10)]:
+            self.assertRaises(IOError, writeProfileV1, self.path, frames + [bad])
+
+        # No frames.
+        writeProfileV1(self.path, [])
+
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    def test_split_frames_by_day(self):
+
+        ## The start of 2014-04-03 (UTC) [s].
+        midnight = 1396483200
+
+        # The day start time is UTC, whatever the local time zone.
+        tz = os.environ.get("TZ")
+        #
+        try:
+            os.environ["TZ"] = "America/New_York"; time.tzset()
+            self.assertEqual(getDayStartTime("2014-04-03-UTC"), midnight)
+        finally:
+            if tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = tz
+            time.tzset()
+        #
+        self.assertEqual(getDayStartTime("2014-04-02-UTC"), midnight - 86400)
+
+        ## The frames (not in order) either side of midnight.
+        frames = np.zeros(6, dtype=PROFILE_RECORD_V2)
+        #
+        frames["st"] = midnight + np.array([30.0, -120.0, 0.0, -0.5, 86400.0 - 60.0, -60.0])
+        frames["n_pixel"] = np.arange(6)
+
+        ## The frames in each day.
+        days = splitFramesByDay(frames)
+
+        self.assertEqual(sorted(days.keys()), [midnight - 86400, midnight])
+        self.assertEqual(days[midnight - 86400]["n_pixel"].tolist(), [1, 5, 3])
+        self.assertEqual(days[midnight]["n_pixel"].tolist(), [2, 0, 4])
+
+        self.assertEqual(splitFramesByDay(frames[:0]), {})
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_profile.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_profile.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the Poisson distribution to check against.
+from scipy.stats import poisson
+
+#...for the rate statistics.
+from rates import logPoissonPmf, poissonPmf, estimateRate, getRateHistogram, mergeBins, getChi2, fitRate, getWindowedRates
+
+class RatesTest(unittest.TestCase):
+
+    def test_poisson_pmf(self):
+
+        ## The numbers of events.
+        ks = np.arange(0, 50)
+
+        for Lambda in [0.5, 7.5, 30.0]:
+            self.assertTrue(np.allclose(poissonPmf(ks, Lambda), poisson.pmf(ks, Lambda)))
+
+        # No overflow for large numbers of clusters.
+        self.assertTrue(np.all(np.isfinite(logPoissonPmf([0, 1000, 5000], 4000.0))))
+        self.assertAlmostEqual(float(poissonPmf(4000, 4000.0)), poisson.pmf(4000, 4000.0))
+
+        # No rate - all of the probability is in the first bin.
+        self.assertEqual(poissonPmf([0, 1, 2], 0.0).tolist(), [1.0, 0.0, 0.0])
+
+    def test_estimate_rate(self):
+
+        Lambda, Lambda_err = estimateRate([5, 8, 7, 10, 6, 9])
+
+        self.assertAlmostEqual(Lambda, 7.5)
+        self.assertAlmostEqual(Lambda_err, np.sqrt(45.0) / 6.0)
+
+        self.assertRaises(IOError, estimateRate, [])
+
+    def test_rate_histogram(self):
+
+        ## The clusters per frame.
+        cpf = [0, 3, 3, 7, 12]
+
+        n, bins = getRateHistogram(cpf)
+
+        self.assertEqual(bins.tolist(), range(21))
+        self.assertEqual(n.tolist(), np.histogram(cpf, bins=bins)[0].tolist())
+
+    def test_merge_bins(self):
+
+        ## The observed bin contents.
+        observed = np.array([1., 0., 3., 9., 20., 15., 6., 2., 1., 0.])
+
+        ## The expected bin contents.
+        expected = np.array([0.5, 1.5, 4., 10., 18., 14., 7., 3., 1.5, 0.5])
+
+        obs, exp = mergeBins(observed, expected, 5.0)
+
+        self.assertEqual(obs.tolist(), [4., 9., 20., 15., 6., 3.])
+        self.assertEqual(exp.tolist(), [6., 10., 18., 14., 7., 5.])
+
+        # Nothing merged if the bins all have enough expected entries.
+        obs, exp = mergeBins(observed, expected, 0.1)
+
+        self.assertEqual(obs.tolist(), observed.tolist())
+
+        # Everything merged if none do.
+        obs, exp = mergeBins(observed, expected, 100.0)
+
+        self.assertEqual(obs.tolist(), [57.])
+        self.assertEqual(exp.tolist(), [60.])
+
+    def test_chi2(self):
+
+        observed = [4., np.nan, 6., 2.]
+        expected = [3., 1., 5., 4.]
+
+        chi2, n_deg_free, chi2_div = getChi2(observed, expected, 1)
+
+        self.assertAlmostEqual(chi2, 1./3. + 1. + 1./5. + 1.)
+        self.assertEqual(n_deg_free, 3)
+        self.assertAlmostEqual(chi2_div, chi2 / 3.)
+
+    def test_fit_rate(self):
+
+        ## The clusters per frame.
+        cpf = np.random.RandomState(42).poisson(7.5, 200)
+
+        fit = fitRate(cpf, 5.0)
+
+        self.assertEqual(fit["n_frames"], 200)
+        self.assertEqual(fit["n_klusters"], cpf.sum())
+        self.assertAlmostEqual(fit["Lambda"], cpf.mean())
+        self.assertEqual(len(fit["n"]), len(fit["bins"]) - 1)
+        self.assertTrue(fit["n_deg_free"] > 0)
+        self.assertTrue(fit["chi2_div"] < 3.0)
+
+    def test_windowed_rates(self):
+
+        ## The random number generator.
+        rs = np.random.RandomState(7)
+
+        ## The frame start times [s] (not in order).
+        sts = rs.permutation(1396447375 + 60 * np.arange(100) + rs.randint(0, 10, 100))
+
+        ## The frame acquisition times [s].
+        ats = rs.choice([10.0, 30.0, 60.0], 100)
+
+        ## The clusters per frame.
+        ks = rs.poisson(0.1 * ats)
+
+        w = getWindowedRates(sts, ats, ks, 600, 300)
+
+        self.assertEqual(w["start"][0], sts.min())
+        self.assertTrue(w["start"][-1] <= sts.max())
+        self.assertTrue(w["start"][-1] + 300 > sts.max())
+
+        # Check each window against a straightforward calculation.
+        for i, start in enumerate(w["start"]):
+
+            ## The frames in the window.
+            sel = (sts >= start) & (sts < start + 600)
+
+            ## The rate [clusters per second].
+            rate = float(ks[sel].sum()) / ats[sel].sum()
+
+            self.assertEqual(w["n_frames"][i], sel.sum())
+            self.assertEqual(w["n_klusters"][i], ks[sel].sum())
+            self.assertAlmostEqual(w["rate"][i], rate)
+            self.assertAlmostEqual(w["rate_err"][i], np.sqrt(ks[sel].sum()) / ats[sel].sum())
+            self.assertAlmostEqual(w["Lambda"][i], ks[sel].mean())
+            self.assertAlmostEqual(w["chi2"][i], np.sum((ks[sel] - rate * ats[sel])**2 / (rate * ats[sel])))
+            self.assertEqual(w["n_deg_free"][i], sel.sum() - 1)
+
+        # Empty windows.
+        w = getWindowedRates([0, 10, 1000], [10.0, 10.0, 10.0], [1, 2, 3], 100)
+
+        self.assertEqual(w["n_frames"].tolist(), [2] + [0] * 9 + [1])
+        self.assertTrue(np.isnan(w["rate"][1]))
+        self.assertTrue(np.isnan(w["chi2"][1]))
+
+        self.assertRaises(IOError, getWindowedRates, [0], [10.0], [1], 0)
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_rates.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===============================================")
+    lg.info(" Logger output from cernatschool/test_rates.py ")
+    lg.info("===============================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, glob
+
+#...for the unit testing.
+import unittest
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the logging.
+import logging as lg
+
+#...for the data file readers.
+from readers import readDataBuffer, getPixelMapFromArrays, countTokens
+
+#...for the MATH.
+import numpy as np
+
+#...for the DSC file wrapper.
+from dsc import DscFile
+
+#...for the dataset wrapper.
+from dataset import Dataset
+
+## The path to the ASCII test data.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/"
+
+def writeBinaryDataset(path, fmt):
+    """ Write a binary copy of the ASCII test data in the given format. """
+
+    for df in Dataset(TEST_DATA_PATH).getDscFiles():
+
+        bn = os.path.basename(df.getDataFilename())
+
+        xs, cs = df.getPixelArrays()
+
+        with open(df.getDscFilename(), "r") as f:
+            ls = f.readlines()
+
+        if   fmt == 4113:
+            data = np.zeros(len(xs), dtype=[("x", "<u2"), ("y", "<u2"), ("C", "<i2")])
+            data["x"] = xs % 256; data["y"] = xs // 256; data["C"] = cs
+        elif fmt == 8209:
+            data = np.zeros(len(xs), dtype=[("X", "<u4"), ("C", "<i2")])
+            data["X"] = xs; data["C"] = cs
+            ls[2] = "Type=i16 [X,C] width=256 height=256\n"
+        else:
+            data = np.zeros(256*256, dtype="<i2")
+            data[xs] = cs
+            ls[2] = "Type=i16 matrix width=256 height=256\n"
+
+        data.tofile(os.path.join(path, bn))
+
+        with open(os.path.join(path, bn + ".dsc"), "w") as f:
+            f.writelines(ls)
+
+class ReadersTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_read_formats(self):
+
+        ## The pixel map expected from each of the buffers below.
+        pm = {1:5, 256:7, 514:2}
+
+        # The tests
+        #-----------
+        #
+        # ASCII xyC.
+        self.assertEqual(getPixelMapFromArrays(*readDataBuffer("1\t0\t5\n0\t1\t7\n2\t2\t2\n", 4114, 256, 256)), pm)
+        #
+        # ASCII XC.
+        self.assertEqual(getPixelMapFromArrays(*readDataBuffer("1\t5\n256\t7\n514\t2\n", 8210, 256, 256)), pm)
+        #
+        # ASCII matrix.
+        rows = [["0"]*256 for j in range(256)]
+        rows[0][1] = "5"; rows[1][0] = "7"; rows[2][2] = "2"
+        self.assertEqual(getPixelMapFromArrays(*readDataBuffer("\n".join(" ".join(r) for r in rows), 18, 256, 256)), pm)
+        #
+        # Binary [X, C] (u32 X, i16 C).
+        self.assertEqual(getPixelMapFromArrays(*readDataBuffer(np.array([(1, 5), (256, 7), (514, 2)], dtype=[("X", "<u4"), ("C", "<i2")]).tostring(), 8209, 256, 256)), pm)
+        #
+        # Empty frames.
+        self.assertEqual(getPixelMapFromArrays(*readDataBuffer("", 4114, 256, 256)), {})
+        #
+        # Bad rows and formats.
+        self.assertRaises(IOError, readDataBuffer, "1\t0\n", 4114, 256, 256)
+        self.assertRaises(IOError, readDataBuffer, "1\t0\t5\n", 1, 256, 256)
+        #
+        # Bad values (at the start of a row, and within one).
+        self.assertRaises(IOError, readDataBuffer, "1\t0\t5\nx\t1\t7\n2\t2\t2\n", 4114, 256, 256)
+        self.assertRaises(IOError, readDataBuffer, "1\t0\t5\n0\t1\tx\n", 4114, 256, 256)
+        #
+        # Counting the values.
+        for buf in ["", " ", "1", " 1\t2\n", "1\t0\t5\r\n0 1  7\n\n", "x"]:
+            self.assertEqual(countTokens(buf), len(buf.split()))
+
+    def test_dsc_pixel_arrays(self):
+
+        ## The DSC file.
+        df = DscFile("testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/B06-W0212_2014-04-02-140255.txt.dsc")
+
+        xs, cs = df.getPixelArrays()
+
+        # The tests
+        #-----------
+        #
+        # The pixel map is a view of the pixel arrays.
+        self.assertEqual(df.getPixelMap(), dict(zip(xs.tolist(), cs.tolist())))
+        self.assertEqual(len(df.getPixelMap()), len(xs))
+
+    def test_binary_datasets(self):
+
+        ## The frames from the ASCII test data.
+        ascii_frames = Dataset(TEST_DATA_PATH).getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+        for fmt in [4113, 8209, 17]:
+
+            ## A temporary folder for the binary dataset.
+            path = tempfile.mkdtemp()
+
+            try:
+                writeBinaryDataset(path, fmt)
+
+                ## The binary dataset.
+                ds = Dataset(path)
+
+                # The tests
+                #-----------
+                #
+                # The data format of the folder.
+                self.assertEqual(ds.getDataFormat(), fmt)
+                #
+                # The frames are the same as the ASCII frames.
+                for f, ref in zip(ds.getFrames((0.0, 0.0, 0.0), skipclustering=True), ascii_frames):
+                    self.assertEqual(f.getPixelMap(), ref.getPixelMap())
+                    self.assertEqual(f.getStartTime(), ref.getStartTime())
+            finally:
+                rmtree(path)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_readers.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_readers.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
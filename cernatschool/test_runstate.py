@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the dataset wrapper.
+from dataset import Dataset
+
+#...for the run state.
+from runstate import RunState
+
+## The path to the test data.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255/RAW/ASCIIxyC/"
+
+## The run settings.
+SETTINGS = {"dataset":TEST_DATA_PATH, "mask":[1, 2, 3], "raster":False}
+
+class RunStateTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The output folder.
+        self.path = tempfile.mkdtemp()
+
+        ## The path of the state file.
+        self.state_path = os.path.join(self.path, "state.json")
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_resume(self):
+
+        ## The dataset.
+        ds = Dataset(TEST_DATA_PATH)
+
+        ## The DSC file wrappers.
+        dfs = ds.getDscFiles()
+
+        state = RunState(self.state_path, SETTINGS)
+
+        self.assertFalse(state.isResumed())
+
+        for i, df in enumerate(dfs[:10]):
+            state.add(os.path.basename(df.getDataFilename()), ds.getFileStat(df), "frame_%02d" % (i))
+
+        state.save()
+
+        # Reload the state.
+        state = RunState(self.state_path, SETTINGS)
+
+        self.assertTrue(state.isResumed())
+        self.assertEqual(len(state.getNames()), 10)
+
+        for i, df in enumerate(dfs):
+
+            ## The data file name.
+            name = os.path.basename(df.getDataFilename())
+
+            self.assertEqual(state.isDone(name, ds.getFileStat(df)), i < 10)
+
+        ## The name of the first frame's data file.
+        name = os.path.basename(dfs[0].getDataFilename())
+
+        self.assertEqual(state.getId(name), "frame_00")
+
+        # A changed file.
+        stat = ds.getFileStat(dfs[0]); stat[1] += 1.0
+        #
+        self.assertFalse(state.isDone(name, stat))
+
+        state.remove(name)
+
+        self.assertEqual(state.getId(name), None)
+        self.assertEqual(len(state.getNames()), 9)
+
+    def test_changed_settings(self):
+
+        state = RunState(self.state_path, SETTINGS)
+
+        state.add("a.txt", [1, 2.5, 3, 4.5], "frame_a")
+
+        state.save()
+
+        self.assertTrue(RunState(self.state_path, SETTINGS).isResumed())
+
+        ## The changed settings.
+        settings = dict(SETTINGS); settings["raster"] = True
+
+        state = RunState(self.state_path, settings)
+
+        self.assertFalse(state.isResumed())
+        self.assertEqual(state.getNames(), [])
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_runstate.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("==================================================")
+    lg.info(" Logger output from cernatschool/test_runstate.py ")
+    lg.info("==================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, glob
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary files.
+import tempfile
+
+#...for the tar archives.
+import tarfile
+
+#...for sending the DSC files to other processes.
+import pickle
+
+#...for the dataset wrapper.
+from dataset import Dataset
+
+#...for the dataset sources.
+from sources import getSource, FolderSource, ZipSource, TarSource, OPEN_ARCHIVES
+
+#...for counting the format checks.
+import instrumentation
+
+## The path to the test dataset.
+TEST_DATA_PATH = "testdata/B06-W0212/2014-04-02-150255"
+
+class SourcesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The frames from the unpacked test data.
+        self.ref_frames = Dataset(TEST_DATA_PATH + "/RAW/ASCIIxyC").getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+    def tearDown(self):
+        pass
+
+    def checkFrames(self, ds):
+        """ Check a dataset's frames against the unpacked test data. """
+
+        self.assertEqual(ds.getNumberOfDataFiles(), 60)
+        self.assertEqual(ds.getFolderFormat(), "ASCII [x, y, C]")
+
+        for f, ref in zip(ds.getFrames((0.0, 0.0, 0.0), skipclustering=True), self.ref_frames):
+            self.assertEqual(f.getStartTime(), ref.getStartTime())
+            self.assertEqual(f.getPixelMap(), ref.getPixelMap())
+
+    def test_formats_found_once(self):
+
+        instrumentation.enable(); instrumentation.reset()
+
+        try:
+            for path in [TEST_DATA_PATH + "/RAW/ASCIIxyC", glob.glob(TEST_DATA_PATH + "/ZIP/*.zip")[0]]:
+
+                ## The dataset.
+                ds = Dataset(path)
+
+                ## The number of format checks made finding the data and DSC files.
+                n = instrumentation.getSummary()["timers"]["format"]["n"]
+
+                self.assertEqual(n, 120)
+
+                # The frames are read without checking the formats again.
+                ds.getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+                self.assertEqual(instrumentation.getSummary()["timers"]["format"]["n"], n)
+
+                instrumentation.reset()
+        finally:
+            instrumentation.disable(); instrumentation.reset()
+
+    def test_zip_source(self):
+
+        ## The path to the ZIP archive.
+        zip_path = glob.glob(TEST_DATA_PATH + "/ZIP/*.zip")[0]
+
+        # The tests
+        #-----------
+        #
+        self.assertTrue(isinstance(getSource(zip_path), ZipSource))
+        self.assertTrue(isinstance(getSource(TEST_DATA_PATH + "/RAW/ASCIIxyC"), FolderSource))
+        #
+        ## The dataset read from the archive.
+        ds = Dataset(zip_path)
+        #
+        self.checkFrames(ds)
+        #
+        # The DSC files can be sent to (and read in) other processes.
+        df = pickle.loads(pickle.dumps(ds.getDscFiles()[0]))
+        self.assertEqual(df.getPixelMap(), self.ref_frames[0].getPixelMap())
+
+    def test_tar_source(self):
+
+        ## The data files, in name order.
+        fns = sorted(glob.glob(TEST_DATA_PATH + "/RAW/ASCIIxyC/*"))
+
+        # Uncompressed and compressed archives, with the members in and
+        # out of (name) order.
+        for mode in ["w", "w:gz", "w:bz2"]:
+            for order in [fns, fns[::-1]]:
+
+                ## The tar archive.
+                tf = tempfile.NamedTemporaryFile(suffix=".tar")
+
+                with tarfile.open(tf.name, mode) as tar:
+                    for fn in order:
+                        tar.add(fn, arcname=os.path.basename(fn))
+
+                # The tests
+                #-----------
+                #
+                ## The source.
+                source = getSource(tf.name)
+                #
+                self.assertTrue(isinstance(source, TarSource))
+                #
+                ## The dataset read from the archive.
+                ds = Dataset(tf.name)
+                #
+                self.checkFrames(ds)
+                #
+                ds.close()
+                #
+                # The archive isn't held open once the frames have been read.
+                self.assertEqual([k for k in OPEN_ARCHIVES if k[1] == tf.name], [])
+                #
+                ## The start of a data file (read to find its format).
+                head = source.readHead(os.path.basename(fns[1]))
+                #
+                self.assertTrue("\n" in head)
+                self.assertTrue(open(fns[1], "rb").read().startswith(head))
+                self.assertRaises(IOError, source.readHead, "not-a-file.txt")
+                #
+                # A compressed archive is read from a temporary (uncompressed) copy, removed on closing.
+                self.assertEqual(source.tarpath != tf.name, mode != "w")
+                #
+                source.close()
+                #
+                self.assertEqual(os.path.exists(source.tarpath), mode == "w")
+                self.assertEqual([k for k in OPEN_ARCHIVES if k[1] == tf.name], [])
+
+                tf.close()
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_sources.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_sources.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
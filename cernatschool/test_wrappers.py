@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the time wrappers.
+from timestuff.wrappers import FrameColumns, DataDay
+
+## The start of the test day (2014-04-02 00:00:00 UTC) [s].
+DAY_START_S = 1396396800
+
+class WrappersTest(unittest.TestCase):
+
+    def test_frame_columns(self):
+
+        fc = FrameColumns()
+
+        # Enough frames for the columns to grow (more than once).
+        for i in range(40):
+            fc.append(DAY_START_S + i, 60.0, i)
+        #
+        fc.extend(DAY_START_S + np.arange(40, 100), np.full(60, 30.0), np.arange(40, 100))
+
+        self.assertEqual(len(fc), 100)
+        self.assertEqual(fc.getColumn("st").tolist(), (DAY_START_S + np.arange(100)).tolist())
+        self.assertEqual(fc.getColumn("acqtime").tolist(), [60.0] * 40 + [30.0] * 60)
+        self.assertEqual(fc.getColumn("n_pixel").tolist(), range(100))
+
+    def test_add_frames(self):
+
+        ## The random number generator.
+        rs = np.random.RandomState(42)
+
+        ## The frame start times [s] (not in order, and missing some hours).
+        sts = DAY_START_S + np.concatenate((rs.uniform(0, 6 * 3600, 300), rs.uniform(12 * 3600, 86400, 200)))
+        #
+        rs.shuffle(sts)
+
+        ## The acquisition times [s].
+        ats = rs.choice([10.0, 60.0], len(sts))
+
+        ## The numbers of hit pixels.
+        ns = rs.randint(0, 1000, len(sts))
+
+        ## The days, with the frames added one at a time and in bulk.
+        day1 = DataDay(DAY_START_S, DAY_START_S + 86399)
+        day2 = DataDay(DAY_START_S, DAY_START_S + 86399)
+        #
+        for st, at, n in zip(sts, ats, ns):
+            day1.addFrame(st, at, n)
+        #
+        day2.addFrames(sts, ats, ns)
+
+        self.assertEqual(day2.getNumberOfFrames(), 500)
+        self.assertEqual(day2.getNumberOfFrames(), day1.getNumberOfFrames())
+        self.assertEqual(day2.getFramesInEachHour(), day1.getFramesInEachHour())
+        self.assertEqual(sum(day2.getFramesInEachHour().values()), 500)
+        self.assertEqual(day2.getFramesInEachHour()[8], 0)
+
+        for hour in range(24):
+
+            h1, h2 = day1.getHour(hour), day2.getHour(hour)
+
+            self.assertEqual(h2.getNumberOfFrames(), day2.getFramesInEachHour()[hour])
+            self.assertEqual(h2.getStartTimes().tolist(), h1.getStartTimes().tolist())
+            self.assertEqual(h2.getAcqTimes().tolist(), h1.getAcqTimes().tolist())
+            self.assertEqual(h2.getNumberOfPixels().tolist(), h1.getNumberOfPixels().tolist())
+
+        self.assertEqual(day2.getPixelsInEachHour(), day1.getPixelsInEachHour())
+        self.assertEqual(day2.getLiveTimeInEachHour(), day1.getLiveTimeInEachHour())
+
+    def test_hour_sums(self):
+
+        ## The test day.
+        day = DataDay(DAY_START_S, DAY_START_S + 86399)
+
+        # Frames in the first and third hours (one with a bad acquisition time).
+        day.addFrames(DAY_START_S + np.array([0, 30, 125, 150, 7200 + 3599]), \
+                      [60.0, 20.0, 60.0, -1.0, 60.0], \
+                      [10, 5, 7, 3, 100])
+
+        self.assertEqual(day.getPixelsInEachHour()[0], 25)
+        self.assertEqual(day.getPixelsInEachHour()[1], 0)
+        self.assertEqual(day.getPixelsInEachHour()[2], 100)
+
+        self.assertEqual(day.getLiveTimeInEachHour()[0], 140.0)
+        self.assertEqual(day.getDeadTimeInEachHour()[0], 3460.0)
+        self.assertEqual(day.getDeadTimeInEachHour()[1], 3600.0)
+        self.assertEqual(day.getDeadTimeInEachHour()[2], 3540.0)
+
+        self.assertAlmostEqual(day.getPixelRateInEachHour()[0], 25.0 / 140.0)
+        self.assertEqual(day.getPixelRateInEachHour()[1], 0.0)
+
+        ## The first hour.
+        hour = day.getHour(0)
+
+        self.assertEqual(hour.getFramesInEachMinute()[:4].tolist(), [2, 0, 2, 0])
+        self.assertEqual(hour.getFramesInEachMinute().sum(), 4)
+        self.assertEqual(hour.getPixelsInEachMinute()[:4].tolist(), [15, 0, 10, 0])
+        self.assertEqual(hour.getLiveTimeInEachMinute()[:4].tolist(), [80.0, 0.0, 60.0, 0.0])
+        self.assertEqual(hour.getPixelRateInEachMinute()[:4].tolist(), [15.0 / 80.0, 0.0, 10.0 / 60.0, 0.0])
+
+        # The frame starting in the last second of the third hour.
+        self.assertEqual(day.getHour(2).getFramesInEachMinute()[59], 1)
+        self.assertEqual(len(day.getHour(2).getFramesInEachMinute()), 60)
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_wrappers.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("==================================================")
+    lg.info(" Logger output from cernatschool/test_wrappers.py ")
+    lg.info("==================================================")
+    lg.info("")
+
+    unittest.main()
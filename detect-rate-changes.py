@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Detect changes in the rate
+
+ See the README.md file for more information.
+
+"""
+
+#...for the operating system tools.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for the time functionality.
+import time
+
+#...for the change table.
+import csv
+
+#...for reading the frame properties.
+from cernatschool.framestore import readFrameColumns
+
+#...for reading the pixel rate profiles.
+from timestuff.profile import PixelRateProfile
+
+#...for the rate change detection.
+from cernatschool.changepoint import RateChangeDetector, replayRates, saveDetector, loadDetector
+
+## The name of the rate changes table (in the output folder).
+RATE_CHANGES_CSV = "rate-changes.csv"
+
+## The name of the rate change detector state file (in the output folder).
+RATE_CHANGES_STATE_JSON = "rate-changes-state.json"
+
+## The columns of the rate changes table.
+RATE_CHANGES_COLUMNS = ["time", "utc", "start", "direction", "rate_before", "rate_after", "statistic", "frame"]
+
+def readRecords(datapath, counts):
+    """
+    Read the frames' start times, acquisition times and counts.
+
+    @param [in] datapath A process-frames.py output folder or a pixel rate profile.
+    @param [in] counts The counts to look at ("n_kluster" or "n_pixel").
+    @returns sts The frame start times [s].
+    @returns ats The frame acquisition times [s].
+    @returns ns The frame counts.
+    """
+
+    if os.path.isdir(datapath):
+        cols = readFrameColumns(datapath, ["start_time", "acqtime", counts])
+        return cols["start_time"], cols["acqtime"], cols[counts]
+
+    ## The profile records.
+    records = PixelRateProfile(datapath).getRecords()
+
+    if counts not in records.dtype.names:
+        raise IOError("* ERROR: '%s' has no %s values (use a version 2 profile)!" % (datapath, counts))
+
+    return records["st"].tolist(), records["acqtime"].tolist(), records[counts].tolist()
+
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*==========================================*")
+    print("* CERN@school - detect changes in the rate *")
+    print("*==========================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",         help="Path to the process-frames.py output or a pixel rate profile (.bin).")
+    parser.add_argument("outputPath",        help="The path for the output files.")
+    parser.add_argument("-c", "--counts",    help="The counts to look at.", choices=["n_kluster", "n_pixel"], default="n_kluster")
+    parser.add_argument("-d", "--shift",     help="The relative change in the rate to look for.", type=float, default=0.5)
+    parser.add_argument("-H", "--threshold", help="The CUSUM threshold for flagging a change.", type=float, default=10.0)
+    parser.add_argument("-w", "--warmup",    help="The number of frames used to estimate the rate before (and after) a change.", type=int, default=30)
+    parser.add_argument("-i", "--incremental", help="Carry on from the saved detector state, only replaying the frames since the last run.", action="store_true")
+    parser.add_argument("-v", "--verbose",   help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data.
+    datapath = args.inputPath
+    #
+    # Check if the input exists. If it doesn't, quit.
+    if not os.path.exists(datapath):
+        raise IOError("* ERROR: '%s' does not exist!" % (datapath))
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=os.path.join(outputpath, 'log_detect-rate-changes.log'), filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Counts              : %s" % (args.counts))
+    print("* Shift, threshold    : %.3f, %.3f" % (args.shift, args.threshold))
+    print("*")
+
+    ## The frame start times, acquisition times and counts.
+    sts, ats, ns = readRecords(datapath, args.counts)
+
+    ## The detector state filename.
+    state_filename = os.path.join(outputpath, RATE_CHANGES_STATE_JSON)
+
+    ## The run settings (the saved detector state is only used if these match).
+    settings = {"input":os.path.abspath(datapath), "counts":args.counts, \
+                "shift":args.shift, "threshold":args.threshold, "warmup":args.warmup}
+
+    ## The rate change detector.
+    detector = None
+    #
+    if args.incremental:
+        detector = loadDetector(state_filename, settings)
+
+    ## Is the detector carrying on from the last run?
+    resumed = detector is not None
+
+    if resumed:
+
+        # Only replay the frames that started after the last frame seen.
+        new = [i for i, st in enumerate(sts) if st > detector.last_time]
+        #
+        sts, ats, ns = [sts[i] for i in new], [ats[i] for i in new], [ns[i] for i in new]
+
+    else:
+        detector = RateChangeDetector(args.shift, args.threshold, args.warmup)
+
+    lg.info(" * Replaying %d frames from '%s'." % (len(sts), datapath))
+
+    ## The changes found.
+    changes = replayRates(sts, ats, ns, detector)
+
+    saveDetector(state_filename, detector, settings)
+
+    for change in changes:
+        change["utc"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(change["time"]))
+        print("* %s UTC: rate %-4s %10.5f -> %10.5f [%s per second]" % \
+            (change["utc"], change["direction"], change["rate_before"], change["rate_after"], args.counts))
+
+    ## The rate changes table filename.
+    changes_filename = os.path.join(outputpath, RATE_CHANGES_CSV)
+    #
+    # Add the new changes to the changes found in the earlier runs.
+    with open(changes_filename, "ab" if resumed and os.path.exists(changes_filename) else "wb") as cf:
+        writer = csv.writer(cf)
+        if cf.tell() == 0:
+            writer.writerow(RATE_CHANGES_COLUMNS)
+        for change in changes:
+            writer.writerow([change[key] for key in RATE_CHANGES_COLUMNS])
+
+    print("*")
+    print("* Found %d rate changes in %d frames (%d changes in %d frames in all)." % \
+        (len(changes), len(sts), detector.n_changes, detector.n_frames))
+    print("* The dispersion of the counts (1 for Poisson counts) was %.3f." % (detector.dispersion))
+    print("* The changes are in '%s'." % (changes_filename))
@@ -12,121 +12,117 @@
 #...for the operating system tools.
 import os
 
+#...for the input path patterns.
+import glob
+
 #...for parsing the arguments.
 import argparse
 
+#...for the timing.
+import timeit
+
 #...for the logging.
 import logging as lg
 
 #...for file manipulation.
 from shutil import rmtree
 
+#...for the parallel processing.
+from multiprocessing import Pool
+
 # Import the JSON library.
 import json
 
+#...for the summary table.
+import csv
+
 #...for the histograms.
-from plotting.poisson import RateHistogram
+from plotting.poisson import RateHistogram, RateTimePlot
 
+#...for reading the frame properties.
+from cernatschool.framestore import getFramePropertiesPath, readFrameColumns
 
-if __name__ == "__main__":
+#...for the rate statistics.
+from cernatschool.rates import fitRate, getWindowedRates
 
-    print("*")
-    print("*=================================*")
-    print("* CERN@school - estimate the rate *")
-    print("*=================================*")
+#...for writing the batch summary.
+from cernatschool.runstate import writeJson
 
-    # Get the datafile path from the command line.
-    parser = argparse.ArgumentParser()
-    parser.add_argument("inputPath",       help="Path to the input dataset.")
-    parser.add_argument("outputPath",      help="The path for the output files.")
-    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
-    args = parser.parse_args()
+#...for the timings.
+from cernatschool import instrumentation
 
-    ## The path to the data file.
-    datapath = args.inputPath
-    #
-    # Check if the input directory exists. If it doesn't, quit.
-    if not os.path.isdir(datapath):
-        raise IOError("* ERROR: '%s' input directory does not exist!" % (datapath))
+## The version of the batch summary JSON.
+RATE_SUMMARY_VERSION = 1
 
+## The name of the batch summary JSON (in the output folder).
+RATE_SUMMARY_JSON = "rates.json"
 
-    ## The output path.
-    outputpath = args.outputPath
-    #
-    # Check if the output directory exists. If it doesn't, quit.
-    if not os.path.isdir(outputpath):
-        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+## The name of the batch summary table (in the output folder).
+RATE_SUMMARY_CSV = "rates.csv"
 
+## The name of the folder of the runs' plots (in the output folder).
+RUN_PLOTS_FOLDER = "runs"
 
-    # Set the logging level.
-    if args.verbose:
-        level=lg.DEBUG
-    else:
-        level=lg.INFO
+## The columns of the batch summary table.
+RATE_SUMMARY_COLUMNS = ["run", "path", "n_frames", "n_klusters", "Lambda", "Lambda_err", "chi2", "n_deg_free", "chi2_div"]
 
-    # Configure the logging.
-    lg.basicConfig(filename=outputpath + '/log_estimate-rate.log', filemode='w', level=level)
+## The name of the windowed rates table (in a run's plot folder).
+RATE_WINDOWS_CSV = "rates_vs_time.csv"
 
-    print("*")
-    print("* Input path          : '%s'" % (datapath))
-    print("* Output path         : '%s'" % (outputpath))
-    print("*")
+## The columns of the windowed rates table.
+RATE_WINDOWS_COLUMNS = ["start", "end", "n_frames", "n_klusters", "acq_time", "rate", "rate_err", "Lambda", "Lambda_err", "chi2", "n_deg_free", "p_value"]
 
+def getClustersPerFrame(datapath):
+    """ Get the number of clusters in each frame of a processed run. """
+    return readFrameColumns(datapath, ["n_kluster"])["n_kluster"]
 
-    # Set up the directories
-    #------------------------
+def writeWindowedRates(datapath, plotpath, window, step=None):
+    """
+    Estimate a run's rate in time windows (see getWindowedRates),
+    writing the table and the rate vs. time plot to the plot folder.
 
-    # Create the subdirectories.
+    @param [in] datapath The path of the processed run.
+    @param [in] plotpath The path of the run's plots.
+    @param [in] window The window length [s].
+    @param [in] step The time between the window starts [s] (the window length if None).
+    @returns windows The windowed rates.
+    """
 
-    ## The path to the frame plots.
-    fppath = os.path.join(outputpath, "frameplots")
-    #
-    if os.path.isdir(fppath):
-        rmtree(fppath)
-        lg.info(" * Removing directory '%s'..." % (fppath))
-    os.mkdir(fppath)
-    lg.info(" * Creating directory '%s'..." % (fppath))
-    lg.info("")
-
-    ## The filename of the frame properties JSON.
-    frame_properties_json_filename = os.path.join(datapath, "frames.json")
-    #
-    # Check if it exists. If it doesn't, quit.
-    if not os.path.exists(frame_properties_json_filename):
-        raise IOError("* ERROR: '%s' output directory does not exist!" \
-            % (frame_properties_json_filename))
+    ## The frame start times, acquisition times and clusters per frame.
+    cols = readFrameColumns(datapath, ["start_time", "acqtime", "n_kluster"])
 
-    ## The frame properties JSON file.
-    ff = open(frame_properties_json_filename, "r")
-    #
-    fd = json.load(ff)
-    ff.close()
+    ## The windowed rates.
+    windows = getWindowedRates(cols["start_time"], cols["acqtime"], cols["n_kluster"], window, step)
 
-    # The frames
-    #------------
+    with open(os.path.join(plotpath, RATE_WINDOWS_CSV), "wb") as cf:
+        writer = csv.writer(cf)
+        writer.writerow(RATE_WINDOWS_COLUMNS)
+        for row in zip(*[windows[name].tolist() for name in RATE_WINDOWS_COLUMNS]):
+            writer.writerow(row)
 
-    ## The number of clusters per frame.
-    ncs = []
+    ## The rate vs. time plot.
+    rateplot = RateTimePlot(101, "rates_vs_time", plotpath)
+    rateplot.fill(windows, float(sum(cols["n_kluster"])) / sum(cols["acqtime"]))
+    rateplot.close()
 
-    lg.info(" * Looping over the frames ")
-    lg.info(" *-------------------------")
+    lg.info(" * Estimated the rate in %d windows of %f s." % (len(windows["start"]), window))
 
-    # Loop over the frames.
-    for f in fd:
+    return windows
 
-        ## The number of clusters in the frame.
-        n_k = f["n_kluster"]
+def getRunStamp(datapath):
+    """
+    Get the stamp of a processed run's frame properties - the size and
+    modification time of the file - to tell if the run has changed.
+    """
 
-        # Add to the frame property dictionaries.
-        ncs.append(n_k)
+    ## The file information.
+    st = os.stat(getFramePropertiesPath(datapath))
 
-        lg.info(" *--> Found % 3d clusters." % (n_k))
+    return [st.st_size, st.st_mtime]
 
-    ## The number of clusters plot.
-    nclplot = RateHistogram(100, "ncs", fppath, True)
-    ncl_Lambda, ncl_Lambda_err, ncl_chi2, ncl_n_free = nclplot.fill(ncs)
+def makeRatePage(datapath, n_frames, Lambda, Lambda_err, chi2, n_free, window=None):
+    """ Make the web page displaying a run's rate plot (and rate vs. time plot, for a window length). """
 
-    # Make the plot display page.
     fp = ""
     fp += "<!DOCTYPE html>\n"
     fp += "<html>\n"
@@ -140,7 +136,7 @@ if __name__ == "__main__":
     fp += "    <p>\n"
     fp += "      <ul>\n"
     fp += "        <li>Dataset path = '%s'</li>\n" % (datapath)
-    fp += "        <li>Number of frames = %d</li>\n" % (len(fd))
+    fp += "        <li>Number of frames = %d</li>\n" % (n_frames)
     fp += "      </ul>\n"
     fp += "    </p>\n"
     fp += "    <h2>Frame properties</h2>\n"
@@ -148,20 +144,401 @@ if __name__ == "__main__":
     fp += "      <caption>Fig. 1: Clusters per frame.</caption>\n"
     fp += "      <tr><td><img src=\"ncs.png\" /></td></tr>\n"
     fp += "    </table>\n"
-    fp += "    <p>Poisson distribution: &Lambda; = (% 7.3f &plusmn; % 7.3f)</p>\n" % (ncl_Lambda, ncl_Lambda_err)
-    fp += "    <p>Fit to Poisson: &chi;<sup>2</sup> = % 7.3f, N<sub>f</sub> = %d.</p>\n" % (ncl_chi2, ncl_n_free)
+    fp += "    <p>Poisson distribution: &Lambda; = (% 7.3f &plusmn; % 7.3f)</p>\n" % (Lambda, Lambda_err)
+    fp += "    <p>Fit to Poisson: &chi;<sup>2</sup> = % 7.3f, N<sub>f</sub> = %d.</p>\n" % (chi2, n_free)
+    #
+    if window is not None:
+        fp += "    <h2>Rate vs. time</h2>\n"
+        fp += "    <table>\n"
+        fp += "      <caption>Fig. 2: Clusters per second in %g s windows.</caption>\n" % (window)
+        fp += "      <tr><td><img src=\"rates_vs_time.png\" /></td></tr>\n"
+        fp += "    </table>\n"
+        fp += "    <p>The rate in each window: <a href=\"%s\">%s</a>.</p>\n" % (RATE_WINDOWS_CSV, RATE_WINDOWS_CSV)
+    #
     fp += "  </body>\n"
     fp += "</html>"
 
+    return fp
+
+def estimateRunRate(task):
+    """
+    Estimate the rate for a processed run in a batch, making its plot
+    and web page.
+
+    @param [in] task A (run name, run path, run plot path, minimum expected frames per bin, window length, window step) tuple.
+    @returns summary The run's summary (with an "error" if the rate couldn't be estimated).
+    """
+
+    name, datapath, plotpath, min_expected, window, step = task
+
+    ## The run's summary.
+    summary = {"run":name, "path":datapath}
+
+    try:
+        summary["stamp"] = getRunStamp(datapath)
+
+        ## The number of clusters in each frame.
+        ncs = getClustersPerFrame(datapath)
+
+        if len(ncs) == 0:
+            raise IOError("* ERROR: no frames found in '%s'!" % (datapath))
+    except IOError as e:
+        lg.error(" * Skipping '%s': %s" % (datapath, e))
+        summary["error"] = str(e)
+        return summary
+
+    instrumentation.count("frames", len(ncs))
+
+    ## The rate estimate and Chi^2.
+    fit = fitRate(ncs, min_expected)
+
+    for key in RATE_SUMMARY_COLUMNS[2:]:
+        summary[key] = fit[key]
+
+    # Make the plot and the web page.
+    if os.path.isdir(plotpath):
+        rmtree(plotpath)
+    os.makedirs(plotpath)
+
+    ## The number of clusters plot.
+    nclplot = RateHistogram(100, "ncs", plotpath)
+    nclplot.fill(ncs)
+    nclplot.close()
+
+    if window is not None:
+        writeWindowedRates(datapath, plotpath, window, step)
+
+    with open(os.path.join(plotpath, "index.html"), "w") as framepage:
+        framepage.write(makeRatePage(datapath, len(ncs), fit["Lambda"], fit["Lambda_err"], fit["chi2"], fit["n_deg_free"], window))
+
+    lg.info(" * Run '%s': \\Lambda = (%f +- %f), \\Chi^2 = %f (N_f = %d)" % \
+        (name, fit["Lambda"], fit["Lambda_err"], fit["chi2"], fit["n_deg_free"]))
+
+    return summary
+
+def runTask(task):
+    """
+    Estimate a run's rate (see estimateRunRate), returning its summary
+    and the timings recorded (None if they aren't being recorded).
+    """
+
+    return estimateRunRate(task), instrumentation.drain()
+
+def getInputPaths(patterns, listpath=None):
+    """
+    Get the processed run paths from the command line paths (or glob
+    patterns) and, optionally, a file listing one per line.
+    """
+
+    if listpath is not None:
+        with open(listpath, "r") as lf:
+            patterns = patterns + [l.strip() for l in lf if l.strip() != "" and not l.startswith("#")]
+
+    paths = []
+
+    for pattern in patterns:
+
+        ## The paths matching the pattern (the path itself if it isn't one).
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+
+        for p in matches:
+            if os.path.isdir(p) and os.path.abspath(p) not in [os.path.abspath(q) for q in paths]:
+                paths.append(p)
+
+    return paths
+
+def getRunNames(paths):
+    """
+    Get a unique name for each run - its path relative to the common
+    parent folder of the runs, with the separators replaced.
+    """
+
+    ## The absolute paths.
+    abspaths = [os.path.abspath(p) for p in paths]
+
+    ## The common parent folder.
+    parent = os.path.commonprefix([os.path.dirname(p) + os.sep for p in abspaths])
+    parent = parent[:parent.rfind(os.sep)]
+
+    return [os.path.relpath(p, parent).replace(os.sep, "_") for p in abspaths]
+
+def makeIndexPage(summaries):
+    """ Make the web page listing the rates of the runs in a batch. """
+
+    ip = ""
+    ip += "<!DOCTYPE html>\n"
+    ip += "<html>\n"
+    ip += "  <head>\n"
+    ip += "    <link rel=\"stylesheet\" type=\"text/css\" "
+    ip += "href=\"assets/css/style.css\">\n"
+    ip += "  </head>\n"
+    ip += "  <body>\n"
+    ip += "    <h1>Cluster Sorting: Particle Rates</h1>\n"
+    ip += "    <p>Number of runs = %d</p>\n" % (len(summaries))
+    ip += "    <table>\n"
+    ip += "      <tr><th>Run</th><th>Frames</th><th>&Lambda;</th><th>&chi;<sup>2</sup></th><th>N<sub>f</sub></th><th>Clusters per frame</th></tr>\n"
+    #
+    for s in summaries:
+        if "error" in s:
+            ip += "      <tr><td>%s</td><td colspan=\"5\">%s</td></tr>\n" % (s["run"], s["error"])
+            continue
+        #
+        ## The run's web page.
+        page = "%s/%s/index.html" % (RUN_PLOTS_FOLDER, s["run"])
+        #
+        ip += "      <tr><td><a href=\"%s\">%s</a></td><td>%d</td>" % (page, s["run"], s["n_frames"])
+        ip += "<td>% 7.3f &plusmn; % 7.3f</td><td>% 7.3f</td><td>%d</td>" % (s["Lambda"], s["Lambda_err"], s["chi2"], s["n_deg_free"])
+        ip += "<td><a href=\"%s\"><img src=\"%s/%s/ncs.png\" width=\"250\" /></a></td></tr>\n" % (page, RUN_PLOTS_FOLDER, s["run"])
+    #
+    ip += "    </table>\n"
+    ip += "  </body>\n"
+    ip += "</html>"
+
+    return ip
+
+def estimateBatchRates(args):
+    """
+    Estimate the rates of a batch of processed runs, writing a summary
+    table (CSV and JSON), a plot and web page for each run and an index
+    page. Only the runs that have changed since the last batch written
+    to the output folder are redone.
+
+    @param [in] args The command line arguments.
+    """
+
+    ## The output path.
+    outputpath = args.outputPath
+
+    ## The processed runs.
+    runpaths = getInputPaths(args.inputPath, args.list)
+
+    if len(runpaths) == 0:
+        raise IOError("* ERROR: no processed runs found!")
+
+    ## The run names.
+    runnames = getRunNames(runpaths)
+
+    print("*")
+    print("* Number of runs      : %d" % (len(runpaths)))
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Number of jobs      : %d" % (args.jobs))
+    print("*")
+
+    ## The path of the batch summary JSON.
+    summary_json_filename = os.path.join(outputpath, RATE_SUMMARY_JSON)
+
+    ## The summaries from the last batch {run path:summary}.
+    previous = {}
+    #
+    if os.path.exists(summary_json_filename) and not args.force:
+        with open(summary_json_filename, "r") as sf:
+            sj = json.load(sf)
+        if sj.get("version") == RATE_SUMMARY_VERSION and sj.get("min_expected") == args.min_expected and \
+            sj.get("window") == args.window and sj.get("step") == args.step:
+            previous = dict((s["path"], s) for s in sj["runs"])
+
+    ## The run summaries, in the order given.
+    summaries = [None] * len(runpaths)
+
+    ## The indices of the runs to (re)process.
+    todo = []
+
+    # Only the runs that have changed since the last batch are redone.
+    for i, (name, runpath) in enumerate(zip(runnames, runpaths)):
+
+        ## The run's summary from the last batch.
+        s = previous.get(os.path.abspath(runpath))
+
+        try:
+            unchanged = s is not None and s["run"] == name and "error" not in s and \
+                s["stamp"] == getRunStamp(runpath) and \
+                os.path.exists(os.path.join(outputpath, RUN_PLOTS_FOLDER, name, "ncs.png"))
+        except IOError:
+            unchanged = False
+
+        if unchanged:
+            summaries[i] = s
+        else:
+            todo.append(i)
+
+    lg.info(" * Found %d runs, %d to process." % (len(runpaths), len(todo)))
+
+    print("* Runs to process     : %d (%d unchanged)" % (len(todo), len(runpaths) - len(todo)))
+    print("*")
+
+    ## The path to the runs' plots.
+    rppath = os.path.join(outputpath, RUN_PLOTS_FOLDER)
+    #
+    if not os.path.isdir(rppath):
+        os.mkdir(rppath)
+
+    ## The tasks for the runs to process.
+    tasks = [(runnames[i], os.path.abspath(runpaths[i]), os.path.join(rppath, runnames[i]), args.min_expected, args.window, args.step) for i in todo]
+
+    pool = None
+    #
+    if args.jobs > 1:
+        pool = Pool(args.jobs, instrumentation.initWorker, (args.timings,))
+        #
+        results = pool.imap(runTask, tasks)
+    else:
+        results = (runTask(task) for task in tasks)
+
+    for i, (summary, timings) in zip(todo, results):
+
+        instrumentation.merge(timings)
+
+        summaries[i] = summary
+
+        if "error" in summary:
+            print("* Skipping '%s' (%s)" % (runpaths[i], summary["error"]))
+
+    if pool is not None:
+        pool.close(); pool.join()
+
+    # Write out the summary table - the JSON also records each run's
+    # stamp, so that the next batch only redoes the runs that change.
+    writeJson(summary_json_filename, \
+        {"version":RATE_SUMMARY_VERSION, "min_expected":args.min_expected, "window":args.window, "step":args.step, "runs":summaries})
+
+    with open(os.path.join(outputpath, RATE_SUMMARY_CSV), "wb") as cf:
+        writer = csv.writer(cf)
+        writer.writerow(RATE_SUMMARY_COLUMNS)
+        for s in summaries:
+            if "error" not in s:
+                writer.writerow([s[key] for key in RATE_SUMMARY_COLUMNS])
+
     ## The web page filename.
-    framepage_filename = os.path.join(fppath, "index.html")
+    indexpage_filename = os.path.join(outputpath, "index.html")
     #
-    # Write out the frame property index page.
-    with open(framepage_filename, "w") as framepage:
-        framepage.write(fp)
+    # Write out the batch index page.
+    with open(indexpage_filename, "w") as indexpage:
+        indexpage.write(makeIndexPage(summaries))
 
     # Now you can view the "index.html" files to see the results!
     print("*")
     print("* Plotting complete.")
-    print("* View your results by opening '%s' in a browser, e.g." % (framepage_filename))
-    print("* $ firefox %s &" % (framepage_filename))
+    print("* The rates are in '%s'." % (os.path.join(outputpath, RATE_SUMMARY_CSV)))
+    print("* View your results by opening '%s' in a browser, e.g." % (indexpage_filename))
+    print("* $ firefox %s &" % (indexpage_filename))
+
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=================================*")
+    print("* CERN@school - estimate the rate *")
+    print("*=================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",       help="Path to the input dataset (or, in batch mode, the processed runs - paths or glob patterns).", nargs="+")
+    parser.add_argument("outputPath",      help="The path for the output files.")
+    parser.add_argument("-b", "--batch",   help="Estimate the rates of a batch of processed runs.", action="store_true")
+    parser.add_argument("-l", "--list",    help="A file listing the processed runs (one per line) - implies --batch.")
+    parser.add_argument("-j", "--jobs",    help="The number of runs to process in parallel (batch mode).", type=int, default=1)
+    parser.add_argument("-m", "--min-expected", help="Merge the tail bins with fewer expected frames than this for the Chi^2 (batch mode).", type=float, default=0.0)
+    parser.add_argument("-w", "--window",  help="Also estimate the rate in time windows of this length [s].", type=float)
+    parser.add_argument("-s", "--step",    help="The time between the window starts [s] (the window length by default).", type=float)
+    parser.add_argument("-f", "--force",   help="Redo the runs that haven't changed since the last batch.", action="store_true")
+    parser.add_argument("-t", "--timings", help="Time the processing stages and write a summary to timings.json.", action="store_true")
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## Are we estimating the rates of a batch of runs?
+    batch = args.batch or args.list is not None or len(args.inputPath) > 1 or glob.has_magic(args.inputPath[0])
+
+    ## The path to the data file.
+    datapath = args.inputPath[0]
+    #
+    # Check if the input directory exists. If it doesn't, quit.
+    if not batch and not os.path.isdir(datapath):
+        raise IOError("* ERROR: '%s' input directory does not exist!" % (datapath))
+
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_estimate-rate.log', filemode='w', level=level)
+
+    # Record the timings, if requested.
+    instrumentation.setEnabled(args.timings)
+
+    ## The start of the processing (for the timings).
+    t0 = timeit.default_timer()
+
+    if batch:
+        estimateBatchRates(args)
+    else:
+        print("*")
+        print("* Input path          : '%s'" % (datapath))
+        print("* Output path         : '%s'" % (outputpath))
+        print("*")
+
+
+        # Set up the directories
+        #------------------------
+
+        # Create the subdirectories.
+
+        ## The path to the frame plots.
+        fppath = os.path.join(outputpath, "frameplots")
+        #
+        if os.path.isdir(fppath):
+            rmtree(fppath)
+            lg.info(" * Removing directory '%s'..." % (fppath))
+        os.mkdir(fppath)
+        lg.info(" * Creating directory '%s'..." % (fppath))
+        lg.info("")
+
+        # The frames
+        #------------
+
+        ## The number of clusters per frame.
+        ncs = getClustersPerFrame(datapath)
+        #
+        instrumentation.count("frames", len(ncs))
+
+        lg.info(" * Looping over the frames ")
+        lg.info(" *-------------------------")
+
+        # Loop over the frames.
+        for n_k in ncs:
+            lg.info(" *--> Found % 3d clusters." % (n_k))
+
+        ## The number of clusters plot.
+        nclplot = RateHistogram(100, "ncs", fppath, True)
+        ncl_Lambda, ncl_Lambda_err, ncl_chi2, ncl_n_free = nclplot.fill(ncs)
+
+        # Estimate the rate in time windows, if requested.
+        if args.window is not None:
+            writeWindowedRates(datapath, fppath, args.window, args.step)
+
+        ## The web page filename.
+        framepage_filename = os.path.join(fppath, "index.html")
+        #
+        # Write out the frame property index page.
+        with open(framepage_filename, "w") as framepage:
+            framepage.write(makeRatePage(datapath, len(ncs), ncl_Lambda, ncl_Lambda_err, ncl_chi2, ncl_n_free, args.window))
+
+        # Now you can view the "index.html" files to see the results!
+        print("*")
+        print("* Plotting complete.")
+        print("* View your results by opening '%s' in a browser, e.g." % (framepage_filename))
+        print("* $ firefox %s &" % (framepage_filename))
+
+    # Write out the timings, if recorded.
+    if args.timings:
+        instrumentation.writeSummary(os.path.join(outputpath, "timings.json"), timeit.default_timer() - t0)
@@ -15,11 +15,14 @@ import os, glob
 #...for parsing the arguments.
 import argparse
 
+#...for the timing.
+import timeit
+
 #...for the logging.
 import logging as lg
 
-#...for the binary stuff.
-import struct
+#...for the MATH.
+import numpy as np
 
 #...for file manipulation.
 from shutil import rmtree
@@ -30,9 +33,18 @@ import json
 #...for processing the datasets.
 from cernatschool.dataset import Dataset
 
+#...for caching the parsed frames.
+from cernatschool.framecache import FrameCache, getFrameCacheSize
+
 #...for making time.
 from timestuff.handlers import make_time_dir
 
+#...for writing the profile.
+from timestuff.profile import PROFILE_RECORD_V2, writeProfile, writeProfileV1
+
+#...for the timings.
+from cernatschool import instrumentation
+
 
 if __name__ == "__main__":
 
@@ -45,6 +57,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("inputPath",       help="Path to the input dataset.")
     parser.add_argument("outputPath",      help="The path for the output files.")
+    parser.add_argument("-z", "--zip",     help="Read the dataset from its ZIP archive (rather than RAW/ASCIIxyC).", action="store_true")
+    parser.add_argument("-c", "--cache",   help="The path to a frame cache folder (see cernatschool/framecache.py).", default=None)
+    parser.add_argument("-s", "--cache-size", help="The frame cache size limit [MB] (CERNATSCHOOL_FRAME_CACHE_SIZE, or no limit, by default).", type=float, default=None)
+    parser.add_argument("-f", "--format",  help="The profile format version (1: the 8-byte records only; 2: with a header, hour index and cluster counts).", type=int, choices=[1, 2], default=2)
+    parser.add_argument("-t", "--timings", help="Time the processing stages and write a summary to timings.json.", action="store_true")
     parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
     args = parser.parse_args()
 
@@ -74,6 +91,12 @@ if __name__ == "__main__":
     lg.basicConfig(filename=os.path.join(outputpath, \
         'log_get-pixel-rate-binary.log'), filemode='w', level=level)
 
+    # Record the timings, if requested.
+    instrumentation.setEnabled(args.timings)
+
+    ## The start of the processing (for the timings).
+    t0 = timeit.default_timer()
+
     lg.info(" *")
     lg.info(" * Input path          : '%s'" % (datapath))
     lg.info(" * Output path         : '%s'" % (outputpath))
@@ -81,9 +104,22 @@ if __name__ == "__main__":
 
     ## The path to the dataset.
     dataset_path = os.path.join(datapath, "RAW/ASCIIxyC")
+    #
+    # Use the dataset's ZIP archive instead, if requested.
+    if args.zip:
+        zip_paths = glob.glob(os.path.join(datapath, "ZIP", "*.zip"))
+        if len(zip_paths) != 1:
+            raise IOError("* ERROR: expected a single ZIP archive in '%s'!" % (os.path.join(datapath, "ZIP")))
+        dataset_path = zip_paths[0]
+
+    ## The frame cache (if any).
+    cache = None
+    #
+    if args.cache is not None:
+        cache = FrameCache(args.cache, getFrameCacheSize(args.cache_size))
 
     ## The dataset to process.
-    ds = Dataset(dataset_path)
+    ds = Dataset(dataset_path, cache)
 
     ## The path to the geographic information JSON file.
     geo_json_path = os.path.join(datapath, "geo.json")
@@ -117,53 +153,52 @@ if __name__ == "__main__":
 #                mask[int(x) + int(y)*256] = 1
 
     ## The frames from the dataset.
-    frames = ds.getFrames((lat, lon, alt))
     #
-    #frames = ds.getFrames((lat, lon, alt), pixelmask=mask)
+    # The frames are read one at a time. For the version 1 profile we
+    # only need the number of pixels in each frame so the clustering is
+    # skipped.
+    if args.format == 1:
+        frames = ds.iterFrames((lat, lon, alt), skipclustering=True)
+    else:
+        frames = ds.iterFrames((lat, lon, alt), klusterfinder="array")
+    #
+    #frames = ds.iterFrames((lat, lon, alt), pixelmask=mask, skipclustering=True)
 
-    lg.info(" * Found %d datafiles:" % (len(frames)))
+    lg.info(" * Found %d datafiles:" % (ds.getNumberOfDataFiles()))
 
     lg.info(" *---------------------------------------------------")
 
-    ## The chip ID.
-    chip_id = frames[0].getChipId()
+    ## The profile records, as a list of tuples (written in one go at the end).
+    records = []
 
-    # The start time of the first frame.
-    run_start_time_sec = frames[0].getStartTimeSec()
+    ## The Run ID.
+    run_id = None
 
-    # The end time of the last frame.
-    run_end_time_sec = frames[-1].getStartTimeSec()
-    #
-    run_end_time_sec += frames[-1].getAcqTime()
+    # Loop over the frames and collect the profile records.
+    for i, f in enumerate(frames):
 
-    ## The run length [s].
-    run_length_sec = run_end_time_sec - run_start_time_sec
+        # Use the first frame to name the binary file.
+        if run_id is None:
 
-    ## The Run ID.
-    run_id = "%s_%s" % (chip_id, make_time_dir(run_start_time_sec))
+            ## The chip ID.
+            chip_id = f.getChipId()
 
-    lg.info(" * Chip ID          :         '%s'." % (chip_id))
-    lg.info(" *")
-    lg.info(" * Start time (sec) : % 15d [s]." % (run_start_time_sec))
-    lg.info(" *    => '%s'" % (make_time_dir(run_start_time_sec)))
-    lg.info(" * End   time (sec) : % 15d [s]." % (run_end_time_sec))
-    lg.info(" *    => '%s'" % (make_time_dir(run_end_time_sec)))
-    lg.info(" * Run length (sec) : % 15d [s]." % (run_length_sec))
-    lg.info(" * Run length (min) : % 15.2f [min.]." % (float(run_length_sec)/60.0))
-    lg.info(" *")
-    lg.info(" * Run ID           : '%s'." % (run_id))
-    lg.info(" *")
+            # The start time of the first frame.
+            run_start_time_sec = f.getStartTimeSec()
 
-    ## The name of the dataset profile binary file.
-    output_file_name = os.path.join(outputpath, "%s.bin" % (run_id))
+            ## The Run ID.
+            run_id = "%s_%s" % (chip_id, make_time_dir(run_start_time_sec))
 
-    ## The binary file to write to.
-    bf = open(output_file_name, "wb")
+            lg.info(" * Chip ID          :         '%s'." % (chip_id))
+            lg.info(" *")
+            lg.info(" * Start time (sec) : % 15d [s]." % (run_start_time_sec))
+            lg.info(" *    => '%s'" % (make_time_dir(run_start_time_sec)))
+            lg.info(" *")
+            lg.info(" * Run ID           : '%s'." % (run_id))
+            lg.info(" *")
 
-    # Loop over the frames and write the binary file.
-    lg.info(" * Looping over the frames.")
-    lg.info(" *")
-    for i, f in enumerate(frames):
+            lg.info(" * Looping over the frames.")
+            lg.info(" *")
 
         ## The frame start time.
         sts = int(f.getStartTimeSec())
@@ -176,13 +211,40 @@ if __name__ == "__main__":
 
         lg.info(" * % 15d [s] | % 4d [s] | % 10d [pixels]" % (sts, acq_time, n_p))
 
-        # Write the frame information to the binary file.
-        bf.write(struct.pack('IhH', int(f.getStartTimeSec()), int(f.getAcqTime()), int(f.getRawNumberOfPixels())))
+        if args.format == 1:
+            records.append((sts, acq_time, n_p))
+        else:
+            records.append((f.getStartTime(), f.getAcqTime(), n_p, f.getNumberOfKlusters(), f.getNumberOfGammas()))
+
+        # The end time of the last frame.
+        run_end_time_sec = f.getStartTimeSec() + f.getAcqTime()
+
+    ds.close()
+
+    ## The name of the dataset profile binary file.
+    output_file_name = os.path.join(outputpath, "%s.bin" % (run_id))
+
+    # Write the binary file.
+    if args.format == 1:
+        writeProfileV1(output_file_name, records)
+    else:
+        writeProfile(output_file_name, np.array(records, dtype=PROFILE_RECORD_V2), chip_id, run_id)
 
-    # Close the binary file.
-    bf.close()
+    ## The run length [s].
+    run_length_sec = run_end_time_sec - run_start_time_sec
+
+    lg.info(" *")
+    lg.info(" * End   time (sec) : % 15d [s]." % (run_end_time_sec))
+    lg.info(" *    => '%s'" % (make_time_dir(run_end_time_sec)))
+    lg.info(" * Run length (sec) : % 15d [s]." % (run_length_sec))
+    lg.info(" * Run length (min) : % 15.2f [min.]." % (float(run_length_sec)/60.0))
+    lg.info(" *")
 
     print("* Conversion complete.")
     print("* A binary file of start time, acquisition time and the")
     print("* number of hit pixels can be found in:")
     print("* '%s'" % (output_file_name))
+
+    # Write out the timings, if recorded.
+    if args.timings:
+        instrumentation.writeSummary(os.path.join(outputpath, "timings.json"), timeit.default_timer() - t0)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Plot the kluster properties
+
+ See the README.md file for more information.
+
+"""
+
+#...for the operating system tools.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for file manipulation.
+from shutil import rmtree
+
+#...for the kluster properties.
+from cernatschool.klusterdb import KlusterDatabase
+
+#...for the histogram axis labels.
+from cernatschool.datavals import *
+
+#...for the histograms.
+from plotting.histograms import Hist, Hist2D
+
+## The kluster property histograms (name, column, number of bins (-1 for integer bins), x axis label).
+KLUSTER_HISTOGRAMS = [
+    ("size",        "size",          -1, KLUSTER_SIZE_HEADER),
+    ("totalcounts", "totalcounts",  100, KLUSTER_TOTAL_COUNTS_HEADER),
+    ("radius_uw",   "radius_uw",     50, KLUSTER_RADIUS_UW_HEADER),
+    ("density_uw",  "density_uw",    50, KLUSTER_DENSITY_UW_HEADER),
+    ("linearity",   "lin_linearity", 50, KLUSTER_LINEARITY_HEADER)
+    ]
+
+## The kluster property vs. property histograms (name, x column, x bins, x label, y column, y bins, y label).
+KLUSTER_HISTOGRAMS_2D = [
+    ("size_vs_totalcounts", "size", 50, KLUSTER_SIZE_HEADER, "totalcounts", 50, KLUSTER_TOTAL_COUNTS_HEADER),
+    ("radius_vs_density", "radius_uw", 50, KLUSTER_RADIUS_UW_HEADER, "density_uw", 50, KLUSTER_DENSITY_UW_HEADER)
+    ]
+
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*===========================================*")
+    print("* CERN@school - plot the kluster properties *")
+    print("*===========================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",       help="Path to the process-frames.py output (with klusters.db).")
+    parser.add_argument("outputPath",      help="The path for the output files.")
+    parser.add_argument("-e", "--no-edge", help="Leave out the klusters on the edge of the frame.", action="store_true")
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data file.
+    datapath = args.inputPath
+
+    ## The kluster properties database filename.
+    kdb_filename = os.path.join(datapath, "klusters.db")
+    #
+    # Check if it exists. If it doesn't, quit.
+    if not os.path.exists(kdb_filename):
+        raise IOError("* ERROR: '%s' does not exist - run process-frames.py with --klusters!" % (kdb_filename))
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=os.path.join(outputpath, 'log_plot-klusters.log'), filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("*")
+
+    ## The path to the kluster plots.
+    kppath = os.path.join(outputpath, "klusterplots")
+    #
+    if os.path.isdir(kppath):
+        rmtree(kppath)
+        lg.info(" * Removing directory '%s'..." % (kppath))
+    os.mkdir(kppath)
+    lg.info(" * Creating directory '%s'..." % (kppath))
+    lg.info("")
+
+    ## The kluster selection.
+    where = None
+    #
+    if args.no_edge:
+        where = "isedgekluster = 0"
+
+    ## The names of the columns needed.
+    names = sorted(set([h[1] for h in KLUSTER_HISTOGRAMS] + [h[1] for h in KLUSTER_HISTOGRAMS_2D] + [h[4] for h in KLUSTER_HISTOGRAMS_2D]))
+
+    ## The kluster properties {name:column} - read straight from the database.
+    cols = KlusterDatabase(kdb_filename).getColumns(names, where)
+
+    ## The number of klusters.
+    n_klusters = len(cols["size"])
+
+    lg.info(" * Found %d klusters in '%s'." % (n_klusters, kdb_filename))
+
+    if n_klusters == 0:
+        raise IOError("* ERROR: no klusters found in '%s'!" % (kdb_filename))
+
+    # Make the histograms.
+    for i, (name, col, nbins, xlabel) in enumerate(KLUSTER_HISTOGRAMS):
+        Hist(name, 200 + i, cols[col], nbins, xlabel, "Number of clusters", kppath)
+
+    for i, (name, x_col, x_nbins, x_label, y_col, y_nbins, y_label) in enumerate(KLUSTER_HISTOGRAMS_2D):
+        Hist2D(300 + i, name, cols[x_col], x_label, x_nbins, cols[y_col], y_label, y_nbins, kppath)
+
+    # Make the plot display page.
+    kp = ""
+    kp += "<!DOCTYPE html>\n"
+    kp += "<html>\n"
+    kp += "  <head>\n"
+    kp += "    <link rel=\"stylesheet\" type=\"text/css\" "
+    kp += "href=\"assets/css/style.css\">\n"
+    kp += "  </head>\n"
+    kp += "  <body>\n"
+    kp += "    <h1>Cluster Sorting: Cluster Properties</h1>\n"
+    kp += "    <h2>Dataset summary</h2>\n"
+    kp += "    <p>\n"
+    kp += "      <ul>\n"
+    kp += "        <li>Dataset path = '%s'</li>\n" % (datapath)
+    kp += "        <li>Number of clusters = %d%s</li>\n" % (n_klusters, " (not on the frame edge)" if args.no_edge else "")
+    kp += "      </ul>\n"
+    kp += "    </p>\n"
+    kp += "    <h2>Cluster properties</h2>\n"
+    kp += "    <table>\n"
+    #
+    for name in [h[0] for h in KLUSTER_HISTOGRAMS + KLUSTER_HISTOGRAMS_2D]:
+        kp += "      <tr><td><img src=\"%s.png\" /></td></tr>\n" % (name)
+    #
+    kp += "    </table>\n"
+    kp += "  </body>\n"
+    kp += "</html>"
+
+    ## The web page filename.
+    klusterpage_filename = os.path.join(kppath, "index.html")
+    #
+    # Write out the kluster property index page.
+    with open(klusterpage_filename, "w") as klusterpage:
+        klusterpage.write(kp)
+
+    # Now you can view the "index.html" files to see the results!
+    print("*")
+    print("* Plotting complete.")
+    print("* View your results by opening '%s' in a browser, e.g." % (klusterpage_filename))
+    print("* $ firefox %s &" % (klusterpage_filename))
@@ -11,12 +11,6 @@ import logging as lg
 #...for even more MATH.
 import numpy as np
 
-#...for the factorial function.
-from scipy.misc import factorial
-
-#...for the least squares fitting.
-from scipy import optimize
-
 # Import the plotting libraries.
 import pylab as plt
 
@@ -33,6 +27,12 @@ from matplotlib import rc
 #...for the chi^2 method.
 from plotting.stats import chi2
 
+#...for the rate estimate and the Poisson distribution.
+from cernatschool.rates import estimateRate, getRateHistogram, poissonPmf
+
+#...for the timings.
+from cernatschool.instrumentation import timed
+
 class RateHistogram():
 
     def __init__(self, num, name, outputpath, dbg=False):
@@ -70,6 +70,7 @@ class RateHistogram():
         lg.info(" * Initialising a rate histogram '%s' (%d)" % (self.__name, self.__num))
         lg.info(" *")
 
+    @timed("rate_fit")
     def fill(self, cpf):
         """
         Fill the histogram using a list of numbers and compare
@@ -90,11 +91,8 @@ class RateHistogram():
         ## The total number of clusters.
         self.__n_k = sum(self.__cpf)
 
-        ## The estimated overall rate.
-        self.__Lambda_est = float(self.__n_k) / float(self.__n_f)
-
-        ## The standard error on the estimated overall rate.
-        self.__Lambda_est_err = np.sqrt(float(self.__n_k)) / float(self.__n_f)
+        # The maximum likelihood estimate of the overall rate and its standard error.
+        self.__Lambda_est, self.__Lambda_est_err = estimateRate(self.__cpf)
 
         lg.info(" * Number of frames supplied    (N)   = %d" % (self.__n_f))
         lg.info(" * The total number of clusters (M)   = %d" % (self.__n_k))
@@ -105,23 +103,16 @@ class RateHistogram():
         # Work out the bin details.
         self.max_x = max(self.__cpf)
 
-        # Round this up to the nearest 10.
-        self.max_x_r = np.floor(float(self.max_x)/10.) * 10. + 10.
-
-        # Create the bin edges array for the data:
-        # * Bin width one, rounded-up max x value.
-        self.bins = np.arange(0, self.max_x_r + self.bin_w, self.bin_w)
-
-        # Plot the histogram.
-
         ## A list of the histogram bin contents (n).
         self.__n = None
 
         ## A list of the histogram bins.
         self.__bins = None
 
-        #self.n, self.bins, self.patches = plt.hist(self.cpf, bins=self.bins, histtype='stepfilled')
-        self.__n, self.__bins = np.histogram(self.__cpf, bins=self.bins)
+        # Bin width one, with the max x value rounded up to the nearest 10.
+        self.__n, self.__bins = getRateHistogram(self.__cpf, self.bin_w)
+
+        self.bins = self.__bins
 
         lg.info(" * The histogram bin contents:")
         lg.info(self.__n)
@@ -132,69 +123,13 @@ class RateHistogram():
         lg.info(self.__bins)
         lg.info(" *")
 
-        # Set the colour of the histogram patches (make configurable?).
-        #plt.setp(self.patches, 'facecolor', '#44BB11', 'alpha', 0.75, 'linewidth', 0.0)
-
-        #print("* DEBUG: Number of hit pixels in each frame:", self.__cpf)
-        #print("* DEBUG: Max number of clusters per frame  : %6d" % (self.max_x))
-        #print("* DEBUG: x max                             : %6d" % (self.max_x_r))
-        #print("* DEBUG: x bin width                       : %6d" % (self.bin_w))
-        #print("* DEBUG: bins:", self.bins)
-        #print("* DEBUG:")
-
-        # Fit to Poisson?
-        if self.__n[0] != self.__n_f: # If not completely empty...
-
-            ## The Poisson function to fit to!
-            fitfunc = lambda p, x: p[0]*pow(p[1],x)*pow(np.e,-p[1])/factorial(x)
-
-            ## A list of the initial guess for the parameters.
-            p0 = [float(self.__n_f), float(self.__Lambda_est)]
-
-            ## The error function to perform the fitting.
-            errfunc = lambda p, x, y: fitfunc(p, x) - y # Distance to the target function
-
-            ## The fitted parameters.
-            p1 = None
-
-            ## Did the fit succeed?
-            success = None
-
-            # Use the least square method from optimize to perform a check.
-            # We won't actually use this...
-            p1, success = optimize.leastsq(errfunc, p0[:], args=(self.__bins[:-1], self.__n))
+        # The expected y values from the estimated rate - the Poisson
+        # is calculated in log space, so it won't overflow for large
+        # numbers of clusters.
+        y_est = self.__n_f * poissonPmf(self.__bins, self.__Lambda_est)
 
-            if success == 1:
-                lg.info(" * FIT SUCCEEDED!")
-
-            lg.info(" * Fitted values [Scale, \\lambda]:")
-            lg.info(p1)
-            lg.info(" *")
-
-            # Use the estimated parameters from the Bayesian method.
-            p_est = [float(self.__n_f), float(self.__Lambda_est)]
-
-            # Plot the Poisson distribution from the estimated values.
-            plt.bar(self.__bins, fitfunc(p_est, self.__bins), color='#CCCCCC')
-
-            # Plot the Poisson distribution with the fitted values.
-            #plt.bar(self.__bins, fitfunc(p1, self.__bins), color='#CCCCCC')
-
-            # The expected y values from the estimated parameters.
-            y_est = fitfunc(p_est, self.__bins)
-
-            # The expected y values from the fitted parameters.
-            y_fit = fitfunc(p1, self.__bins)
-
-            # The distances from the predicted values - Bayesian estimates.
-            ds_est = errfunc(p_est, self.__bins[:-1], self.__n)
-
-            # The distances from the predicted values - fitted estimates.
-            ds_fit = errfunc(p1, self.__bins[:-1], self.__n)
-
-            for i, binval in enumerate(self.__bins[:-1]):
-                lg.info(" * | % 3d | % 3d | % 3d | % 6.3f | % 10.8f | % 6.3f | % 10.8f |" %
-                    (i, binval, self.__n[i], y_est[i], ds_est[i], y_fit[i], ds_fit[i]))
+        # Plot the Poisson distribution from the estimated values.
+        plt.bar(self.__bins, y_est, color='#CCCCCC')
 
         # Firstly, we'll need an array of the bin centres to put the points
         # at (rather than the bin edges). Note the slicing of the bin edges
@@ -222,13 +157,6 @@ class RateHistogram():
         lg.info(" *--> N_freedom   = % d" % (n_deg_est))
         lg.info(" *")
 
-        # Calculate the Chi^2 values for the fitted distribution.
-        chi2_fit, n_deg_fit, chi2_div_fit = chi2(self.__n, y_fit, 1)
-        lg.info(" * Fitted distribution:")
-        lg.info(" *--> \Chi^2      = % 7.5f" % (chi2_fit))
-        lg.info(" *--> N_freedom   = % d" % (n_deg_fit))
-        lg.info(" *")
-
         # Plot the real data points as an "errorbar" plot
         plt.errorbar(self.bins_centres, \
                      self.__n, \
@@ -250,3 +178,65 @@ class RateHistogram():
         self.plot.savefig(self.__output_path + "/%s.ps" % (self.__name))
 
         return self.__Lambda_est, self.__Lambda_est_err, chi2_est, n_deg_est
+
+    def close(self):
+        """ Close the histogram's figure (e.g. before making another with the same number). """
+        plt.close(self.plot)
+
+class RateTimePlot():
+
+    def __init__(self, num, name, outputpath):
+        """
+        Plot the rate estimated in time windows over a run.
+        """
+        ## The number of the plot (for book-keeping purposes).
+        self.__num = num
+
+        ## The name of the plot.
+        self.__name = name
+
+        ## The output path for the plot.
+        self.__output_path = outputpath
+
+        self.plot = plt.figure(self.__num, figsize=(5.0, 3.0), dpi=150, facecolor='w', edgecolor='w')
+
+        self.plot.subplots_adjust(bottom=0.17, left=0.15)
+
+        self.ax = self.plot.add_subplot(111)
+
+        self.ax.set_xlabel("Time since the start of the run [min]")
+
+        self.ax.set_ylabel("Clusters per second")
+
+        self.ax.grid(1)
+
+    def fill(self, windows, rate=None):
+        """
+        Plot the rate in each window (see cernatschool.rates.getWindowedRates).
+        @param [in] windows The windowed rates.
+        @param [in] rate The overall rate to compare with [clusters per second].
+        """
+
+        ## The window centres [min], relative to the start of the first window.
+        ts = (0.5 * (windows["start"] + windows["end"]) - windows["start"][0]) / 60.0
+
+        ## The windows with frames in them.
+        sel = windows["n_frames"] > 0
+
+        plt.errorbar(ts[sel], windows["rate"][sel], \
+                     fmt='d', \
+                     color='black', \
+                     yerr=windows["rate_err"][sel], \
+                     ecolor='black', \
+                     elinewidth=1)
+
+        if rate is not None:
+            plt.axhline(rate, color='#CCCCCC')
+
+        self.plot.savefig(self.__output_path + "/%s.png" % (self.__name))
+
+        self.plot.savefig(self.__output_path + "/%s.ps" % (self.__name))
+
+    def close(self):
+        """ Close the plot's figure. """
+        plt.close(self.plot)
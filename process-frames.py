@@ -24,18 +24,201 @@ import logging as lg
 #...for file manipulation.
 from shutil import rmtree
 
+#...for processing the frames in parallel.
+from multiprocessing import Pool
+
+#...for iterating over the processed frames.
+from itertools import izip
+
+#...for the timing.
+import timeit
+
 # Import the JSON library.
 import json
 
 #...for processing the datasets.
-from cernatschool.dataset import Dataset
+from cernatschool.dataset import Dataset, makeFrame
+
+#...for caching the parsed frames.
+from cernatschool.framecache import FrameCache, getFrameCacheSize
 
 #...for making time.
 from cernatschool.handlers import make_time_dir
 
+#...for the incremental runs.
+from cernatschool.runstate import RunState
+
+#...for storing the frame properties.
+from cernatschool.framestore import FrameStore, FRAME_STORE_FOLDER, FRAME_PROPERTIES_JSON
+
+#...for storing the kluster properties.
+from cernatschool.klusterdb import KlusterDatabase, getKlusterRows
+
+#...for the pixel masks and the hot pixel detection.
+from cernatschool.hitmap import HitMapAccumulator, readMask, saveHitMap, loadHitMap
+
 #...for making the frame and clusters images.
 from visualisation.visualisation import makeFrameImage
 
+#...for the timings.
+from cernatschool import instrumentation
+from cernatschool.instrumentation import timed
+
+## The name of the run state file (in the output folder).
+RUN_STATE_FILENAME = "process-frames-state.json"
+
+## The name of the kluster properties database (in the output folder).
+KLUSTER_DB_FILENAME = "klusters.db"
+
+## The name of the hot pixel mask file (in the output folder).
+HOT_PIXELS_FILENAME = "hot_pixels.txt"
+
+## The name of the hit map file (in the output folder).
+HIT_MAP_FILENAME = "hit_map.npz"
+
+
+@timed("frame")
+def processFrame(task):
+    """
+    Process a single frame: read the data, find the clusters, make the
+    frame image and return the frame's properties (and its klusters'
+    and hit pixels).
+
+    @param [in] task A (DscFile, data format, geo tuple, pixel mask, image path, raster images?, klusters?, hit pixels?) tuple.
+    @returns props The frame's properties.
+    @returns rows The Klusters table rows of the frame's klusters (None if not requested).
+    @returns hits The X values of the frame's hit pixels, masked or not (None if not requested).
+    """
+
+    df, dataformat, geo, pixel_mask, frame_output_path, raster, klusters, hitpixels = task
+
+    ## The frame.
+    f = makeFrame(df, geo, dataformat, pixelmask = pixel_mask, klusterfinder = "array")
+
+    ## The hit pixels, for the hit map (if requested) - taken before
+    ## the masked pixels are removed from the map for the frame image.
+    hits = None
+    #
+    if hitpixels:
+        hits = f.getPixelMap().keys()
+
+    ## The basename for the data frame, based on frame information.
+    bn = "%s_%s" % (f.getChipId(), make_time_dir(f.getStartTimeSec()))
+
+    #bn = "%s_%d-%06d" % (f.getChipId(), f.getStartTimeSec(), f.getStartTimeSubSec())
+
+    # Create the frame image.
+    makeFrameImage(bn, f.getPixelMap(), frame_output_path, f.getPixelMask(), raster)
+
+    ## The kluster properties (if requested).
+    rows = None
+    #
+    if klusters:
+        rows = getKlusterRows(f.getKlusterFinder().getKlusterTable(), bn, f.isMC())
+
+    # Return the frame's properties. The metadata dictionary itself is
+    # made in the main process (see makeMetadata) so that the JSON is
+    # written in the same way however the frames were processed.
+    return (bn, \
+        f.getChipId(), f.getBiasVoltage(), f.getIKrum(), \
+        f.getLatitude(), f.getLongitude(), f.getAltitude(), \
+        f.getStartTimeSec(), f.getEndTimeSec(), f.getAcqTime(), \
+        f.getNumberOfUnmaskedPixels(), f.getOccupancy(), f.getOccupancyPc(), \
+        f.getNumberOfKlusters(), f.getNumberOfGammas(), f.getNumberOfNonGammas(), \
+        int(f.isMC())), rows, hits
+
+def runTask(task):
+    """
+    Process a frame (see processFrame), returning the frame's properties,
+    its klusters and hit pixels and the timings recorded while processing
+    it (None if they aren't being recorded) - so that timings from worker
+    processes can be added to those of the main process.
+    """
+
+    props, rows, hits = processFrame(task)
+
+    return props, rows, hits, instrumentation.drain()
+
+def removeFrameImage(frame_output_path, frameid):
+    """ Remove a frame's image (if it exists). """
+
+    ## The path of the frame image.
+    image_path = os.path.join(frame_output_path, "%s.png" % (frameid))
+
+    if os.path.exists(image_path):
+        os.remove(image_path)
+
+def writeFrames(store, mds, state, kdb=None):
+    """
+    Write the metadata of the frames processed so far to the frame
+    properties store (and commit the klusters), then save the run state.
+
+    The new frames are appended to the store if the frames already in
+    it are still the first of those processed - otherwise (e.g. if a
+    frame in the middle of the run has changed) the store is rewritten.
+
+    @param [in] store The FrameStore.
+    @param [in] mds The metadata of each frame (None if not processed yet).
+    @param [in] state The RunState.
+    @param [in] kdb The KlusterDatabase (None if the klusters aren't being written).
+    """
+
+    ## The metadata of the frames processed so far, in start time order.
+    frames = [md for md in mds if md is not None]
+
+    ## The number of frames already in the store.
+    n = store.getNumberOfFrames()
+
+    if n > len(frames) or store.getColumn("id").tolist() != [md["id"] for md in frames[:n]]:
+        store.clear()
+        n = 0
+
+    store.append(frames[n:])
+
+    if kdb is not None:
+        kdb.commit()
+
+    state.save()
+
+def makeMetadata(props):
+    """
+    Make the metadata dictionary for a frame.
+
+    @param [in] props The frame properties returned by processFrame.
+    """
+
+    bn, chipid, hv, ikrum, lat, lon, alt, st, et, acqtime, \
+        n_pixel, occ, occ_pc, n_kluster, n_gamma, n_non_gamma, ismc = props
+
+    # Create the metadata dictionary for the frame.
+    metadata = {
+        "id"          : bn,
+        #
+        "chipid"      : chipid,
+        "hv"          : hv,
+        "ikrum"       : ikrum,
+        #
+        "lat"         : lat,
+        "lon"         : lon,
+        "alt"         : alt,
+        #
+        "start_time"  : st,
+        "end_time"    : et,
+        "acqtime"     : acqtime,
+        #
+        "n_pixel"     : n_pixel,
+        "occ"         : occ,
+        "occ_pc"      : occ_pc,
+        #
+        "n_kluster"   : n_kluster,
+        "n_gamma"     : n_gamma,
+        "n_non_gamma" : n_non_gamma,
+        #
+        "ismc"        : ismc
+        }
+
+    return metadata
+
 
 if __name__ == "__main__":
 
@@ -48,6 +231,18 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("inputPath",       help="Path to the input dataset.")
     parser.add_argument("outputPath",      help="The path for the output files.")
+    parser.add_argument("-j", "--jobs",    help="The number of frame processing jobs to run in parallel.", type=int, default=1)
+    parser.add_argument("-z", "--zip",     help="Read the dataset from its ZIP archive (rather than RAW/ASCIIxyC).", action="store_true")
+    parser.add_argument("-c", "--cache",   help="The path to a frame cache folder (see cernatschool/framecache.py).", default=None)
+    parser.add_argument("-s", "--cache-size", help="The frame cache size limit [MB] (CERNATSCHOOL_FRAME_CACHE_SIZE, or no limit, by default).", type=float, default=None)
+    parser.add_argument("-r", "--raster",  help="Write the frame images as plain 256x256 pixel PNGs (no axes or colour bar).", action="store_true")
+    parser.add_argument("-t", "--timings", help="Time the processing stages and write a summary to timings.json.", action="store_true")
+    parser.add_argument("-i", "--incremental", help="Only process the frames that are new or have changed since the last run.", action="store_true")
+    parser.add_argument("-k", "--checkpoint",  help="The number of frames to process between checkpoints.", type=int, default=100)
+    parser.add_argument("-n", "--no-json",     help="Only write the frame properties store (not frames.json).", action="store_true")
+    parser.add_argument("-K", "--klusters",    help="Write the properties of each kluster to an SQLite database (klusters.db).", action="store_true")
+    parser.add_argument("-m", "--mask",        help="The pixel mask file to use (the dataset's masked_pixels.txt by default).", default=None)
+    parser.add_argument("-H", "--hot-pixels",  help="Find the hot pixels from the frames' hit map and write them to a mask file (hot_pixels.txt).", action="store_true")
     parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
     args = parser.parse_args()
 
@@ -74,31 +269,36 @@ if __name__ == "__main__":
     # Configure the logging.
     lg.basicConfig(filename = outputpath + '/log_process-frames.log', filemode='w', level=level)
 
+    # Record the timings, if requested.
+    instrumentation.setEnabled(args.timings)
+
+    ## The start of the processing (for the timings).
+    t0 = timeit.default_timer()
+
     print("*")
     print("* Input path          : '%s'" % (datapath))
     print("* Output path         : '%s'" % (outputpath))
+    print("* Number of jobs      : %d" % (args.jobs))
     print("*")
 
-    # Set up the directories
-    #------------------------
-
-    # Create the subdirectories.
-
-    ## The path to the frame images.
-    frame_output_path = os.path.join(outputpath, "PNG")
-    #
-    if os.path.isdir(frame_output_path):
-        rmtree(frame_output_path)
-        lg.info(" * Removing directory '%s'..." % (frame_output_path))
-    os.mkdir(frame_output_path)
-    lg.info(" * Creating directory '%s'..." % (frame_output_path))
-    lg.info("")
-
     ## The path to the dataset.
     dataset_path = os.path.join(datapath, "RAW/ASCIIxyC")
+    #
+    # Use the dataset's ZIP archive instead, if requested.
+    if args.zip:
+        zip_paths = glob.glob(os.path.join(datapath, "ZIP", "*.zip"))
+        if len(zip_paths) != 1:
+            raise IOError("* ERROR: expected a single ZIP archive in '%s'!" % (os.path.join(datapath, "ZIP")))
+        dataset_path = zip_paths[0]
+
+    ## The frame cache (if any).
+    cache = None
+    #
+    if args.cache is not None:
+        cache = FrameCache(args.cache, getFrameCacheSize(args.cache_size))
 
     ## The dataset to process.
-    ds = Dataset(dataset_path)
+    ds = Dataset(dataset_path, cache)
 
     # Get the metadata from the JSON.
 
@@ -117,68 +317,193 @@ if __name__ == "__main__":
     ## Altitude of the dataset [m].
     alt = fmd['alt'] # [m]
 
+    ## The pixel mask file.
+    mask_filename = os.path.join(datapath, "masked_pixels.txt")
+    #
+    if args.mask is not None:
+        mask_filename = args.mask
+
     ## The pixel mask.
-    pixel_mask = {}
-
-    with open(os.path.join(datapath, "masked_pixels.txt"), "r") as mpf:
-        rows = mpf.readlines()
-        for row in rows:
-            vals = [int(val) for val in row.strip().split("\t")]
-            x = vals[0]; y = vals[1]; X = (256*y) + x; C = 1
-            pixel_mask[X] = C
-
-    ## The frames from the dataset.
-    frames = ds.getFrames((lat, lon, alt), pixelmask = pixel_mask)
-
-    lg.info("* Found %d datafiles." % (len(frames)))
-
-    ## A list of frames.
-    mds = []
-
-    # Loop over the frames and upload them to the DFC.
-    for f in frames:
-
-        ## The basename for the data frame, based on frame information.
-        bn = "%s_%s" % (f.getChipId(), make_time_dir(f.getStartTimeSec()))
-
-        #bn = "%s_%d-%06d" % (f.getChipId(), f.getStartTimeSec(), f.getStartTimeSubSec())
-
-        # Create the frame image.
-        makeFrameImage(bn, f.getPixelMap(), frame_output_path, f.getPixelMask())
-
-        # Create the metadata dictionary for the frame.
-        metadata = {
-            "id"          : bn,
-            #
-            "chipid"      : f.getChipId(),
-            "hv"          : f.getBiasVoltage(),
-            "ikrum"       : f.getIKrum(),
-            #
-            "lat"         : f.getLatitude(),
-            "lon"         : f.getLongitude(),
-            "alt"         : f.getAltitude(),
-            #
-            "start_time"  : f.getStartTimeSec(),
-            "end_time"    : f.getEndTimeSec(),
-            "acqtime"     : f.getAcqTime(),
-            #
-            "n_pixel"     : f.getNumberOfUnmaskedPixels(),
-            "occ"         : f.getOccupancy(),
-            "occ_pc"      : f.getOccupancyPc(),
-            #
-            "n_kluster"   : f.getNumberOfKlusters(),
-            "n_gamma"     : f.getNumberOfGammas(),
-            "n_non_gamma" : f.getNumberOfNonGammas(),
-            #
-            "ismc"        : int(f.isMC())
-            }
-
-        # Add the frame metadata to the list of frames.
-        mds.append(metadata)
-
-    # Write out the frame information to a JSON file.
+    pixel_mask = readMask(mask_filename)
+
+    lg.info("* Found %d datafiles." % (ds.getNumberOfDataFiles()))
+
+    ## The frame properties JSON filename.
+    frames_json_filename = os.path.join(outputpath, FRAME_PROPERTIES_JSON)
+
+    ## The frame properties store.
+    store = FrameStore(os.path.join(outputpath, FRAME_STORE_FOLDER))
+
+    ## The hit map filename.
+    hit_map_filename = os.path.join(outputpath, HIT_MAP_FILENAME)
+
+    ## The run state - the frames that have already been processed.
+    state = RunState(os.path.join(outputpath, RUN_STATE_FILENAME), \
+        {"dataset":os.path.abspath(dataset_path), "geo":fmd, "mask":sorted(pixel_mask.keys()), "raster":args.raster, \
+         "klusters":args.klusters})
+
+    ## The kluster properties database (if requested).
+    kdb = None
+    #
+    if args.klusters:
+        kdb = KlusterDatabase(os.path.join(outputpath, KLUSTER_DB_FILENAME))
+
+    ## The metadata of the frames already processed {frame ID:metadata}.
+    done = {}
+    #
+    # Only carry on from the last run if it was for the same settings.
+    if args.incremental and state.isResumed():
+        done = dict((md["id"], md) for md in store.getFrames())
+    else:
+        state.clear()
+        store.clear()
+        if kdb is not None:
+            kdb.clear()
+        if os.path.exists(hit_map_filename):
+            os.remove(hit_map_filename)
+
+    # Set up the directories
+    #------------------------
+
+    # Create the subdirectories.
+
+    ## The path to the frame images.
+    frame_output_path = os.path.join(outputpath, "PNG")
+    #
+    if os.path.isdir(frame_output_path) and not state.isResumed():
+        rmtree(frame_output_path)
+        lg.info(" * Removing directory '%s'..." % (frame_output_path))
+    if not os.path.isdir(frame_output_path):
+        os.mkdir(frame_output_path)
+        lg.info(" * Creating directory '%s'..." % (frame_output_path))
+    lg.info("")
+
+    ## The DSC file wrappers of the frames, in start time order.
+    dfs = ds.getDscFiles()
+
+    ## The data file names of the frames.
+    names = [os.path.basename(df.getDataFilename()) for df in dfs]
+
+    ## The sizes and modification times of the frames' files.
+    stats = [ds.getFileStat(df) for df in dfs]
+
+    ## The metadata of each frame (None until the frame has been processed).
+    mds = [None] * len(dfs)
+    #
+    for i, (name, stat) in enumerate(zip(names, stats)):
+        if state.isDone(name, stat) and state.getId(name) in done:
+            mds[i] = done[state.getId(name)]
+
+    # Forget the frames that have changed or gone since the last run.
+    unchanged = set(name for name, md in zip(names, mds) if md is not None)
+    #
+    for name in state.getNames():
+        if name not in unchanged:
+            removeFrameImage(frame_output_path, state.getId(name))
+            if kdb is not None:
+                kdb.removeFrame(state.getId(name))
+            state.remove(name)
+
+    ## The indices of the frames to process.
+    todo = [i for i, md in enumerate(mds) if md is None]
+
+    lg.info("* Processing %d of the %d frames." % (len(todo), len(dfs)))
+
+    print("* Frames to process   : %d (of %d)" % (len(todo), len(dfs)))
+    print("*")
+
+    ## The frame processing tasks - one per frame, in start time order.
+    tasks = ((dfs[i], ds.getDataFormat(), (lat, lon, alt), pixel_mask, frame_output_path, args.raster, args.klusters, args.hot_pixels) for i in todo)
+
+    ## The hit map of the frames (for finding the hot pixels, if requested).
+    hitmap = None
+    #
+    ## The names of the frames counted in the hit map.
+    counted = set()
+    #
+    if args.hot_pixels:
+        hitmap = HitMapAccumulator()
+        #
+        # Carry on from the last run's hit map, if none of its frames have changed since.
+        if state.isResumed() and os.path.exists(hit_map_filename):
+            saved, saved_names = loadHitMap(hit_map_filename)
+            if set(saved_names).issubset(unchanged):
+                hitmap.merge(saved)
+                counted.update(saved_names)
+            else:
+                lg.info(" * Frames in the hit map '%s' have changed - starting it again." % (hit_map_filename))
+
+    # Process the frames.
+    #
+    # The frames are read from the dataset one at a time, either here or
+    # by a pool of worker processes. Either way the metadata is returned
+    # in start time order.
+    pool = None
+    #
+    if args.jobs > 1:
+        pool = Pool(args.jobs, instrumentation.initWorker, (args.timings,))
+        #
+        results = pool.imap(runTask, tasks, chunksize=8)
+    else:
+        results = (runTask(task) for task in tasks)
+
+    for n, (i, (props, rows, hits, timings)) in enumerate(izip(todo, results)):
+
+        instrumentation.merge(timings)
+
+        if hitmap is not None:
+            hitmap.add(hits)
+            counted.add(names[i])
+
+        mds[i] = makeMetadata(props)
+
+        # (Any klusters left from an interrupted run are replaced.)
+        if kdb is not None:
+            kdb.removeFrame(mds[i]["id"])
+            kdb.addKlusters(rows)
+
+        state.add(names[i], stats[i], mds[i]["id"])
+
+        # Checkpoint the run, so that it can be resumed if interrupted.
+        if (n + 1) % args.checkpoint == 0:
+            writeFrames(store, mds, state, kdb)
+            if hitmap is not None:
+                saveHitMap(hit_map_filename, hitmap, counted)
+
+    if pool is not None:
+        pool.close(); pool.join()
+
+    ds.close()
+
+    # Write out the frame information to the frame store (and a JSON file).
     # We will use this later to make the frame plots,
     # rather than processing the whole frame set again.
     #
-    with open(os.path.join(outputpath, "frames.json"), "w") as jf:
-        json.dump(mds, jf)
+    writeFrames(store, mds, state, kdb)
+    #
+    if not args.no_json:
+        store.exportJson(frames_json_filename)
+
+    # Write out the hot pixels found, as a mask file that can be used
+    # for the next run (see --mask).
+    if hitmap is not None:
+        #
+        saveHitMap(hit_map_filename, hitmap, counted)
+        #
+        ## The hot pixel mask filename.
+        hot_pixels_filename = os.path.join(outputpath, HOT_PIXELS_FILENAME)
+        #
+        print("*")
+        #
+        # Only write the mask if the hit map covers all of the frames.
+        if counted == set(names):
+            hot = hitmap.writeMask(hot_pixels_filename)
+            print("* Found %d hot pixels in %d frames - written to '%s'." % (len(hot), hitmap.n_frames, hot_pixels_filename))
+        else:
+            lg.info(" * The hit map only covers %d of the %d frames - not writing the hot pixels." % (len(counted), len(names)))
+            print("* The hit map only covers %d of the %d frames, so '%s' has not been written." % (len(counted), len(names), hot_pixels_filename))
+            print("* (Run with --hot-pixels but without --incremental to count all of the frames.)")
+
+    # Write out the timings, if recorded.
+    if args.timings:
+        instrumentation.writeSummary(os.path.join(outputpath, "timings.json"), timeit.default_timer() - t0)
@@ -18,9 +18,6 @@ import argparse
 #...for the logging.
 import logging as lg
 
-#...for the data unpacking.
-import struct
-
 #...for the MATH.
 import math
 
@@ -30,6 +27,12 @@ import codecs
 #...for the time (being).
 import time
 
+#...for plotting the days in parallel.
+from multiprocessing import Pool
+
+#...for the MATH.
+import numpy as np
+
 #...for the extra time (stuff).
 #
 from timestuff.constants import *
@@ -38,9 +41,78 @@ from timestuff.wrappers import DataDay
 #
 from timestuff.plots import HourPlot
 #
-from timestuff.handlers import make_time_dir
+from timestuff.handlers import make_time_dir, getDayStartTime
 #
-from timestuff.pages import make_day_plot_page
+from timestuff.pages import make_day_plot_page, make_days_index_page
+#
+from timestuff.profile import PixelRateProfile, splitFramesByDay
+
+## The number of seconds in a day.
+SECONDS_IN_A_DAY = SECONDS_IN_A_MINUTE * MINUTES_IN_AN_HOUR * HOURS_IN_A_DAY
+
+
+def makeDayProfile(task):
+    """
+    Make the hour plots and web page for a day.
+
+    @param [in] task A (day start time [s], day's profile records, day output path) tuple.
+    @returns html_path The path to the day's web page.
+    @returns n_frames The number of frames in the day.
+    """
+
+    day_start_s, day_frames, day_output_path = task
+
+    if not os.path.isdir(day_output_path):
+        os.mkdir(day_output_path)
+
+    ## The day to profile.
+    my_day = DataDay(day_start_s, day_start_s + SECONDS_IN_A_DAY - 1)
+
+    lg.info(" * Frames found in the day  : % 15d"     % (len(day_frames)))
+
+    # Add the frames to the day in one go (using the fields found in both profile versions).
+    my_day.addFrames(day_frames["st"], day_frames["acqtime"], day_frames["n_pixel"])
+
+    # Loop over the hours in the day.
+    #
+    for hour, frames in my_day.getFramesInEachHour().iteritems():
+        #
+        lg.info(" * Frames in hour %02d: % 10d" % (hour, frames))
+
+        ## The start time of the hour.
+        hour_start_time_s = my_day.getHour(hour).getStartTime()
+
+        # Get the hour start time.
+        lg.info(" * Hour %02d start time % 15d [s] => '%s' UTC." % (hour, hour_start_time_s, make_time_dir(hour_start_time_s)))
+
+        # Make the plot for the hour.
+        hour_plot = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [s -1]")
+        #hour_plot = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [$\\textrm{s}^{-1}$]")
+        #hour_plot = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [$\\textrm{s}^{-1}$]", y_max=30)
+
+        # Save the profile plot to the output directory.
+        hour_plot.save_plot(day_output_path, hour)
+
+    # Make the web page.
+
+    ## Dictionary for the plot images.
+    plot_paths = {}
+    #
+    for fn in sorted(glob.glob(os.path.join(day_output_path, "*.png"))):
+
+        ## The hour number ("%H").
+        hour = int(os.path.basename(fn).split(".")[0])
+        #
+        # Add the plot to the dictionary.
+        plot_paths[hour] = os.path.basename(fn)
+
+    ## The path to the HTML page for the dataset profiles.
+    html_path = os.path.join(day_output_path, "pixel-profile.html")
+    #
+    with codecs.open(html_path, 'w', 'utf-8') as f:
+        f.write(make_day_plot_page(plot_paths))
+
+    return html_path, my_day.getNumberOfFrames()
 
 
 if __name__ == "__main__":
@@ -52,12 +124,16 @@ if __name__ == "__main__":
 
     # Get the datafile path from the command line.
     parser = argparse.ArgumentParser()
-    parser.add_argument("inputPath",       help="Path to the binary input data.")
-    parser.add_argument("outputPath",      help="The path for the output files.")
-    parser.add_argument("day",             help="The day to plot for.")
-    parser.add_argument("numFrames",       help="The number of frames to process (-1 for all).")
-    parser.add_argument("startFrame",      help="The starting frame.")
-    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+    parser.add_argument("inputPath",        help="Path to the binary input data.")
+    parser.add_argument("outputPath",       help="The path for the output files.")
+    parser.add_argument("day",              help="The day to plot for (YYYY-MM-DD-UTC) - not needed with --from, --to or --all-days.", nargs="?", default=None)
+    parser.add_argument("numFrames",        help="The number of frames to process (-1 for all).", nargs="?", default="-1")
+    parser.add_argument("startFrame",       help="The starting frame.", nargs="?", default="0")
+    parser.add_argument("--from",           help="The first day to plot for (YYYY-MM-DD-UTC).", dest="from_day", default=None)
+    parser.add_argument("--to",             help="The last day to plot for (YYYY-MM-DD-UTC).", dest="to_day", default=None)
+    parser.add_argument("-a", "--all-days", help="Plot every day found in the profile.", action="store_true")
+    parser.add_argument("-j", "--jobs",     help="The number of days to plot in parallel.", type=int, default=1)
+    parser.add_argument("-v", "--verbose",  help="Increase output verbosity", action="store_true")
     args = parser.parse_args()
 
     ## The path to the data file.
@@ -74,26 +150,11 @@ if __name__ == "__main__":
     if not os.path.isdir(outputpath):
         raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
 
-    ## The day to plot.
-    day_string = args.day
+    ## Plot a range of days (rather than a single day)?
+    use_range = args.all_days or args.from_day is not None or args.to_day is not None
     #
-    ## Time object for the day's start time.
-    day_t = time.strptime(day_string, "%Y-%m-%d-%Z")
-
-    ## String representing the day's start time.
-    day_str = time.asctime(day_t)
-
-    ## The start time (seconds since epoch) of the specified day [s].
-    day_start_s = time.mktime(day_t)
-
-    ## The end time (seconds since epoch) of the specified day [s].
-    day_end_s = day_start_s + (SECONDS_IN_A_MINUTE * MINUTES_IN_AN_HOUR * HOURS_IN_A_DAY) - 1
-
-    ## The day's output directory.
-    day_output_path = os.path.join(outputpath, day_string)
-    #
-    if not os.path.isdir(day_output_path):
-        os.mkdir(day_output_path)
+    if use_range == (args.day is not None):
+        raise IOError("* ERROR: give either a day or a range of days (--from/--to/--all-days)!")
 
     ## The number of frames to process.
     n_frames_to_process = int(args.numFrames)
@@ -114,11 +175,12 @@ if __name__ == "__main__":
     print("* Input path          : '%s'" % (datapath))
     print("* Output path         : '%s'" % (outputpath))
     print("*")
-    print("* Day                 : %s" % (day_str))
-    print("*")
+
+    ## The pixel rate profile of the run.
+    profile = PixelRateProfile(datapath)
 
     ## The total number of frames.
-    n_frames = os.path.getsize(datapath) / 8
+    n_frames = profile.getNumberOfFrames()
 
     # Error handling.
     if n_frames_to_process == -1:
@@ -127,105 +189,116 @@ if __name__ == "__main__":
     if start_frame_number > n_frames:
         raise IOError("* ERROR! Starting frame number greater than the number of frames.")
 
-    lg.info(" * Plotting information about %s from '%s'" % (day_str, datapath))
+    lg.info(" * Plotting information from '%s'" % (datapath))
     lg.info(" *")
     lg.info(" * File size                : % 15d [B]" % (os.path.getsize(datapath)))
     lg.info(" * Number of frames         : % 15d"     % (n_frames))
 
-    ## The day to profile.
-    my_day = DataDay(day_start_s, day_end_s)
+    ## The day plotting tasks - (day start time [s], day's frames, day output path).
+    tasks = []
 
-    # Read the information from the binary dataset profile.
-    with open(datapath, "rb") as bf:
+    if not use_range:
 
-        ## The frame count.
-        frame_count = 0
+        ## The day to plot.
+        day_string = args.day
 
-        while True:
+        ## The start time (seconds since epoch) of the specified day [s].
+        day_start_s = getDayStartTime(day_string)
 
-            ## The eight bytes representing the next frame.
-            bs = bf.read(8)
+        ## The end time (seconds since epoch) of the specified day [s].
+        day_end_s = day_start_s + SECONDS_IN_A_DAY - 1
 
-            # Skip frames before the start frame (FIXME).
-            if frame_count < start_frame_number:
-                frame_count += 1
-                continue
+        print("* Day                 : %s" % (time.asctime(time.gmtime(day_start_s))))
+        print("*")
 
-            # Quit if we're at the end of the file or frame count.
-            if not bs or frame_count > (n_frames_to_process + start_frame_number - 1): break
+        # Get the day's frames from the binary dataset profile.
+        if start_frame_number == 0 and n_frames_to_process >= n_frames:
 
-            ## The frame's data - 8 bytes, eh? Nice.
-            data = struct.unpack("IhH", bs)
+            ## The day's frames - found with a binary search of the start times.
+            day_frames = profile.getFramesInRange(day_start_s, day_end_s)
 
-            ## The start time (seconds since epoch) - 4 byte unsigned integer.
-            start_time_s = data[0]
+        else:
 
-            lg.info(" *--> Frame start time %15d [s] -> '%s' (UTC)" % (start_time_s, make_time_dir(start_time_s)))
+            ## The frames to process (in file order).
+            frames = profile.getRecords()[start_frame_number:start_frame_number + n_frames_to_process]
 
-            ## The acquisition time (decoded 2 byte signed integer).
-            #acq_time = math.pow(10, int(data[1]))
-            acq_time = int(data[1])
+            ## The day's frames.
+            day_frames = frames[(frames["st"] >= day_start_s) & (frames["st"] <= day_end_s)]
 
-            ## The number of hit pixels (2 byte unsigned integer).
-            n_pixels = int(data[2])
+        tasks.append((day_start_s, day_frames, os.path.join(outputpath, day_string)))
 
-            # Check if the start time is within the day.
-            if day_start_s <= start_time_s <= day_end_s:
-                my_day.addFrame(start_time_s, acq_time, n_pixels)
+    else:
 
-            frame_count += 1
+        ## The frames to process (in file order) - read in one go.
+        frames = np.array(profile.getRecords()[start_frame_number:start_frame_number + n_frames_to_process])
 
-    ## The number of frames processed - check.
-    n_frames_check = 0
+        # Only keep the frames in the requested range of days.
+        if args.from_day is not None:
+            frames = frames[frames["st"] >= getDayStartTime(args.from_day)]
+        #
+        if args.to_day is not None:
+            frames = frames[frames["st"] < getDayStartTime(args.to_day) + SECONDS_IN_A_DAY]
 
-    ## Dictionary of the hour plots.
-    hour_plots = {}
+        ## The frames in each day found {day start time [s]:frames}.
+        frames_by_day = splitFramesByDay(frames)
 
-    # Loop over the hours in the day.
-    #
-    for hour, frames in my_day.getFramesInEachHour().iteritems():
+        ## The start times of the days to plot [s].
+        day_starts = sorted(frames_by_day.keys())
         #
-        n_frames_check += frames
-        #
-        lg.info(" * Frames in hour %02d: % 10d" % (hour, frames))
+        # With a range of days, plot every day in the range (even with no frames).
+        if args.from_day is not None or args.to_day is not None:
 
-        ## The start time of the hour.
-        hour_start_time_s = my_day.getHour(hour).getStartTime()
+            if len(day_starts) == 0 and (args.from_day is None or args.to_day is None):
+                raise IOError("* ERROR! No frames found in the range of days.")
 
-        # Get the hour start time.
-        lg.info(" * Hour %02d start time % 15d [s] => '%s' UTC." % (hour, hour_start_time_s, make_time_dir(hour_start_time_s)))
+            ## The first day [s].
+            first_day_s = day_starts[0] if args.from_day is None else getDayStartTime(args.from_day)
 
-        # Make the plot for the hour.
-        hour_plots[hour] = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [s -1]")
-        #hour_plots[hour] = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [$\\textrm{s}^{-1}$]")
-        #hour_plots[hour] = HourPlot(my_day.getHour(hour), y_label="Pixels per second / [$\\textrm{s}^{-1}$]", y_max=30)
+            ## The last day [s].
+            last_day_s = day_starts[-1] if args.to_day is None else getDayStartTime(args.to_day)
 
-        # Save the profile plot to the output directory.
-        hour_plots[hour].save_plot(day_output_path, hour)
+            day_starts = range(first_day_s, last_day_s + 1, SECONDS_IN_A_DAY)
 
-        #break
+        for day_start_s in day_starts:
 
-    # Make the web page.
+            ## The day's name (and output directory name).
+            day_string = time.strftime("%Y-%m-%d-UTC", time.gmtime(day_start_s))
 
-    ## Dictionary for the plot images.
-    plot_paths = {}
-    #
-    for fn in sorted(glob.glob(os.path.join(day_output_path, "*.png"))):
+            tasks.append((day_start_s, frames_by_day.get(day_start_s, frames[:0]), os.path.join(outputpath, day_string)))
 
-        ## The hour number ("%H").
-        hour = int(os.path.basename(fn).split(".")[0])
+        print("* Days                : %d" % (len(tasks)))
+        print("*")
+
+    # Plot the days - in parallel, if requested.
+    if args.jobs > 1 and len(tasks) > 1:
+        pool = Pool(args.jobs)
         #
-        # Add the plot to the dictionary.
-        plot_paths[hour] = os.path.basename(fn)
+        ## The days' web pages and numbers of frames.
+        results = pool.map(makeDayProfile, tasks, chunksize=1)
+        #
+        pool.close(); pool.join()
+    else:
+        results = [makeDayProfile(task) for task in tasks]
 
-    #print plot_paths
+    for (day_start_s, day_frames, day_output_path), (html_path, n_day_frames) in zip(tasks, results):
+        print("* Profile plots made for %s." % (time.asctime(time.gmtime(day_start_s))))
 
-    ## The path to the HTML page for the dataset profiles.
-    html_path = os.path.join(day_output_path, "pixel-profile.html")
-    #
-    with codecs.open(html_path, 'w', 'utf-8') as f:
-        f.write(make_day_plot_page(plot_paths))
+    if not use_range:
+        print("* These can be viewed with the following command:")
+        print("* $ firefox %s &" % (results[0][0]))
+    else:
+
+        ## The day pages {day name:(path relative to the index, number of frames)}.
+        day_pages = {}
+        #
+        for (day_start_s, day_frames, day_output_path), (html_path, n_day_frames) in zip(tasks, results):
+            day_pages[os.path.basename(day_output_path)] = (os.path.relpath(html_path, outputpath), n_day_frames)
+
+        ## The path to the index page of the days.
+        index_path = os.path.join(outputpath, "pixel-profile-days.html")
+        #
+        with codecs.open(index_path, 'w', 'utf-8') as f:
+            f.write(make_days_index_page(day_pages))
 
-    print("* Profile plots made for %s." % (day_str))
-    print("* These can be viewed with the following command:")
-    print("* $ firefox %s &" % (html_path))
+        print("* The days can be viewed with the following command:")
+        print("* $ firefox %s &" % (index_path))
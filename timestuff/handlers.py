@@ -12,7 +12,7 @@ import logging as lg
 import re
 
 #...for the time functionality.
-import time
+import time, calendar
 
 def isStartTimeStringValid(sts):
     """ Check the format of the time string. """
@@ -54,3 +54,7 @@ def make_time_dir(sec):
     s = time.strftime("%Y-%m-%d-%H%M%S", mytime)
 
     return s
+
+def getDayStartTime(day_string):
+    """ Get the start time (seconds since epoch) of a day ("YYYY-MM-DD-UTC") [s]. """
+    return calendar.timegm(time.strptime(day_string, "%Y-%m-%d-%Z"))
@@ -176,3 +176,57 @@ def make_day_plot_page(plot_names):
     s = s.replace('{{CSS}}', make_css())
 
     return s
+
+
+def make_days_index_page(day_pages):
+
+    """
+    Make an index page linking the profile pages of a set of days.
+
+    @param [in] day_pages Dictionary of the day pages { day name:(path, number of frames) }.
+    """
+
+    ## The string to return for the page.
+    s = '''<!DOCTYPE html>
+<html>
+<head>
+  <!-- <link rel="stylesheet" type="text/css" href="main.css"> -->
+  <style>
+{{CSS}}
+  </style>
+</head>
+<div id="container">
+
+  <!-- Main Content -->
+  <div id="main">
+    <table>
+      <tr><th>Day</th><th>Frames</th></tr>
+{{TABLE_ROWS}}
+    </table>
+  </div>
+
+  <!-- Footer -->
+  <div id="footer">&copy; CERN@school 2015</div>
+
+</div>
+</html>
+'''
+
+    ## The table contents (generated from the supplied dictionary).
+    t = ""
+
+    # Loop over the days.
+    for day in sorted(day_pages.keys()):
+
+        path, n_frames = day_pages[day]
+
+        # Add the link to the day's page to the table.
+        t += "      <tr><td class=\"caption\"><a href=\"%s\">%s</a></td><td class=\"number\">%d</td></tr>\n" % (path, day, n_frames)
+
+    # Add the table contents.
+    s = s.replace('{{TABLE_ROWS}}', t)
+
+    # Add the CSS inline to the web page.
+    s = s.replace('{{CSS}}', make_css())
+
+    return s
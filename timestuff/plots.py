@@ -37,11 +37,118 @@ from matplotlib import rc
 #...for plotting arbitrary rectangles on the plots.
 from matplotlib.patches import Rectangle
 
+#...for plotting lots of rectangles on the plots.
+from matplotlib.collections import PolyCollection
+
 #...for custom axis tickers.
 import matplotlib.ticker as ticker
 
 from handlers import make_time_dir
 
+## The plot figures, made on first use and then reused {figure number:(figure, axes)}.
+PLOT_FIGURES = {}
+
+## The "normal" frame colour.
+FRAME_COLOUR = "#44aa44"
+
+## The colour of frames with no acquisition time.
+ZERO_ACQ_FRAME_COLOUR = "#222288"
+
+## The colour of noisy frames.
+NOISY_FRAME_COLOUR = "#882222"
+
+## The number of pixels above which a frame is noisy.
+NOISY_FRAME_PIXELS = 30000
+
+def getPlotFigure(num, fig_w, fig_h):
+    """
+    Get a plot figure and its (cleared) axes, making them if needed.
+
+    The figure is reused from plot to plot, rather than being made
+    again each time.
+
+    @param [in] num The figure number.
+    @param [in] fig_w The figure width [inches].
+    @param [in] fig_h The figure height [inches].
+    @returns fig The figure (now the current figure).
+    @returns ax The figure's axes (now the current axes).
+    """
+
+    if num in PLOT_FIGURES and plt.fignum_exists(num):
+
+        fig, ax = PLOT_FIGURES[num]
+
+        if tuple(fig.get_size_inches()) == (fig_w, fig_h):
+
+            # Make the figure current and clear the last plot.
+            plt.figure(num)
+            ax.cla()
+
+            return fig, ax
+
+    # Reset the matplot lib plotting stuff.
+    plt.close(num)
+
+    # Here we create the figure on which we'll be plotting our results.
+    # We assign the figure a number, a size, set the resolution
+    # of the image (150 DPI), and set the background and outline to white.
+    fig = plt.figure(num, figsize=(fig_w, fig_h), dpi=150, facecolor='w', edgecolor='w')
+
+    # This is the subplot on which we'll actually be plotting.
+    ax = fig.add_subplot(111)
+
+    PLOT_FIGURES[num] = (fig, ax)
+
+    return fig, ax
+
+def getHourBars(sts, acq_times, n_pixels, h_st):
+    """
+    Get the bars representing the frames in an hour.
+
+    Each frame is a bar starting at the frame's start time, as wide as
+    the acquisition time, with a height of the pixels per second - so
+    the area of the bar is the number of pixels in the frame. Frames
+    with no acquisition time are drawn as a 1 s wide, 500 high bar.
+
+    @param [in] sts The frame start times [s].
+    @param [in] acq_times The frame acquisition times [s].
+    @param [in] n_pixels The number of pixels in each frame.
+    @param [in] h_st The hour's start time [s].
+    @returns xs NumPy array of the bar x positions (frame - hour's start time) [s].
+    @returns ws NumPy array of the bar widths [s].
+    @returns hs NumPy array of the bar heights [s^-1].
+    @returns colours The bar colours.
+    @returns y_max The maximum bar height of the (non-noisy) frames (at least 1).
+    """
+
+    sts = np.asarray(sts, dtype=np.float64)
+    ws  = np.array(acq_times, dtype=np.float64)
+    nps = np.asarray(n_pixels, dtype=np.float64)
+
+    ## Which frames have an acquisition time?
+    has_acq = ws > 0.
+
+    ## The bar heights - the pixels per second.
+    hs = np.full(len(sts), 500.)
+    #
+    hs[has_acq] = nps[has_acq] / ws[has_acq]
+    #
+    ws[~has_acq] = 1.
+
+    ## Which frames are noisy?
+    is_noisy = nps > NOISY_FRAME_PIXELS
+
+    ## The bar colours.
+    colours = np.where(is_noisy, NOISY_FRAME_COLOUR, np.where(has_acq, FRAME_COLOUR, ZERO_ACQ_FRAME_COLOUR)).tolist()
+
+    ## The maximum y value.
+    y_max = 1.0
+    #
+    if np.any(~is_noisy):
+        y_max = max(y_max, hs[~is_noisy].max())
+
+    return sts - h_st, ws, hs, colours, y_max
+
 class MonthPlot:
     """ Wrapper class for the monthly plots. """
 
@@ -54,13 +161,6 @@ class MonthPlot:
 
         lg.info(" * Initialising MonthPlot object...")
 
-        # Reset the matplot lib plotting stuff.
-        plt.close()
-
-        # Here we create the figure on which we'll be plotting our results.
-        # We assign the figure a number, a size (5" x 3"), set the resolution
-        # of the image (150 DPI), and set the background and outline to white.
-
         ## The figure width [inches].
         self.__fig_w = 5.0
         #
@@ -73,15 +173,12 @@ class MonthPlot:
         if "fig_height" in kwargs.keys():
             self.__fig_h = kwargs["fig_height"]
 
-        ## The histogram.
-        self.__plot = plt.figure(101, figsize=(self.__fig_w, self.__fig_h), dpi=150, facecolor='w', edgecolor='w')
+        ## The histogram (and the subplot on which we'll actually be plotting).
+        self.__plot, self.__plot_ax = getPlotFigure(101, self.__fig_w, self.__fig_h)
 
         # Then we give a bit of clearance for the axes.
         self.__plot.subplots_adjust(bottom=0.17, left=0.15)
 
-        # This is the subplot on which we'll actually be plotting.
-        self.__plot_ax = self.__plot.add_subplot(111)
-
         # Label your axes:
 
         ## The x axis label.
@@ -191,13 +288,6 @@ class HourPlot:
         lg.info(" * Initialising HourPlot object...")
         #print(" * Initialising HourPlot object...")
 
-        # Reset the matplot lib plotting stuff.
-        plt.close()
-
-        # Here we create the figure on which we'll be plotting our results.
-        # We assign the figure a number, a size (5" x 3"), set the resolution
-        # of the image (150 DPI), and set the background and outline to white.
-
         ## The figure width [inches].
         self.__fig_w = 42.0
         #
@@ -210,15 +300,12 @@ class HourPlot:
         if "fig_height" in kwargs.keys():
             self.__fig_h = kwargs["fig_height"]
 
-        ## The histogram.
-        self.__plot = plt.figure(101, figsize=(self.__fig_w, self.__fig_h), dpi=150, facecolor='w', edgecolor='w')
+        ## The histogram (and the subplot on which we'll actually be plotting).
+        self.__plot, self.__plot_ax = getPlotFigure(101, self.__fig_w, self.__fig_h)
 
         # Then we give a bit of clearance for the axes.
         self.__plot.subplots_adjust(bottom=0.15, left=0.02, right=0.99)
 
-        # This is the subplot on which we'll actually be plotting.
-        self.__plot_ax = self.__plot.add_subplot(111)
-
         # Label your axes:
 
         ## The x axis label.
@@ -248,60 +335,22 @@ class HourPlot:
 
         lg.info(" * The hour's start time: %d [s] => '%s' UTC." % (h_st, make_time_dir(h_st)))
 
-        ## The maximum y value.
-        y_max = 1.0
-
-        # Loop over the frames found.
-        for i, st in enumerate(data_hour.getStartTimes()):
-
-            ## The frame's acquisition time [s].
-            acq_time = data_hour.getAcqTimes()[i]
+        ## The frames' bars (see getHourBars).
+        xs, ws, hs, colours, y_max = getHourBars(data_hour.getStartTimes(), data_hour.getAcqTimes(), data_hour.getNumberOfPixels(), h_st)
 
-            ## The number of pixels in the frame.
-            n_pixels = data_hour.getNumberOfPixels()[i]
+        lg.info(" * Found %d frames (%d noisy, %d with no acquisition time)." % \
+            (len(xs), colours.count(NOISY_FRAME_COLOUR), colours.count(ZERO_ACQ_FRAME_COLOUR)))
 
-            lg.info(" * Found new frame: %s (%f [s], % 7d pixels)." % (time.asctime(time.gmtime(st)), acq_time, n_pixels))
-
-            ## The "normal" frame colour.
-            frame_color = "#44aa44"
-
-            ## The x position of the frame's bar (frame - hour's start time).
-            x = st - h_st
-
-            lg.info(" *--> Start time from frame: % 15d [s] => '%s' UTC." % (st, make_time_dir(st)))
-            lg.info(" *--> %d, %d, %d" % (st, h_st, x))
-
-            ## The y position of the frame's bar.
-            y = 0
-
-            ## The width of the bar - the acquition time.
-            w = acq_time
-            #
-            ## The height of the bar - the pixels per second.
-            #
-            # This means the area of the bar is the total number of pixels
-            # in the frame.
-            if float(acq_time) > 0.:
-                h = float(n_pixels) / float(acq_time)
-            else:
-                h = 500
-                w = 1
-                frame_color = "#222288"
-
-            # Check if we have a noisy frame.
-            if n_pixels > 30000:
-                # Set the frame color to indicate an error (i.e. noise).
-                frame_color = "#882222"
-            else:
-                # If normal, check if we have a new maximum.
-                if h > y_max:
-                    y_max = h
-
-            lg.info(" *---> (x, y) = (%f, %f)" % (x, y))
-            lg.info(" *---> (w, h) = (%f, %f)" % (w, h))
+        ## The corners of the bars.
+        verts = np.empty((len(xs), 4, 2))
+        #
+        verts[:, 0, 0] = xs;      verts[:, 0, 1] = 0.
+        verts[:, 1, 0] = xs;      verts[:, 1, 1] = hs
+        verts[:, 2, 0] = xs + ws; verts[:, 2, 1] = hs
+        verts[:, 3, 0] = xs + ws; verts[:, 3, 1] = 0.
 
-            # Add a rectangle representing the frame to the plot.
-            self.__plot_ax.add_patch(Rectangle((x, y), w, h, facecolor=frame_color, edgecolor=frame_color))
+        # Add the rectangles representing the frames to the plot in one go.
+        self.__plot_ax.add_collection(PolyCollection(verts, facecolors=colours, edgecolors=colours, linewidths=1.0))
 
         # Round up to the nearest 10.
         y_max = 10 * (np.floor(y_max/10.) + 1)
@@ -334,7 +383,12 @@ class HourPlot:
         lg.info(" *")
 
     def save_plot(self, outputpath, name):
-        """ Saves the figure. """
+        """
+        Saves the figure.
+
+        The figure is reused by the next plot, so save it before
+        making another.
+        """
 
         # The PNG path (for HTML pages).
         png_path = os.path.join(outputpath, "%s.png" % (name))
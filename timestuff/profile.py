@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+CERN@school: Data Profiling - Time Stuff - Profile Readers.
+
+See http://cernatschool.web.cern.ch for more information.
+
+"""
+
+#...for the operating stuff.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the binary stuff.
+import struct
+
+#...for the MATH.
+import numpy as np
+
+#...for the timings.
+from cernatschool.instrumentation import timed
+
+## The (version 1) pixel rate profile record, as originally written by
+## get-pixel-rate-binary.py (struct.pack('IhH', ...) - the start time [s],
+## acquisition time [s] and number of hit pixels). Version 1 files have
+## no header - they are just the records.
+PROFILE_RECORD = np.dtype([("st", "<u4"), ("acqtime", "<i2"), ("n_pixel", "<u2")])
+
+## The version 2 pixel rate profile record - the start time [s],
+## acquisition time [s] and the numbers of hit pixels, clusters and
+## gamma candidates.
+PROFILE_RECORD_V2 = np.dtype([("st", "<f8"), ("acqtime", "<f4"), ("n_pixel", "<u4"), ("n_kluster", "<u4"), ("n_gamma", "<u4")])
+
+## The magic string at the start of a version 2 profile.
+PROFILE_MAGIC = "CSPR"
+
+## The version 2 profile header - the magic string, the version (2),
+## flags (unused), the chip ID, the run ID, the number of frames, the
+## first hour of the time index [hours since epoch] and the number of
+## hours in the index.
+#
+# The header is followed by the time index - the (u4) number of the
+# first frame starting in or after each hour, plus the total number of
+# frames - and then the records, in start time order.
+PROFILE_HEADER_V2 = "<4sHH16s32sIII"
+
+def getHourIndex(sts):
+    """
+    Make the hour index of the (start time ordered) frames.
+
+    @param [in] sts The frame start times [s], in order.
+    @returns first_hour The first hour of the index [hours since epoch].
+    @returns index The number of the first frame starting in or after each hour, plus the number of frames.
+    """
+
+    if len(sts) == 0:
+        return 0, np.zeros(1, dtype="<u4")
+
+    ## The hours [hours since epoch] of the first and last frames.
+    first_hour = int(sts[0] // 3600); last_hour = int(sts[-1] // 3600)
+
+    ## The index.
+    index = np.searchsorted(sts, 3600.0 * np.arange(first_hour, last_hour + 2), side="left")
+
+    return first_hour, index.astype("<u4")
+
+@timed("profile_write")
+def writeProfile(path, records, chipid="", runid=""):
+    """
+    Write a version 2 pixel rate profile file.
+
+    The file is written in one go - the header, the hour index and
+    the records (sorted by start time).
+
+    @param [in] path The path to the profile binary file.
+    @param [in] records The PROFILE_RECORD_V2 NumPy array of the frames.
+    @param [in] chipid The chip ID.
+    @param [in] runid The run ID.
+    """
+
+    records = np.asarray(records, dtype=PROFILE_RECORD_V2)
+
+    if len(records) > 1 and np.any(records["st"][1:] < records["st"][:-1]):
+        records = records[np.argsort(records["st"], kind="mergesort")]
+
+    first_hour, index = getHourIndex(records["st"])
+
+    ## The header.
+    header = struct.pack(PROFILE_HEADER_V2, PROFILE_MAGIC, 2, 0, chipid, runid, \
+        len(records), first_hour, len(index) - 1)
+
+    with open(path, "wb") as f:
+        f.write(header + index.tostring() + records.tostring())
+
+@timed("profile_write")
+def writeProfileV1(path, records):
+    """
+    Write a version 1 pixel rate profile file (the records only).
+
+    As with the struct.pack('IhH', ...) records originally written,
+    values that don't fit in a record are an error - they are not
+    wrapped around.
+
+    @param [in] path The path to the profile binary file.
+    @param [in] records The frames as (start time [s], acquisition time [s], number of hit pixels) tuples.
+    """
+
+    ## The records as (signed 64-bit) integers, one row per frame.
+    values = np.array(records, dtype=np.int64).reshape(-1, 3)
+
+    for i, name in enumerate(PROFILE_RECORD.names):
+
+        ## The range of values that fit in the record field.
+        info = np.iinfo(PROFILE_RECORD[name])
+
+        bad = np.flatnonzero((values[:, i] < info.min) | (values[:, i] > info.max))
+
+        if len(bad) > 0:
+            raise IOError("* ERROR: frame %d's %s (%d) is out of range for a version 1 profile [%d, %d] - use version 2!" \
+                % (bad[0], name, values[bad[0], i], info.min, info.max))
+
+    ## The records.
+    v1_records = np.zeros(len(values), dtype=PROFILE_RECORD)
+    #
+    for i, name in enumerate(PROFILE_RECORD.names):
+        v1_records[name] = values[:, i]
+
+    with open(path, "wb") as f:
+        f.write(v1_records.tostring())
+
+def readProfileHeader(path):
+    """
+    Read the header of a version 2 pixel rate profile file.
+
+    A file is only taken to be a version 2 profile if the magic string,
+    version and size all match - version 1 files have no header.
+
+    @param [in] path The path to the profile binary file.
+    @returns header A dictionary of the header values (None for a version 1 file).
+    """
+
+    ## The size of the file [bytes].
+    size = os.path.getsize(path)
+
+    ## The size of the header [bytes].
+    header_size = struct.calcsize(PROFILE_HEADER_V2)
+
+    if size < header_size:
+        return None
+
+    with open(path, "rb") as f:
+        magic, version, flags, chipid, runid, n_frames, first_hour, n_hours = \
+            struct.unpack(PROFILE_HEADER_V2, f.read(header_size))
+
+    ## The offset of the records [bytes].
+    offset = header_size + 4 * (n_hours + 1)
+
+    if magic != PROFILE_MAGIC or version != 2 or size != offset + n_frames * PROFILE_RECORD_V2.itemsize:
+        return None
+
+    return {
+        "version"    : version,
+        "chipid"     : chipid.rstrip("\0"),
+        "runid"      : runid.rstrip("\0"),
+        "n_frames"   : n_frames,
+        "first_hour" : first_hour,
+        "n_hours"    : n_hours,
+        "index_offset" : header_size,
+        "offset"     : offset
+        }
+
+def splitFramesByDay(frames):
+    """
+    Split the frames of a profile into (UTC) days.
+
+    @param [in] frames The profile records.
+    @returns days A dictionary of the frames starting in each day {day start time [s]:records}, in start time order.
+    """
+
+    if len(frames) == 0:
+        return {}
+
+    ## The frames in start time order.
+    frames = frames[np.argsort(frames["st"], kind="mergesort")]
+
+    ## The day (since the epoch) of each frame.
+    days = np.floor(frames["st"] / 86400.).astype(np.int64)
+
+    ## The index of the first frame of each day found.
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+
+    ## The index after the last frame of each day found.
+    ends = np.append(starts[1:], len(frames))
+
+    return dict((int(days[i]) * 86400, frames[i:j]) for i, j in zip(starts, ends))
+
+class PixelRateProfile:
+    """
+    Reader for the pixel rate binary profile of a run.
+
+    The profile file is memory mapped as a NumPy structured array, so
+    only the records that are used are read from disk. The records are
+    found by a binary search of the start times (narrowed down with the
+    hour index of version 2 files). If the records are not in start
+    time order, a (stable) merge sort index is made first.
+
+    Both versions of the profile are read - see getRecords() for the
+    record fields.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor.
+
+        @param [in] path The path to the profile binary file.
+        """
+
+        lg.info(" * Initialising PixelRateProfile object...")
+
+        if not os.path.exists(path):
+            raise IOError("* ERROR: '%s' profile file does not exist!" % (path))
+
+        ## The path to the profile binary file.
+        self.__path = path
+
+        ## The version 2 header (None for version 1 profiles).
+        self.__header = readProfileHeader(path)
+
+        ## The hour index (None for version 1 profiles).
+        self.__index = None
+
+        if self.__header is not None:
+
+            self.__index = np.memmap(path, dtype="<u4", mode="r", \
+                offset=self.__header["index_offset"], shape=(self.__header["n_hours"] + 1,))
+
+            ## The profile records (in file order).
+            self.__records = np.zeros(0, dtype=PROFILE_RECORD_V2)
+            #
+            if self.__header["n_frames"] > 0:
+                self.__records = np.memmap(path, dtype=PROFILE_RECORD_V2, mode="r", offset=self.__header["offset"])
+
+        else:
+
+            if os.path.getsize(path) % PROFILE_RECORD.itemsize != 0:
+                raise IOError("* ERROR: '%s' is not a pixel rate profile!" % (path))
+
+            ## The profile records (in file order).
+            self.__records = np.zeros(0, dtype=PROFILE_RECORD)
+            #
+            if os.path.getsize(path) > 0:
+                self.__records = np.memmap(path, dtype=PROFILE_RECORD, mode="r")
+
+        ## The start times [s] (in file order).
+        sts = self.__records["st"]
+
+        ## The start time order of the records (None if the file is in order).
+        self.__order = None
+
+        ## The start times [s], in start time order.
+        self.__sorted_sts = sts
+        #
+        if len(sts) > 1 and np.any(sts[1:] < sts[:-1]):
+            lg.info(" * The profile records are out of order - sorting.")
+            self.__order = np.argsort(sts, kind="mergesort")
+            self.__sorted_sts = sts[self.__order]
+
+        lg.info(" * Found %d frames in '%s'." % (len(self.__records), path))
+
+    def getNumberOfFrames(self):
+        return len(self.__records)
+
+    def getVersion(self):
+        """ Get the version of the profile file format. """
+        if self.__header is None:
+            return 1
+        return self.__header["version"]
+
+    def getChipId(self):
+        """ Get the chip ID ("" for version 1 profiles). """
+        if self.__header is None:
+            return ""
+        return self.__header["chipid"]
+
+    def getRunId(self):
+        """ Get the run ID ("" for version 1 profiles). """
+        if self.__header is None:
+            return ""
+        return self.__header["runid"]
+
+    def getHourBounds(self, start_time_s, end_time_s):
+        """
+        Get the index range of the frames in the hours covering a time range from the hour index.
+
+        @param [in] start_time_s The start of the time range [s].
+        @param [in] end_time_s The end of the time range (inclusive) [s].
+        @returns lo The index of the first frame in the first hour (0 if there is no hour index).
+        @returns hi The index after the last frame in the last hour (the number of frames if there is no hour index).
+        """
+
+        if self.__index is None or self.__order is not None:
+            return 0, len(self.__records)
+
+        ## The number of hours in the index.
+        n_hours = self.__header["n_hours"]
+
+        ## The index hours of the start and end of the range.
+        h_lo = int(start_time_s // 3600) - self.__header["first_hour"]
+        h_hi = int(end_time_s // 3600) - self.__header["first_hour"] + 1
+
+        return int(self.__index[min(max(h_lo, 0), n_hours)]), int(self.__index[min(max(h_hi, 0), n_hours)])
+
+    def isOrdered(self):
+        """ Are the records in the file in start time order? """
+        return self.__order is None
+
+    def getRecords(self):
+        """
+        Get all of the records, in file order.
+
+        The records have "st", "acqtime" and "n_pixel" fields (see
+        PROFILE_RECORD) - version 2 profiles also have "n_kluster" and
+        "n_gamma" fields (see PROFILE_RECORD_V2).
+        """
+        return self.__records
+
+    def getIndexRange(self, start_time_s, end_time_s):
+        """
+        Get the (start time ordered) index range of the frames starting in a time range.
+
+        @param [in] start_time_s The start of the time range [s].
+        @param [in] end_time_s The end of the time range (inclusive) [s].
+        @returns i The index of the first frame in the range.
+        @returns j The index after the last frame in the range.
+        """
+
+        # Only search the hours covering the range.
+        lo, hi = self.getHourBounds(start_time_s, end_time_s)
+
+        ## The start times [s] of the frames in those hours.
+        sts = self.__sorted_sts[lo:hi]
+
+        i = lo + np.searchsorted(sts, start_time_s, side="left")
+        j = lo + np.searchsorted(sts, end_time_s, side="right")
+
+        return i, j
+
+    def getFramesInRange(self, start_time_s, end_time_s):
+        """
+        Get the records of the frames starting in a time range, in start time order.
+
+        @param [in] start_time_s The start of the time range [s].
+        @param [in] end_time_s The end of the time range (inclusive) [s].
+        """
+
+        i, j = self.getIndexRange(start_time_s, end_time_s)
+
+        if self.__order is None:
+            return self.__records[i:j]
+
+        return self.__records[self.__order[i:j]]
+
+    def getFramesInDay(self, day_start_s):
+        """ Get the records of the frames starting in the day starting at the given time [s]. """
+        return self.getFramesInRange(day_start_s, day_start_s + 24*60*60 - 1)
+
+    def getFramesInHour(self, hour_start_s):
+        """ Get the records of the frames starting in the hour starting at the given time [s]. """
+        return self.getFramesInRange(hour_start_s, hour_start_s + 60*60 - 1)
@@ -15,9 +15,76 @@ import logging as lg
 #...for the time (being).
 import time
 
+#...for the MATH.
+import numpy as np
+
 #...for the custom Pixelman time string.
 from handlers import getPixelmanTimeString, make_time_dir
 
+## The frame data stored for each frame - the start time [s],
+## acquisition time [s] and number of hit pixels.
+FRAME_DATA = np.dtype([("st", "<f8"), ("acqtime", "<f8"), ("n_pixel", "<i8")])
+
+class FrameColumns:
+    """
+    The frame data (see FRAME_DATA) of a set of frames, as NumPy columns.
+
+    The columns are stored in an array that grows (doubling in size)
+    as frames are added, one at a time or in bulk.
+    """
+
+    def __init__(self):
+        """ Constructor. """
+
+        ## The frame data array (only the first n entries are used).
+        self.__data = np.zeros(16, dtype=FRAME_DATA)
+
+        ## The number of frames.
+        self.__n = 0
+
+    def __len__(self):
+        return self.__n
+
+    def reserve(self, n):
+        """ Make room for (at least) n frames. """
+
+        if n <= len(self.__data):
+            return None
+
+        ## The new frame data array.
+        data = np.zeros(max(n, 2*len(self.__data)), dtype=FRAME_DATA)
+        #
+        data[:self.__n] = self.__data[:self.__n]
+
+        self.__data = data
+
+    def append(self, st, acq_time, n_pixels):
+        """ Add a frame. """
+
+        self.reserve(self.__n + 1)
+
+        self.__data[self.__n] = (st, acq_time, n_pixels)
+
+        self.__n += 1
+
+    def extend(self, sts, acq_times, n_pixels):
+        """ Add frames from arrays of the start times, acquisition times and numbers of pixels. """
+
+        ## The number of frames to add.
+        n = len(sts)
+
+        self.reserve(self.__n + n)
+
+        self.__data["st"][self.__n:self.__n + n] = sts
+        self.__data["acqtime"][self.__n:self.__n + n] = acq_times
+        self.__data["n_pixel"][self.__n:self.__n + n] = n_pixels
+
+        self.__n += n
+
+    def getColumn(self, name):
+        """ Get a column ("st", "acqtime" or "n_pixel") of the frame data. """
+        return self.__data[name][:self.__n]
+
 class DataMonth:
     """ Wrapper class for each month. """
 
@@ -147,7 +214,7 @@ class DataDay:
         if self.__remainder_seconds != 0:
             raise IOError("* Error! Day has %d remainder seconds." % (self.__remainder_seconds))
 
-        ## Dictionary of the number of frames recorded in each day.
+        ## Dictionary of the number of frames recorded in each hour.
         self.__frames_in_an_hour = {}
         #
         ## Dictionary of the hours in the day.
@@ -190,8 +257,8 @@ class DataDay:
         """
         self.__num_frames += 1
 
-        ## The hour of the day (%02d) associated with the start time.
-        hour = int(time.strftime("%H", time.gmtime(st)))
+        ## The hour of the day (UTC) associated with the start time.
+        hour = int(st // 3600) % 24
 
         # Add the frame to the day's hour.
         self.__hours[hour].addFrame(st, acq_time, n_pixels)
@@ -200,6 +267,42 @@ class DataDay:
 
         self.__frames_in_an_hour[hour] += 1
 
+    def addFrames(self, sts, acq_times, n_pixels):
+        """
+        Add frames to the day in bulk.
+
+        @param [in] sts Array of the frame start times [s].
+        @param [in] acq_times Array of the frame acquisition times [s].
+        @param [in] n_pixels Array of the number of hit pixels in each frame.
+        """
+
+        sts = np.asarray(sts, dtype=np.float64)
+        acq_times = np.asarray(acq_times, dtype=np.float64)
+        n_pixels = np.asarray(n_pixels, dtype=np.int64)
+
+        ## The hour of the day (UTC) of each frame.
+        hours = (np.floor(sts / 3600.).astype(np.int64)) % 24
+
+        ## The frames sorted (stably) by hour.
+        order = np.argsort(hours, kind="mergesort")
+
+        ## The number of frames in each hour.
+        counts = np.bincount(hours, minlength=24)
+
+        ## The index of the first frame in each hour.
+        starts = np.concatenate(([0], np.cumsum(counts)))
+
+        for hour in np.flatnonzero(counts):
+
+            ## The frames in the hour.
+            ii = order[starts[hour]:starts[hour + 1]]
+
+            self.__hours[hour].addFrames(sts[ii], acq_times[ii], n_pixels[ii])
+
+            self.__frames_in_an_hour[hour] += int(counts[hour])
+
+        self.__num_frames += len(sts)
+
     def getNumberOfFrames(self):
         return self.__num_frames
 
@@ -209,6 +312,22 @@ class DataDay:
     def getHour(self, hour):
         return self.__hours[hour]
 
+    def getPixelsInEachHour(self):
+        """ Get the total number of hit pixels recorded in each hour {hour:pixels}. """
+        return dict((hour, h.getTotalNumberOfPixels()) for hour, h in self.__hours.iteritems())
+
+    def getLiveTimeInEachHour(self):
+        """ Get the total acquisition time of the frames in each hour {hour:live time [s]}. """
+        return dict((hour, h.getLiveTime()) for hour, h in self.__hours.iteritems())
+
+    def getDeadTimeInEachHour(self):
+        """ Get the time not covered by the frames in each hour {hour:dead time [s]}. """
+        return dict((hour, h.getDeadTime()) for hour, h in self.__hours.iteritems())
+
+    def getPixelRateInEachHour(self):
+        """ Get the hit pixel rate in each hour {hour:rate [s^-1]}. """
+        return dict((hour, h.getPixelRate()) for hour, h in self.__hours.iteritems())
+
 
 class DataHour:
     """ Wrapper class for each hour. """
@@ -249,17 +368,8 @@ class DataHour:
         if self.__remainder_seconds != 0:
             raise IOError("* Error! Hour has %d remainder seconds." % (self.__remainder_seconds))
 
-        ## List of frame start times.
-        self.__f_sts = []
-
-        ## A list of frame acquisition times.
-        self.__f_ats = []
-
-        ## A list of the number of pixels in each frame.
-        self.__f_nps = []
-
-        ## The number of frames found in that hour.
-        self.__num_frames = 0
+        ## The frame start times, acquisition times and numbers of pixels.
+        self.__frames = FrameColumns()
 
         # Update the user.
         lg.info(" * Start time is %s (%d)" % (self.__st_str, self.__st_s))
@@ -288,25 +398,86 @@ class DataHour:
         @param [in] n_pixels The number of hit pixels in the frame.
         """
 
-        self.__num_frames += 1
-
         # Add the frame data.
-        self.__f_sts.append(st)
-        #
-        self.__f_ats.append(acq_time)
-        #
-        self.__f_nps.append(n_pixels)
+        self.__frames.append(st, acq_time, n_pixels)
         #
         #lg.info(" * Found new frame: %s (%f [s], % 7d pixels)." % (time.asctime(time.gmtime(st)), acq_time, n_pixels))
 
+    def addFrames(self, sts, acq_times, n_pixels):
+        """
+        Add frames to the hour in bulk.
+
+        @param [in] sts Array of the frame start times [s].
+        @param [in] acq_times Array of the frame acquisition times [s].
+        @param [in] n_pixels Array of the number of hit pixels in each frame.
+        """
+
+        self.__frames.extend(sts, acq_times, n_pixels)
+
     def getNumberOfFrames(self):
-        return self.__num_frames
+        return len(self.__frames)
 
     def getStartTimes(self):
-        return self.__f_sts
+        return self.__frames.getColumn("st")
 
     def getAcqTimes(self):
-        return self.__f_ats
+        return self.__frames.getColumn("acqtime")
 
     def getNumberOfPixels(self):
-        return self.__f_nps
+        return self.__frames.getColumn("n_pixel")
+
+    def getTotalNumberOfPixels(self):
+        """ Get the total number of hit pixels recorded in the hour. """
+        return int(self.getNumberOfPixels().sum())
+
+    def getLiveTime(self):
+        """ Get the total acquisition time of the hour's frames [s]. """
+        return float(np.clip(self.getAcqTimes(), 0., None).sum())
+
+    def getDeadTime(self):
+        """ Get the time in the hour not covered by the frames [s]. """
+        return max(0., self.__Delta_s - self.getLiveTime())
+
+    def getPixelRate(self):
+        """ Get the hit pixel rate over the hour's frames [s^-1] (0 if there is no live time). """
+
+        ## The live time [s].
+        live_time = self.getLiveTime()
+
+        if live_time <= 0.:
+            return 0.
+
+        return self.getTotalNumberOfPixels() / live_time
+
+    def getMinutes(self):
+        """ Get the minute of the hour (0 to the number of minutes - 1) of each frame. """
+
+        ## The minutes.
+        ms = np.floor((self.getStartTimes() - self.__st_s) / 60.).astype(np.int64)
+
+        return np.clip(ms, 0, self.__n_minutes - 1)
+
+    def getFramesInEachMinute(self):
+        """ Get an array of the number of frames starting in each minute of the hour. """
+        return np.bincount(self.getMinutes(), minlength=self.__n_minutes)
+
+    def getPixelsInEachMinute(self):
+        """ Get an array of the number of hit pixels in the frames starting in each minute of the hour. """
+        return np.bincount(self.getMinutes(), weights=self.getNumberOfPixels(), minlength=self.__n_minutes).astype(np.int64)
+
+    def getLiveTimeInEachMinute(self):
+        """ Get an array of the acquisition time of the frames starting in each minute of the hour [s]. """
+        return np.bincount(self.getMinutes(), weights=np.clip(self.getAcqTimes(), 0., None), minlength=self.__n_minutes)
+
+    def getPixelRateInEachMinute(self):
+        """ Get an array of the hit pixel rate in each minute of the hour [s^-1] (0 if there is no live time). """
+
+        ## The live time in each minute [s].
+        live_times = self.getLiveTimeInEachMinute()
+
+        ## The rates.
+        rates = np.zeros(self.__n_minutes)
+        #
+        rates[live_times > 0.] = self.getPixelsInEachMinute()[live_times > 0.] / live_times[live_times > 0.]
+
+        return rates
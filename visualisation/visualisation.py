@@ -5,6 +5,9 @@
 Functions for visualising frames.
 """
 
+#...for the binary stuff (PNG writing).
+import struct, zlib
+
 #...for the MATH.
 import numpy as np
 
@@ -17,26 +20,118 @@ from matplotlib import colorbar, colors
 #...for setting the axes ticks.
 from matplotlib.ticker import MultipleLocator, FormatStrFormatter
 
+#...for the timings.
+from cernatschool.instrumentation import timed
 
-def makeFrameImage(basename, pixels, outputpath, pixel_mask = {}):
-    """ Create the frame image. """
+## The frame background colour.
+FRAME_BACKGROUND_COLOUR = '#82bcff'
 
-    # The frame limits.
-    x_min = 0; x_max = 256; y_min = 0; y_max = 256
+## The masked pixel colour.
+MASKED_PIXEL_COLOUR = '#00CC44'
 
-    ## The frame width.
-    w = 256
+## The frame figure, image and colour bar axes (made on first use).
+FRAME_FIGURE = {}
 
-    ## The frame height.
-    h = 256
+## The number of image pixels per frame pixel in the frame figure.
+FRAME_FIGURE_SCALE = 4
 
-    # Remove the masked pixels.
-    for X in pixel_mask.keys():
-        if X in pixels.keys():
-            del pixels[X]
+## The width of the pixel edges in the frame figure [image pixels].
+#
+# Each pixel used to be drawn as a patch with a 1 pt edge, making it
+# look about 0.45 pixels wider on each side at the figure's size.
+FRAME_FIGURE_EDGE = 2
+
+def getColourMax(pixels):
+    """ Get the maximum of the colour scale for a frame's pixels {X:C}. """
 
     ## The maximum count value.
-    C_max = max(pixels.values())
+    C_max = 0
+    #
+    if len(pixels) > 0:
+        C_max = max(pixels.values())
+
+    return 10*(np.floor(C_max/10.)+1)
+
+def getFrameRGBA(pixels, pixel_mask = {}, col_max = None, w = 256, h = 256, scale = 1, edge = 0):
+    """
+    Make the frame image as an RGBA array.
+
+    The pixel counts are coloured with the "hot" colour map, the
+    masked pixels are coloured green and the rest of the frame blue.
+    Where (widened) pixels overlap, the pixel drawn last is on top, with
+    the masked pixels drawn after the hit pixels.
+
+    @param [in] pixels The frame's pixels {X:C}.
+    @param [in] pixel_mask The masked pixels {X:C}.
+    @param [in] col_max The maximum of the colour scale (worked out from the pixels if not given).
+    @param [in] w The frame width.
+    @param [in] h The frame height.
+    @param [in] scale The number of image pixels per frame pixel (in x and y).
+    @param [in] edge The number of image pixels to widen each frame pixel by on each side.
+    @returns rgba A (h*scale x w*scale x 4) NumPy array of the RGBA values [0-1], with frame row y at the top of row block y.
+    """
+
+    if col_max is None:
+        col_max = getColourMax(pixels)
+
+    ## The pixel X values, in drawing order (the hit pixels, then the masked pixels).
+    Xs = np.array(list(pixels.iterkeys()) + list(pixel_mask.iterkeys()), dtype=np.int64)
+
+    ## The colours (the background, then the pixels in drawing order).
+    palette = np.empty((len(Xs) + 1, 4))
+    #
+    palette[0] = colors.colorConverter.to_rgba(FRAME_BACKGROUND_COLOUR)
+    #
+    palette[1:len(pixels)+1] = plt.cm.hot(np.fromiter(pixels.itervalues(), dtype=np.float64, count=len(pixels)) / float(col_max))
+    #
+    palette[len(pixels)+1:] = colors.colorConverter.to_rgba(MASKED_PIXEL_COLOUR)
+
+    ## The (palette index of the) pixel drawn last at each point of the image, padded by the edge width.
+    top = np.zeros((h*scale + 2*edge, w*scale + 2*edge), dtype=np.int64)
+
+    ## The palette index of each pixel.
+    ns = np.arange(1, len(Xs) + 1)
+
+    ## The image row and column of each pixel (before widening).
+    rows = (Xs // w) * scale + edge; cols = (Xs % w) * scale + edge
+
+    # Each (widened) pixel covers the points at these offsets. As the pixels
+    # are distinct, no two pixels share a point at the same offset.
+    for dy in range(-edge, scale + edge):
+        for dx in range(-edge, scale + edge):
+            top[rows + dy, cols + dx] = np.maximum(top[rows + dy, cols + dx], ns)
+
+    return palette[top[edge:edge + h*scale, edge:edge + w*scale]]
+
+def writePng(fn, rgba):
+    """
+    Write an RGBA array straight to a PNG file (no figure needed).
+
+    @param [in] fn The PNG file name.
+    @param [in] rgba A (rows x columns x 4) NumPy array of the RGBA values [0-1], top row first.
+    """
+
+    h, w = rgba.shape[:2]
+
+    ## The 8-bit image, with a (zero) filter type byte starting each row.
+    raw = np.zeros((h, w*4 + 1), dtype=np.uint8)
+    #
+    raw[:, 1:] = np.round(np.clip(rgba, 0.0, 1.0) * 255.0).reshape(h, w*4)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(fn, "wb") as f:
+        f.write("\x89PNG\r\n\x1a\n")
+        f.write(chunk("IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)))
+        f.write(chunk("IDAT", zlib.compress(raw.tostring(), 6)))
+        f.write(chunk("IEND", ""))
+
+def getFrameFigure():
+    """ Get the frame figure, making it if it doesn't exist. """
+
+    if "fig" in FRAME_FIGURE and plt.fignum_exists(FRAME_FIGURE["fig"].number):
+        return FRAME_FIGURE
 
     # Create the figure.
     plt.close('all')
@@ -47,40 +142,68 @@ def makeFrameImage(basename, pixels, outputpath, pixel_mask = {}):
     frfig = plt.figure(1, figsize=(figsize*1.27, figsize), dpi=150, facecolor='w', edgecolor='w')
 
     ## The frame axes.
-    frfigax = frfig.add_subplot(111, axisbg='#222222')
+    frfigax = frfig.add_subplot(111)
+    #
+    frfigax.patch.set_facecolor('#222222')
 
-    # Add the frame background (blue).
-    frfigax.add_patch(plt.Rectangle((0,0),256,256,facecolor='#82bcff'))
+    ## The frame image (the frame background, pixels and masked pixels).
+    frimg = frfigax.imshow(np.zeros((256*FRAME_FIGURE_SCALE, 256*FRAME_FIGURE_SCALE, 4)), origin='lower', extent=(0, 256, 0, 256), \
+        interpolation='nearest', aspect='auto')
 
     # Add a grid.
     plt.grid(1)
 
-    # Select the "hot" colour map for the pixel counts.
+    colax, _ = colorbar.make_axes(plt.gca())
 
-    cmap = plt.cm.hot
+    # Set the axis limits based.
+    b = 3 # border
 
-    colax, _ = colorbar.make_axes(plt.gca())
+    frfigax.set_xlim([0 - b, 256 + b])
+    frfigax.set_ylim([0 - b, 256 + b])
 
-    col_max = 10*(np.floor(C_max/10.)+1)
+    FRAME_FIGURE["fig"] = frfig
+    FRAME_FIGURE["img"] = frimg
+    FRAME_FIGURE["colax"] = colax
 
-    colorbar.ColorbarBase(colax,cmap=cmap,norm=colors.Normalize(vmin=0,vmax=col_max))
+    return FRAME_FIGURE
 
-    # Loop over the pixels and plot them.
-    for X, C in pixels.iteritems():
-        x = X % 256; y = X / 256
-        scaled_C = float(C)/float(col_max)
-        frfigax.add_patch(plt.Rectangle((x,y),1,1,edgecolor=cmap(scaled_C),facecolor=cmap(scaled_C)))
+@timed("frame_image")
+def makeFrameImage(basename, pixels, outputpath, pixel_mask = {}, raster = False):
+    """
+    Create the frame image.
 
-    # Loop over the masked pixels and plot them.
-    for X, C in pixel_mask.iteritems():
-        x = X % 256; y = X / 256
-        frfigax.add_patch(plt.Rectangle((x,y),1,1,edgecolor='#00CC44',facecolor='#00CC44'))
+    The frame is drawn as a single image on a figure that is made once
+    and reused for each frame.
 
-    # Set the axis limits based.
-    b = 3 # border
+    @param [in] basename The basename of the PNG file.
+    @param [in] pixels The frame's pixels {X:C} (the masked pixels are removed).
+    @param [in] outputpath The path to write the PNG file to.
+    @param [in] pixel_mask The masked pixels {X:C}.
+    @param [in] raster Write the frame (256 x 256 pixels) straight to the PNG, with no axes or colour bar?
+    """
 
-    frfigax.set_xlim([0 - b, 256 + b])
-    frfigax.set_ylim([0 - b, 256 + b])
+    # Remove the masked pixels.
+    for X in pixel_mask.keys():
+        if X in pixels:
+            del pixels[X]
+
+    col_max = getColourMax(pixels)
+
+    if raster:
+        writePng(outputpath + "/%s.png" % (basename), getFrameRGBA(pixels, pixel_mask, col_max)[::-1])
+        return None
+
+    ff = getFrameFigure()
+
+    ff["img"].set_data(getFrameRGBA(pixels, pixel_mask, col_max, scale=FRAME_FIGURE_SCALE, edge=FRAME_FIGURE_EDGE))
+
+    # Select the "hot" colour map for the pixel counts.
+
+    cmap = plt.cm.hot
+
+    ff["colax"].cla()
+
+    colorbar.ColorbarBase(ff["colax"],cmap=cmap,norm=colors.Normalize(vmin=0,vmax=col_max))
 
     # Save the figure.
-    frfig.savefig(outputpath + "/%s.png" % (basename))
+    ff["fig"].savefig(outputpath + "/%s.png" % (basename))